@@ -0,0 +1,202 @@
+"""
+NumPy-backed analytics aggregation.
+
+Turns raw (event_type, created_at) rows into integer epoch arrays once and
+computes every series with vectorized operations instead of a per-event
+Python loop:
+
+- bucket edges are generated in the requested timezone (so DST shifts and
+  half-hour offsets such as Asia/Kolkata bucket correctly) and converted
+  to UTC epochs
+- each event is assigned to a bucket with np.searchsorted
+- counts per bucket come from np.bincount
+- CTR and trailing moving averages are computed on the count arrays
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+GRANULARITIES = ('hour', 'day', 'week')
+MAX_BUCKETS = 5000
+
+
+def parse_epochs(timestamps: Sequence[str]) -> np.ndarray:
+    """
+    Convert ISO-8601 timestamps to int64 UTC epoch seconds.
+    PostgREST returns timestamptz in UTC ('...+00:00'), which takes the
+    vectorized datetime64 path; anything else is parsed individually.
+    """
+    if not timestamps:
+        return np.empty(0, dtype=np.int64)
+    # Each timestamp carries at most one offset, so this counts UTC ones in C
+    joined = ''.join(timestamps)
+    if joined.count('+00:00') + joined.count('Z') == len(timestamps):
+        # 'S19' truncates to 'YYYY-MM-DDTHH:MM:SS', which numpy parses natively
+        return np.array(timestamps, dtype='S19').astype('datetime64[s]').astype(np.int64)
+    return np.fromiter(
+        (int(datetime.fromisoformat(ts.replace('Z', '+00:00')).timestamp()) for ts in timestamps),
+        dtype=np.int64,
+        count=len(timestamps)
+    )
+
+
+class EventArrays:
+    """Columnar form of raw events: UTC epoch seconds + impression flags"""
+    __slots__ = ('epochs', 'is_impression')
+
+    def __init__(self, events: Sequence[Dict[str, Any]]):
+        self.epochs = parse_epochs([e['created_at'] for e in events])
+        self.is_impression = np.array([e['event_type'] for e in events], dtype=object) == 'impression'
+        if not len(events):
+            self.is_impression = np.empty(0, dtype=bool)
+
+
+def _floor_local(dt: datetime, granularity: str) -> datetime:
+    if granularity == 'hour':
+        return dt.replace(minute=0, second=0, microsecond=0)
+    day = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == 'week':
+        # ISO weeks start on Monday
+        day -= timedelta(days=day.weekday())
+    return day
+
+
+def bucket_edges(start: datetime, end: datetime, granularity: str, tz: ZoneInfo) -> List[datetime]:
+    """
+    Local-time bucket starts covering [start, end), plus the closing edge.
+    Steps are taken on wall-clock time and re-localized so a 'day' is a
+    calendar day even across DST changes.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+
+    current = _floor_local(start.astimezone(tz), granularity).replace(tzinfo=None)
+    end_local = end.astimezone(tz)
+    step = {'hour': timedelta(hours=1), 'day': timedelta(days=1), 'week': timedelta(weeks=1)}[granularity]
+
+    edges = []
+    while True:
+        edge = current.replace(tzinfo=tz)
+        edges.append(edge)
+        if edge >= end_local:
+            break
+        if len(edges) > MAX_BUCKETS:
+            raise ValueError(f"Range too large for '{granularity}' granularity (max {MAX_BUCKETS} buckets)")
+        current += step
+    return edges
+
+
+def check_range(start: datetime, end: datetime, granularity: str, tz: str) -> Tuple[datetime, datetime]:
+    """
+    Validate a range before any events are fetched: localizes naive bounds
+    in tz, and raises ValueError if end <= start or the range needs more
+    than MAX_BUCKETS buckets (estimated from the span, no edges generated).
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    zone = ZoneInfo(tz)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=zone)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=zone)
+    if end <= start:
+        raise ValueError("end must be after start")
+
+    step = {'hour': timedelta(hours=1), 'day': timedelta(days=1), 'week': timedelta(weeks=1)}[granularity]
+    floor = _floor_local(start.astimezone(zone), granularity)
+    # ceil(span / step); DST can move this by one, bucket_edges() still checks exactly
+    if -(-(end - floor) // step) > MAX_BUCKETS:
+        raise ValueError(f"Range too large for '{granularity}' granularity (max {MAX_BUCKETS} buckets)")
+    return start, end
+
+
+def _moving_average(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over up to `window` buckets (shorter at the start)"""
+    if window <= 1 or values.size == 0:
+        return values.astype(np.float64)
+    cumsum = np.cumsum(np.insert(values.astype(np.float64), 0, 0.0))
+    idx = np.arange(1, values.size + 1)
+    lo = np.maximum(idx - window, 0)
+    return (cumsum[idx] - cumsum[lo]) / (idx - lo)
+
+
+def _ctr(conversions: np.ndarray, impressions: np.ndarray) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ctr = np.where(impressions > 0, conversions / np.maximum(impressions, 1) * 100, 0.0)
+    return np.round(ctr, 2)
+
+
+def aggregate(events: Any, start: datetime, end: datetime,
+              granularity: str = 'day', tz: str = 'UTC', window: int = 7) -> Dict[str, Any]:
+    """
+    Bucket events into [start, end) by granularity in timezone tz.
+    events is a list of rows or an EventArrays (convert once, aggregate many).
+    Returns summary totals and one entry per bucket (including empty ones).
+    """
+    zone = ZoneInfo(tz)
+    start, end = check_range(start, end, granularity, tz)
+
+    edges = bucket_edges(start, end, granularity, zone)
+    edge_epochs = np.array([int(e.timestamp()) for e in edges], dtype=np.int64)
+    n_buckets = len(edges) - 1
+
+    arrays = events if isinstance(events, EventArrays) else EventArrays(events)
+    epochs = arrays.epochs
+
+    # Keep events inside [start, end) and map them to buckets
+    in_range = (epochs >= int(start.timestamp())) & (epochs < int(end.timestamp()))
+    bucket = np.searchsorted(edge_epochs, epochs[in_range], side='right') - 1
+    impression_mask = arrays.is_impression[in_range]
+
+    impressions = np.bincount(bucket[impression_mask], minlength=n_buckets)[:n_buckets]
+    conversions = np.bincount(bucket[~impression_mask], minlength=n_buckets)[:n_buckets]
+
+    ctr = _ctr(conversions, impressions)
+    impressions_ma = _moving_average(impressions, window)
+    conversions_ma = _moving_average(conversions, window)
+    ctr_ma = _ctr(conversions_ma, impressions_ma)
+
+    total_impressions = int(impressions.sum())
+    total_conversions = int(conversions.sum())
+
+    series = [
+        {
+            "bucket": edges[i].isoformat(),
+            "impressions": int(impressions[i]),
+            "conversions": int(conversions[i]),
+            "ctr": float(ctr[i]),
+            "impressions_ma": round(float(impressions_ma[i]), 2),
+            "conversions_ma": round(float(conversions_ma[i]), 2),
+            "ctr_ma": float(ctr_ma[i]),
+        }
+        for i in range(n_buckets)
+    ]
+
+    return {
+        "granularity": granularity,
+        "timezone": tz,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "window": window,
+        "summary": {
+            "impressions": total_impressions,
+            "conversions": total_conversions,
+            "ctr": round(total_conversions / total_impressions * 100, 2) if total_impressions else 0
+        },
+        "series": series
+    }
+
+
+def parse_range(start: Optional[str], end: Optional[str], tz: str,
+                default_days: int = 30) -> Tuple[datetime, datetime]:
+    """Parse ISO start/end query params; naive values are taken in tz"""
+    zone = ZoneInfo(tz)
+    end_dt = datetime.fromisoformat(end) if end else datetime.now(timezone.utc)
+    if end_dt.tzinfo is None:
+        end_dt = end_dt.replace(tzinfo=zone)
+    start_dt = datetime.fromisoformat(start) if start else end_dt - timedelta(days=default_days)
+    if start_dt.tzinfo is None:
+        start_dt = start_dt.replace(tzinfo=zone)
+    return start_dt, end_dt
@@ -0,0 +1,109 @@
+"""
+Compact tracking beacons.
+
+The JSON /track body is free-form: every beacon is parsed into nested
+dicts and whatever 'metadata' the client sent is stored as-is. The compact
+format is a fixed schema of short keys in query-string form:
+
+    s=<space_id>&e=i&u=<page url>&r=<referrer>
+
+sent either as a text/plain POST body (sendBeacon with a string, which
+also needs no CORS preflight) or as the query string of a GET pixel.
+
+Fields (anything else is rejected):
+- s   space_id     required
+- e   event_type   required: 'i' / 'impression' or 'c' / 'conversion'
+- u   url          metadata, page URL
+- r   referrer     metadata
+- el  element      metadata, clicked tag name
+- tx  text         metadata, clicked element text
+
+parse_beacon() walks the raw bytes once and writes straight into the
+event dict; values are only percent-decoded when they contain '%' or '+'.
+The whole beacon is capped at BEACON_MAX_BYTES and each metadata field is
+truncated to its own cap, so stored metadata is bounded too.
+"""
+import os
+import re
+from binascii import a2b_qp
+from typing import Any, Dict
+from urllib.parse import unquote_plus
+
+BEACON_MAX_BYTES = int(os.environ.get('BEACON_MAX_BYTES', '4096'))
+
+SPACE_ID_MAX = 64
+
+# key -> (metadata field, max decoded length)
+_METADATA_FIELDS = {
+    b'u': ('url', 512),
+    b'r': ('referrer', 512),
+    b'el': ('element', 32),
+    b'tx': ('text', 50),
+}
+_EVENT_TYPES = {
+    'i': 'impression', 'impression': 'impression',
+    'c': 'conversion', 'conversion': 'conversion',
+}
+
+# '%' not followed by two hex digits (decoded the slow, lenient way)
+_BAD_ESCAPE = re.compile(rb'%(?![0-9A-Fa-f]{2})')
+
+# 1x1 transparent GIF returned by the pixel endpoint
+PIXEL_GIF = (
+    b'GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00'
+    b',\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;'
+)
+
+
+class BeaconError(ValueError):
+    pass
+
+
+class BeaconTooLarge(BeaconError):
+    pass
+
+
+def _decode(raw: bytes, name: str) -> str:
+    try:
+        if b'%' not in raw and b'+' not in raw:
+            return raw.decode('ascii')
+        if _BAD_ESCAPE.search(raw) is None:
+            # %XX -> =XX and let binascii's C quoted-printable decoder do the
+            # work (~10x faster than unquote_plus); literal '=' is escaped first
+            return a2b_qp(raw.replace(b'=', b'=3D').replace(b'%', b'=').replace(b'+', b' ')).decode('utf-8')
+        return unquote_plus(raw.decode('ascii'), errors='strict')
+    except UnicodeError:
+        raise BeaconError(f"{name} is not valid percent-encoded UTF-8")
+
+
+def parse_beacon(raw: bytes) -> Dict[str, Any]:
+    """Compact beacon -> event dict ({'space_id', 'event_type', 'metadata'}); raises BeaconError"""
+    if len(raw) > BEACON_MAX_BYTES:
+        raise BeaconTooLarge(f"Beacon exceeds {BEACON_MAX_BYTES} bytes")
+
+    space_id = event_type = None
+    metadata: Dict[str, str] = {}
+    for pair in raw.split(b'&'):
+        if not pair:
+            continue
+        key, _, value = pair.partition(b'=')
+        if key == b's':
+            space_id = _decode(value, 'space_id')
+            if len(space_id) > SPACE_ID_MAX:
+                raise BeaconError(f"space_id exceeds {SPACE_ID_MAX} characters")
+        elif key == b'e':
+            event_type = _EVENT_TYPES.get(_decode(value, 'event_type'))
+            if event_type is None:
+                raise BeaconError("Invalid event_type. Must be 'impression' or 'conversion'")
+        else:
+            field = _METADATA_FIELDS.get(key)
+            if field is None:
+                raise BeaconError(f"Unknown beacon field '{key.decode('ascii', 'replace')[:16]}'")
+            if value:
+                # Over-long metadata is truncated, not rejected: the event itself is still valid
+                metadata[field[0]] = _decode(value, field[0])[:field[1]]
+
+    if not space_id or not event_type:
+        raise BeaconError("Missing space_id or event_type")
+    return {'space_id': space_id, 'event_type': event_type, 'metadata': metadata}
+
@@ -0,0 +1,7 @@
+"""
+Micro/macro benchmarks for the TrustFlow API.
+
+Run from the backend directory against the in-memory stand-in backend:
+
+    cd backend && python -m benchmarks.bench_public_data
+"""
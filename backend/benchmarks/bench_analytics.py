@@ -0,0 +1,90 @@
+"""
+Benchmark: analytics aggregation strategies on a synthetic event set.
+
+Compares, for one space with N raw analytics_events:
+- scan:     transfer every (event_type, created_at) row and count in Python
+- pushdown: analytics_daily_counts RPC, transferring one row per day
+
+Runs against the local stand-in backend, so "transfer" is the stand-in's
+row copying plus a JSON round trip of the result set; the push-down side
+stands in for a SQL GROUP BY.
+
+    cd backend && python -m benchmarks.bench_analytics --events 1000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault('DATA_BACKEND', 'local')
+
+import server  # noqa: E402
+
+
+SPACE_ID = 'bench-space'
+
+
+def seed(events: int, days: int):
+    now = datetime.now(timezone.utc)
+    rng = random.Random(42)
+    metadata = {}
+    span = days * 86400
+    server.supabase.tables['analytics_events'] = [
+        {
+            'space_id': SPACE_ID,
+            'event_type': 'conversion' if rng.random() < 0.05 else 'impression',
+            'metadata': metadata,
+            'created_at': (now - timedelta(seconds=rng.randrange(span))).isoformat(),
+        }
+        for _ in range(events)
+    ]
+
+
+async def timed(label: str, fn, start_date, transferred: dict):
+    start = time.perf_counter()
+    result = await fn(SPACE_ID, start_date)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"{label:<10} {elapsed:10.1f} ms   rows transferred {transferred[label]:>9,}")
+    return result
+
+
+async def main(args):
+    seed(args.events, args.days)
+    start_date = datetime.now(timezone.utc) - timedelta(days=args.days)
+    print(f"{args.events:,} events over {args.days} days")
+
+    transferred = {}
+
+    async def scan(space_id, since):
+        # Same query as the fallback, with a JSON round trip to model the wire
+        query = server.db.table('analytics_events').select('event_type, created_at') \
+            .eq('space_id', space_id).gte('created_at', since.isoformat())
+        rows = json.loads(json.dumps((await server.db.execute(query)).data))
+        transferred['scan'] = len(rows)
+        groups = {}
+        for event in rows:
+            group = groups.setdefault(event['created_at'][:10], {'impressions': 0, 'conversions': 0})
+            group['impressions' if event['event_type'] == 'impression' else 'conversions'] += 1
+        return groups
+
+    async def pushdown(space_id, since):
+        groups = await server._aggregate_analytics_events(space_id, since)
+        transferred['pushdown'] = len(json.loads(json.dumps(list(groups.values()))))
+        return groups
+
+    a = await timed('scan', scan, start_date, transferred)
+    b = await timed('pushdown', pushdown, start_date, transferred)
+
+    same = all(a[d]['impressions'] == b[d]['impressions'] and a[d]['conversions'] == b[d]['conversions'] for d in a)
+    print(f"results match: {same and a.keys() == b.keys()}")
+    server.db.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--events', type=int, default=1_000_000)
+    parser.add_argument('--days', type=int, default=30)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,115 @@
+"""
+Benchmark: NumPy analytics engine vs per-event Python loops.
+
+All variants get the same in-memory (event_type, created_at) rows, so this
+measures aggregation CPU only (no backend round trips):
+
+- loop (UTC day):  the original get_analytics bucketing, created_at[:10]
+- loop (tz-aware): the minimum a loop needs for timezone-aware buckets,
+                   fromisoformat + astimezone per event
+- engine:          analytics_engine.aggregate (also computes CTR and
+                   moving averages), including row -> array conversion
+- engine reuse:    hour/day/week series from one EventArrays conversion
+
+    cd backend && python -m benchmarks.bench_analytics_engine --events 1000000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import analytics_engine
+
+
+def make_events(count: int, days: int) -> list:
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    rng = random.Random(42)
+    span = days * 86400
+    return [
+        {
+            'event_type': 'conversion' if rng.random() < 0.05 else 'impression',
+            'created_at': (now - timedelta(seconds=rng.randrange(span))).isoformat(),
+        }
+        for _ in range(count)
+    ]
+
+
+def python_loop(events: list) -> dict:
+    date_groups = {}
+    for event in events:
+        event_date = event['created_at'][:10]
+        if event_date not in date_groups:
+            date_groups[event_date] = {'date': event_date, 'impressions': 0, 'conversions': 0}
+        if event['event_type'] == 'impression':
+            date_groups[event_date]['impressions'] += 1
+        else:
+            date_groups[event_date]['conversions'] += 1
+    return date_groups
+
+
+def python_loop_tz(events: list, tz: ZoneInfo) -> dict:
+    date_groups = {}
+    for event in events:
+        event_date = datetime.fromisoformat(event['created_at']).astimezone(tz).date().isoformat()
+        group = date_groups.get(event_date)
+        if group is None:
+            group = date_groups[event_date] = {'date': event_date, 'impressions': 0, 'conversions': 0}
+        if event['event_type'] == 'impression':
+            group['impressions'] += 1
+        else:
+            group['conversions'] += 1
+    return date_groups
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def main(args):
+    events = make_events(args.events, args.days)
+    end = datetime.now(timezone.utc) + timedelta(seconds=1)
+    start = end - timedelta(days=args.days + 1)
+
+    kolkata = ZoneInfo('Asia/Kolkata')
+    loop_ms = best_of(lambda: python_loop(events), args.repeat)
+    loop_tz_ms = best_of(lambda: python_loop_tz(events, kolkata), args.repeat)
+    engine_ms = best_of(lambda: analytics_engine.aggregate(events, start, end, 'day', 'UTC'), args.repeat)
+    engine_tz_ms = best_of(lambda: analytics_engine.aggregate(events, start, end, 'day', 'Asia/Kolkata'), args.repeat)
+
+    def reuse():
+        arrays = analytics_engine.EventArrays(events)
+        for granularity in analytics_engine.GRANULARITIES:
+            analytics_engine.aggregate(arrays, start, end, granularity, 'Asia/Kolkata')
+    reuse_ms = best_of(reuse, args.repeat)
+
+    expected = python_loop(events)
+    result = analytics_engine.aggregate(events, start, end, 'day', 'UTC')
+    got = {b['bucket'][:10]: (b['impressions'], b['conversions']) for b in result['series'] if b['impressions'] or b['conversions']}
+    match = got == {d: (g['impressions'], g['conversions']) for d, g in expected.items()}
+
+    expected_tz = python_loop_tz(events, kolkata)
+    result_tz = analytics_engine.aggregate(events, start, end, 'day', 'Asia/Kolkata')
+    got_tz = {b['bucket'][:10]: (b['impressions'], b['conversions']) for b in result_tz['series'] if b['impressions'] or b['conversions']}
+    match_tz = got_tz == {d: (g['impressions'], g['conversions']) for d, g in expected_tz.items()}
+
+    print(f"{args.events:,} events over {args.days} days (best of {args.repeat})")
+    print(f"loop (UTC day)           {loop_ms:9.1f} ms")
+    print(f"engine (UTC day)         {engine_ms:9.1f} ms   ({loop_ms / engine_ms:.2f}x)")
+    print(f"loop (Asia/Kolkata day)  {loop_tz_ms:9.1f} ms")
+    print(f"engine (Asia/Kolkata)    {engine_tz_ms:9.1f} ms   ({loop_tz_ms / engine_tz_ms:.2f}x)")
+    print(f"engine hour+day+week     {reuse_ms:9.1f} ms   (one array conversion)")
+    print(f"results match: UTC {match}, Asia/Kolkata {match_tz}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--events', type=int, default=1_000_000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,240 @@
+"""
+Load test: end-to-end API throughput and latency percentiles.
+
+Boots server.app in-process against the local stand-in backend (injected
+per-query latency) and drives it with a closed loop of concurrent clients
+through httpx.ASGITransport, so numbers cover routing, validation,
+handlers, caches and the DB worker pool, but not uvicorn or the network.
+
+Scenarios (weighted request mixes):
+- widget:    public-data, widget-settings, public testimonials, slug lookup
+- track:     POST /track bursts (queued for bulk insert)
+- analytics: /analytics/{id} daily counts and /analytics/{id}/timeseries
+- webhook:   POST /webhooks/test against an in-process receiver with its
+             own latency (swapped in as the webhooks pool's transport)
+- mixed:     all of the above, weighted like production traffic
+
+Reports per-endpoint and overall p50/p95/p99 and req/s. --json writes the
+results and --compare prints the change against an earlier --json file, so
+runs can be compared commit to commit:
+
+    cd backend && python -m benchmarks.bench_api --scenario mixed --json /tmp/before.json
+    cd backend && python -m benchmarks.bench_api --scenario mixed --compare /tmp/before.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault('DATA_BACKEND', 'local')
+os.environ.setdefault('DOMAIN_SCHEDULER_ENABLED', 'false')
+
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+
+SPACE_ID = 'bench-space'
+SLUG = 'bench'
+WEBHOOK_URL = 'https://hooks.bench.example/trustflow'
+
+
+def seed(testimonials: int, events: int, days: int):
+    tables = server.supabase.tables
+    tables['spaces'].append({
+        'id': SPACE_ID, 'slug': SLUG, 'space_name': 'Bench', 'header_title': 'Tell us',
+        'collect_star_rating': True, 'cta_selector': '#buy',
+    })
+    tables['widget_configurations'].append({'space_id': SPACE_ID, 'settings': {'popupsEnabled': True}})
+    for i in range(testimonials):
+        tables['testimonials'].append({
+            'id': f't{i:05d}', 'space_id': SPACE_ID, 'is_liked': True, 'type': 'text',
+            'content': 'Great product!', 'rating': 5, 'respondent_name': f'User {i}',
+            'created_at': f'2026-01-01T{i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}+00:00',
+        })
+    now = datetime.now(timezone.utc)
+    rng = random.Random(42)
+    span = days * 86400
+    tables['analytics_events'].extend(
+        {
+            'space_id': SPACE_ID,
+            'event_type': 'conversion' if rng.random() < 0.05 else 'impression',
+            'metadata': {},
+            'created_at': (now - timedelta(seconds=rng.randrange(span))).isoformat(),
+        }
+        for _ in range(events)
+    )
+
+
+def _track_body() -> dict:
+    return {
+        'space_id': SPACE_ID,
+        'event_type': 'conversion' if random.random() < 0.05 else 'impression',
+        'metadata': {'page_url': 'https://shop.example/product', 'referrer': 'https://google.com'},
+    }
+
+
+# (label, weight, method, path, json body factory)
+ENDPOINTS = {
+    'widget': [
+        ('public-data', 5, 'GET', f'/api/spaces/{SPACE_ID}/public-data', None),
+        ('widget-settings', 3, 'GET', f'/api/widget-settings/{SPACE_ID}', None),
+        ('public-testimonials', 2, 'GET', f'/api/public/testimonials?space_id={SPACE_ID}&limit=50', None),
+        ('public-space', 1, 'GET', f'/api/public/space/{SLUG}', None),
+    ],
+    'track': [
+        ('track', 1, 'POST', '/api/track', _track_body),
+    ],
+    'analytics': [
+        ('analytics', 3, 'GET', f'/api/analytics/{SPACE_ID}?range=30d', None),
+        ('timeseries', 1, 'GET', f'/api/analytics/{SPACE_ID}/timeseries?granularity=day&tz=Europe/Berlin', None),
+    ],
+    'webhook': [
+        ('webhook-test', 1, 'POST', '/api/webhooks/test',
+         lambda: {'webhook_url': WEBHOOK_URL, 'payload': {'respondent_name': 'Bench', 'rating': 5}}),
+    ],
+}
+# Production-like weights: widget loads and beacons dominate
+MIXED_WEIGHTS = {'widget': 10, 'track': 12, 'analytics': 1, 'webhook': 0.1}
+
+
+def build_mix(scenario: str):
+    if scenario != 'mixed':
+        return ENDPOINTS[scenario]
+    mix = []
+    for name, weight in MIXED_WEIGHTS.items():
+        group_total = sum(w for _, w, *_ in ENDPOINTS[name])
+        mix.extend((label, weight * w / group_total, *rest) for label, w, *rest in ENDPOINTS[name])
+    return mix
+
+
+def install_webhook_receiver(latency: float):
+    """Point the webhooks pool at an in-process receiver (the sandbox has no outbound network)"""
+    async def receive(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        return httpx.Response(200, json={'ok': True})
+
+    server.outbound_http._clients['webhooks'] = httpx.AsyncClient(transport=httpx.MockTransport(receive))
+
+
+def percentile(sorted_values, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize(latencies, elapsed: float, errors: int) -> dict:
+    values = sorted(latencies)
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'req_per_s': round(len(values) / elapsed, 1) if elapsed else 0,
+        'mean_ms': round(statistics.fmean(values), 2) if values else 0,
+        'p50_ms': round(percentile(values, 50), 2),
+        'p95_ms': round(percentile(values, 95), 2),
+        'p99_ms': round(percentile(values, 99), 2),
+    }
+
+
+async def run(client: httpx.AsyncClient, mix, requests: int, concurrency: int, seed_value: int):
+    rng = random.Random(seed_value)
+    labels = [m[0] for m in mix]
+    weights = [m[1] for m in mix]
+    by_label = {m[0]: m for m in mix}
+    plan = rng.choices(labels, weights=weights, k=requests)
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    position = 0
+
+    async def worker():
+        nonlocal position
+        while position < len(plan):
+            label = plan[position]
+            position += 1
+            _, _, method, path, body = by_label[label]
+            start = time.perf_counter()
+            response = await client.request(method, path, json=body() if body else None)
+            latencies[label].append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400 or (label == 'webhook-test' and not response.json().get('success')):
+                errors[label] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    results = {label: summarize(latencies[label], elapsed, errors[label]) for label in labels if latencies[label]}
+    everything = [v for values in latencies.values() for v in values]
+    results['overall'] = summarize(everything, elapsed, sum(errors.values()))
+    return results
+
+
+def report(results: dict, baseline: dict = None):
+    header = f"{'endpoint':<20} {'requests':>8} {'errors':>6} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    print(header)
+    print('-' * len(header))
+    for label, r in results.items():
+        line = (f"{label:<20} {r['requests']:>8} {r['errors']:>6} {r['req_per_s']:>9.1f} "
+                f"{r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+        old = (baseline or {}).get(label)
+        if old:
+            changes = []
+            for key in ('req_per_s', 'p50_ms', 'p99_ms'):
+                if old[key]:
+                    changes.append(f"{key} {(r[key] - old[key]) / old[key] * 100:+.0f}%")
+            line += '   ' + ', '.join(changes)
+        print(line)
+
+
+async def main(args):
+    logging.disable(logging.WARNING)
+    random.seed(args.seed)
+    server.supabase.latency = args.latency_ms / 1000
+    seed(args.testimonials, args.events, args.days)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with server.app.router.lifespan_context(server.app):
+        install_webhook_receiver(args.webhook_latency_ms / 1000)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+            mix = build_mix(args.scenario)
+            # Warm-up fills caches and pools the way a running server has them
+            await run(client, mix, min(args.requests // 10, 200), args.concurrency, args.seed + 1)
+            results = await run(client, mix, args.requests, args.concurrency, args.seed)
+
+    print(f"scenario={args.scenario} requests={args.requests} concurrency={args.concurrency} "
+          f"backend latency={args.latency_ms} ms, webhook latency={args.webhook_latency_ms} ms, "
+          f"DB_MAX_CONCURRENCY={server.db.max_concurrency}")
+    report(results, baseline)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'config': vars(args), 'results': results}, f, indent=2)
+        print(f"results written to {args.json}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scenario', choices=['mixed', *ENDPOINTS], default='mixed')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--latency-ms', type=float, default=10)
+    parser.add_argument('--webhook-latency-ms', type=float, default=50)
+    parser.add_argument('--testimonials', type=int, default=200)
+    parser.add_argument('--events', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--compare', help='earlier --json file to compare against')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,107 @@
+"""
+Benchmark: JSON /track vs the compact beacon format.
+
+Compares, for the beacons the embed script actually sends (impression with
+url + referrer, conversion with url + element + text):
+- parse:  request.json()-equivalent json.loads + validation vs parse_beacon
+- wire:   request body bytes
+- route:  POST /api/track vs POST /api/track/compact through the ASGI app
+
+    cd backend && python -m benchmarks.bench_beacon --iterations 200000 --requests 5000
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from urllib.parse import quote
+
+os.environ.setdefault('DATA_BACKEND', 'local')
+os.environ.setdefault('DOMAIN_SCHEDULER_ENABLED', 'false')
+
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+from beacon import parse_beacon  # noqa: E402
+
+SPACE_ID = '2b7f8a9e-5c1d-4e7a-9f3b-6d2c8e1a4b5f'
+EVENTS = [
+    ('impression', {'url': 'https://shop.example.com/products/widget?utm_source=newsletter',
+                    'referrer': 'https://www.google.com/'}),
+    ('conversion', {'url': 'https://shop.example.com/products/widget?utm_source=newsletter',
+                    'element': 'BUTTON', 'text': 'Add to cart'}),
+]
+KEYS = {'url': 'u', 'referrer': 'r', 'element': 'el', 'text': 'tx'}
+
+
+def json_body(event_type, metadata) -> bytes:
+    return json.dumps({'space_id': SPACE_ID, 'event_type': event_type, 'metadata': metadata}).encode()
+
+
+def compact_body(event_type, metadata) -> bytes:
+    parts = [f"s={SPACE_ID}", f"e={event_type[0]}"]
+    parts += [f"{KEYS[k]}={quote(v, safe='')}" for k, v in metadata.items()]
+    return '&'.join(parts).encode()
+
+
+def parse_json(raw: bytes) -> dict:
+    body = json.loads(raw)
+    space_id = body.get('space_id')
+    event_type = body.get('event_type')
+    if not space_id or event_type not in ('impression', 'conversion'):
+        raise ValueError
+    return {'space_id': space_id, 'event_type': event_type, 'metadata': body.get('metadata', {})}
+
+
+def bench_parse(iterations: int):
+    for event_type, metadata in EVENTS:
+        raw_json, raw_compact = json_body(event_type, metadata), compact_body(event_type, metadata)
+        assert parse_json(raw_json) == parse_beacon(raw_compact)
+        timings = {}
+        for label, fn, raw in (('json', parse_json, raw_json), ('compact', parse_beacon, raw_compact)):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                fn(raw)
+            timings[label] = (time.perf_counter() - start) / iterations * 1e6
+        print(f"{event_type:<11} body {len(raw_json):4d} -> {len(raw_compact):4d} bytes   "
+              f"parse {timings['json']:.2f} -> {timings['compact']:.2f} us")
+
+
+async def bench_route(requests: int, concurrency: int):
+    event_type, metadata = EVENTS[1]
+    variants = (
+        ('/api/track', json_body(event_type, metadata), 'application/json'),
+        ('/api/track/compact', compact_body(event_type, metadata), 'text/plain'),
+    )
+    transport = httpx.ASGITransport(app=server.app)
+    async with server.app.router.lifespan_context(server.app):
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            for path, body, content_type in variants:
+                remaining = requests
+
+                async def worker():
+                    nonlocal remaining
+                    while remaining > 0:
+                        remaining -= 1
+                        response = await client.post(path, content=body, headers={'content-type': content_type})
+                        assert response.status_code == 202, response.text
+
+                start = time.perf_counter()
+                await asyncio.gather(*(worker() for _ in range(concurrency)))
+                elapsed = time.perf_counter() - start
+                print(f"{path:<20} {requests / elapsed:8.0f} req/s")
+
+
+async def main(args):
+    logging.disable(logging.WARNING)
+    bench_parse(args.iterations)
+    await bench_route(args.requests, args.concurrency)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=200000)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,137 @@
+"""
+Benchmark: per-request CPU for reading + decoding raw request bodies.
+
+Drives real Starlette Request objects (body delivered as one ASGI message,
+as uvicorn does for small bodies) through:
+- before: request.body() + request.json() for the webhook (HMAC over the
+          bytes, then a second stdlib parse via request.json()), and
+          request.json() for /track
+- after:  request_body.read_body() + loads() (orjson when installed)
+
+for a /track event, a 20-event /track/batch body and a Lemon Squeezy
+subscription webhook. CPU time is process time per request.
+
+    cd backend && python -m benchmarks.bench_body --iterations 50000
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+
+from starlette.requests import Request
+
+import request_body
+from request_body import loads, read_body
+
+SECRET = b'bench-webhook-secret'
+SPACE_ID = '2b7f8a9e-5c1d-4e7a-9f3b-6d2c8e1a4b5f'
+
+TRACK_EVENT = {
+    'space_id': SPACE_ID,
+    'event_type': 'conversion',
+    'metadata': {'url': 'https://shop.example.com/products/widget?utm_source=newsletter',
+                 'element': 'BUTTON', 'text': 'Add to cart'},
+}
+
+# Shape of a Lemon Squeezy subscription_updated delivery
+WEBHOOK = {
+    'meta': {'event_name': 'subscription_updated', 'test_mode': False,
+             'custom_data': {'user_id': '5d0c2a4e-8f1b-4c3e-9a7d-1e6f2b8c4d90', 'plan_id': 'pro',
+                             'billing_cycle': 'monthly'}},
+    'data': {
+        'type': 'subscriptions', 'id': '184532',
+        'attributes': {
+            'store_id': 41235, 'customer_id': 2875511, 'order_id': 3520012, 'order_item_id': 3478221,
+            'product_id': 251744, 'variant_id': 287211, 'product_name': 'TrustFlow Pro',
+            'variant_name': 'Monthly', 'user_name': 'Dana Example', 'user_email': 'dana@example.com',
+            'status': 'active', 'status_formatted': 'Active', 'card_brand': 'visa',
+            'card_last_four': '4242', 'pause': None, 'cancelled': False, 'trial_ends_at': None,
+            'billing_anchor': 16, 'first_subscription_item': {
+                'id': 161213, 'subscription_id': 184532, 'price_id': 396114, 'quantity': 1,
+                'is_usage_based': False, 'created_at': '2026-09-16T09:12:44.000000Z',
+                'updated_at': '2026-10-16T09:12:51.000000Z'},
+            'urls': {'update_payment_method': 'https://trustflow.lemonsqueezy.com/subscription/184532/'
+                                              'payment-details?expires=1760620371&signature=' + 'a' * 64,
+                     'customer_portal': 'https://trustflow.lemonsqueezy.com/billing?expires=1760620371'
+                                        '&user=1841221&signature=' + 'b' * 64},
+            'renews_at': '2026-11-16T09:12:40.000000Z', 'ends_at': None,
+            'created_at': '2026-09-16T09:12:44.000000Z', 'updated_at': '2026-10-16T09:12:51.000000Z',
+            'test_mode': False,
+        },
+        'relationships': {name: {'links': {'related': f'https://api.lemonsqueezy.com/v1/subscriptions/184532/{name}',
+                                           'self': f'https://api.lemonsqueezy.com/v1/subscriptions/184532/relationships/{name}'}}
+                          for name in ('store', 'customer', 'order', 'order-item', 'product', 'variant',
+                                       'subscription-items', 'subscription-invoices')},
+        'links': {'self': 'https://api.lemonsqueezy.com/v1/subscriptions/184532'},
+    },
+}
+
+
+def make_request(body: bytes) -> Request:
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {'type': 'http.disconnect'}
+        sent = True
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    scope = {'type': 'http', 'method': 'POST', 'path': '/', 'query_string': b'',
+             'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]}
+    return Request(scope, receive)
+
+
+def sign(raw: bytes) -> str:
+    return hmac.new(SECRET, raw, hashlib.sha256).hexdigest()
+
+
+async def json_before(request):
+    return await request.json()
+
+
+async def json_after(request):
+    return loads(await read_body(request, 1 << 20))
+
+
+async def webhook_before(request):
+    raw = await request.body()
+    hmac.compare_digest(sign(raw), 'x' * 64)
+    return await request.json()
+
+
+async def webhook_after(request):
+    raw = await read_body(request, 1 << 20)
+    hmac.compare_digest(sign(raw), 'x' * 64)
+    return loads(raw)
+
+
+async def measure(fn, body: bytes, iterations: int) -> float:
+    assert await fn(make_request(body)) == json.loads(body)
+    requests = [make_request(body) for _ in range(iterations)]
+    start = time.process_time()
+    for request in requests:
+        await fn(request)
+    return (time.process_time() - start) / iterations * 1e6
+
+
+async def main(args):
+    print(f"decoder: {request_body.JSON_DECODER}")
+    cases = (
+        ('/track', json.dumps(TRACK_EVENT).encode(), json_before, json_after),
+        ('/track/batch x20', json.dumps([TRACK_EVENT] * 20).encode(), json_before, json_after),
+        ('webhook', json.dumps(WEBHOOK).encode(), webhook_before, webhook_after),
+    )
+    for label, body, before, after in cases:
+        before_us = await measure(before, body, args.iterations)
+        after_us = await measure(after, body, args.iterations)
+        print(f"{label:<17} {len(body):6d} bytes   cpu/request {before_us:7.2f} -> {after_us:7.2f} us"
+              f"   ({before_us / after_us:.2f}x)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=50000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,112 @@
+"""
+Benchmark: pre-compressed public cache entries.
+
+For widget payloads (/spaces/{id}/public-data) of growing size, up to
+the unpaged payload of a large space (5000 rows, past the
+PUBLIC_COMPRESS_MAX_BYTES ceiling, so stored uncompressed):
+- wire:  identity vs gzip (and brotli, when installed) body bytes
+- fill:  one-off cost of storing an entry (encode + compress) on a miss
+- hit:   per-request CPU of a cache hit that sends stored bytes, against
+         compressing the body per request (what GZipMiddleware would do)
+- route: cache-hot GET /api/spaces/{id}/public-data through the ASGI app,
+         Accept-Encoding identity vs gzip, br
+
+    cd backend && python -m benchmarks.bench_compression --iterations 2000 --requests 3000
+"""
+import argparse
+import asyncio
+import gzip
+import logging
+import os
+import time
+
+os.environ.setdefault('DATA_BACKEND', 'local')
+os.environ.setdefault('DOMAIN_SCHEDULER_ENABLED', 'false')
+
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+from benchmarks.bench_json_response import make_rows  # noqa: E402
+from response_cache import COMPRESSORS, CachedPayload, ResponseCache, encode_json  # noqa: E402
+
+SPACE_ID = 'bench-space'
+SETTINGS = {'popupsEnabled': True, 'theme': 'light', 'layout': 'carousel', 'delay': 2.5,
+            'colors': {'primary': '#1f2937', 'accent': '#f59e0b'}}
+
+
+def payload(size: int) -> dict:
+    return {'status': 'success', 'next_cursor': None, 'testimonials': make_rows(size),
+            'widget_settings': SETTINGS, 'cta_selector': '#buy'}
+
+
+def per_call_us(fn, iterations: int) -> float:
+    start = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - start) / iterations * 1e6
+
+
+def bench_entries(sizes, iterations: int):
+    cache = ResponseCache()
+    encodings = [name for name, _ in COMPRESSORS]
+    print(f"compressors: {', '.join(encodings)}")
+    for size in sizes:
+        # Fewer iterations for the big payloads so a run stays short
+        iterations_for_size = max(iterations * 100 // max(size, 100), 5)
+        data = payload(size)
+        entry = CachedPayload(encode_json(data))
+        wire = '  '.join(f"{name} {len(entry.variants[name][0]):6d}" for name in entry.encodings) or 'not compressed'
+        fill_us = per_call_us(lambda: CachedPayload(encode_json(data)), max(iterations_for_size // 10, 3))
+        identity_us = per_call_us(lambda: cache.respond(entry, None, 'identity'), iterations_for_size)
+        stored_us = per_call_us(lambda: cache.respond(entry, None, 'gzip, deflate, br'), iterations_for_size)
+        on_the_fly_us = per_call_us(lambda: gzip.compress(entry.body, 6), iterations_for_size)
+        print(f"{size:4d} rows  identity {len(entry.body):6d}  {wire}   fill {fill_us:7.1f} us   "
+              f"hit identity {identity_us:5.1f} / stored {stored_us:5.1f} us   "
+              f"per-request gzip {on_the_fly_us:7.1f} us")
+
+
+async def bench_route(size: int, requests: int, concurrency: int):
+    tables = server.supabase.tables
+    tables['spaces'].append({'id': SPACE_ID, 'slug': 'bench', 'space_name': 'Bench', 'cta_selector': '#buy'})
+    tables['widget_configurations'].append({'space_id': SPACE_ID, 'settings': SETTINGS})
+    for row in make_rows(size):
+        tables['testimonials'].append({**row, 'type': 'text', 'space_id': SPACE_ID, 'is_liked': True})
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with server.app.router.lifespan_context(server.app):
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            url = f'/api/spaces/{SPACE_ID}/public-data?limit={size}'
+            for accept in ('identity', 'gzip, deflate, br'):
+                headers = {'accept-encoding': accept}
+                first = await client.get(url, headers=headers)
+                wire = int(first.headers['content-length'])
+                remaining = requests
+
+                async def worker():
+                    nonlocal remaining
+                    while remaining > 0:
+                        remaining -= 1
+                        response = await client.get(url, headers=headers)
+                        assert response.status_code == 200
+
+                start = time.perf_counter()
+                await asyncio.gather(*(worker() for _ in range(concurrency)))
+                elapsed = time.perf_counter() - start
+                encoding = first.headers.get('content-encoding', 'identity')
+                print(f"route {size} rows  {accept:<18} -> {encoding:<8} {wire:6d} bytes   "
+                      f"{requests / elapsed:7.0f} req/s")
+
+
+async def main(args):
+    logging.disable(logging.WARNING)
+    bench_entries((2, 10, 20, 50, 100, 1000, 5000), args.iterations)
+    await bench_route(args.route_rows, args.requests, args.concurrency)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--route-rows', type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
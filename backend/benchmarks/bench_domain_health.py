@@ -0,0 +1,127 @@
+"""
+Benchmark: concurrent custom-domain health checks with a fake resolver.
+
+Seeds N active domains in the local stand-in backend and runs
+POST /custom-domains/health-check with a FakeResolver that answers after
+5-50 ms with a fixed mix of outcomes:
+
+- healthy:   CNAME -> cname.vercel-dns.com
+- wrong:     CNAME -> somewhere else            (disconnected)
+- nxdomain / noanswer                           (disconnected)
+- flaky:     times out once, then healthy       (retried, stays active)
+- dead:      always times out                   (inconclusive, stays active)
+
+Checks that the endpoint's classification matches the seeded outcomes,
+that all disconnects land in one bulk update (after the paged select), and compares wall time
+against the previous one-lookup-at-a-time behaviour (concurrency 1, no
+retries) on a sample.
+
+    cd backend && python -m benchmarks.bench_domain_health --domains 5000
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+os.environ.setdefault('DATA_BACKEND', 'local')
+
+import dns.exception  # noqa: E402
+import dns.resolver  # noqa: E402
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+from domain_health import DomainHealthChecker  # noqa: E402
+from domain_scheduler import DOMAIN_PAGE_SIZE  # noqa: E402
+
+OUTCOMES = [('healthy', 80), ('wrong', 5), ('nxdomain', 5), ('noanswer', 3), ('flaky', 5), ('dead', 2)]
+
+
+class FakeResolver:
+    def __init__(self, outcomes: dict, seed: int = 42):
+        self.outcomes = outcomes
+        self.rng = random.Random(seed)
+        self.calls = Counter()
+
+    async def resolve(self, name: str, rdtype: str, lifetime: float = None):
+        self.calls[name] += 1
+        await asyncio.sleep(self.rng.uniform(0.005, 0.05))
+        outcome = self.outcomes[name]
+        if outcome == 'nxdomain':
+            raise dns.resolver.NXDOMAIN()
+        if outcome == 'noanswer':
+            raise dns.resolver.NoAnswer()
+        if outcome == 'dead' or (outcome == 'flaky' and self.calls[name] == 1):
+            raise dns.exception.Timeout()
+        target = 'elsewhere.example.net.' if outcome == 'wrong' else 'cname.vercel-dns.com.'
+        return [SimpleNamespace(target=target)]
+
+
+def seed(count: int) -> dict:
+    rng = random.Random(7)
+    kinds = [k for k, _ in OUTCOMES]
+    weights = [w for _, w in OUTCOMES]
+    outcomes = {}
+    rows = []
+    for i in range(count):
+        domain = f"d{i}.customer.test"
+        outcomes[domain] = rng.choices(kinds, weights)[0]
+        rows.append({'id': f'dom-{i}', 'space_id': f'space-{i}', 'domain': domain, 'status': 'active'})
+    server.supabase.tables['custom_domains'] = rows
+    return outcomes
+
+
+async def main(args):
+    outcomes = seed(args.domains)
+    expected = Counter(outcomes.values())
+    print(f"{args.domains:,} active domains: {dict(expected)}")
+
+    # Current checker: bounded concurrency + retries. The scheduler loop isn't
+    # running here, so the endpoint sweeps inline and returns the result.
+    server.domain_scheduler.checker = DomainHealthChecker(
+        FakeResolver(outcomes), concurrency=args.concurrency, timeout=1.0, retries=2, base_delay=0.05
+    )
+    server.domain_scheduler.enabled = False
+    # Count only the sweep's own queries, not the routing table reload it triggers
+    server.domain_scheduler.on_disconnect = None
+    queries_before = server.supabase.query_count
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        start = time.perf_counter()
+        res = await client.post('/api/custom-domains/health-check', params={'admin_key': 'trustflow-admin-secret'})
+        elapsed = time.perf_counter() - start
+    body = res.json()['last_sweep']
+    queries = server.supabase.query_count - queries_before
+
+    want_disconnected = expected['wrong'] + expected['nxdomain'] + expected['noanswer']
+    statuses = Counter(r['status'] for r in server.supabase.tables['custom_domains'])
+    print(f"concurrent ({args.concurrency:>3}) {elapsed * 1000:10.1f} ms   "
+          f"disconnected {body['disconnected']} (expected {want_disconnected}), "
+          f"inconclusive {body['inconclusive']} (expected {expected['dead']}), "
+          f"db queries {queries}")
+    print(f"statuses after: {dict(statuses)}")
+
+    # Previous behaviour: one lookup at a time, no retries (sampled and extrapolated)
+    sample = list(outcomes)[:args.serial_sample]
+    serial = DomainHealthChecker(FakeResolver(outcomes), concurrency=1, timeout=1.0, retries=0)
+    start = time.perf_counter()
+    await serial.check_many(sample)
+    serial_elapsed = (time.perf_counter() - start) * len(outcomes) / len(sample)
+    print(f"serial (est.)    {serial_elapsed * 1000:10.1f} ms   "
+          f"({len(sample)} sampled, {serial_elapsed / elapsed:.0f}x slower)")
+
+    ok = body['disconnected'] == want_disconnected and body['inconclusive'] == expected['dead'] \
+        and statuses['active'] == args.domains - want_disconnected \
+        and queries == args.domains // DOMAIN_PAGE_SIZE + 2  # paged selects + one bulk update
+    print(f"results match: {ok}")
+    server.db.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--domains', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--serial-sample', type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
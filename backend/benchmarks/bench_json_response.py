@@ -0,0 +1,140 @@
+"""
+Benchmark: FastJSONResponse vs FastAPI's default response path.
+
+Two routes of one FastAPI app serve the same testimonial rows:
+- before: response_model=List[TestimonialPublic], return the rows (FastAPI
+          validates every row into the model, dumps it back, json.dumps)
+- after:  return FastJSONResponse(rows) (no validation, orjson)
+
+Reports encode CPU per response and in-process req/s per page size.
+Byte-for-byte compatibility of the route pair and of dumps() against
+JSONResponse.render() over EDGE_PAYLOADS is asserted in
+tests/test_fast_json.py.
+
+    cd backend && python -m benchmarks.bench_json_response --iterations 2000 --requests 3000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from typing import List
+
+os.environ.setdefault('DATA_BACKEND', 'local')
+os.environ.setdefault('DOMAIN_SCHEDULER_ENABLED', 'false')
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+import fast_json  # noqa: E402
+from fast_json import FastJSONResponse, dumps  # noqa: E402
+from server import TestimonialPublic  # noqa: E402
+
+NAMES = ['Zoë Müller', 'José "Pepe" García', '山田 太郎', 'Ana\\Maria', 'O\'Brien', 'Émilie 🎉']
+CONTENTS = [
+    'Great product!\nWould buy again.',
+    'Tab\tseparated and a \u2028 line separator',
+    'Control \x01\x1f chars, DEL \x7f and </script> tags',
+    '5⭐⭐⭐⭐⭐ — “smart quotes” & ümlauts',
+    None,
+]
+
+EDGE_PAYLOADS = [
+    {'status': 'success', 'settings': {'popupsEnabled': True, 'delay': 2.5, 'opacity': 0.85,
+                                       'theme': {'primary': '#1f2937', 'radius': 12, 'fonts': ['Inter', None]}}},
+    {'status': 'success', 'cta_selector': None},
+    {'status': 'success', 'cta_selector': '#buy-now > button[data-x="1"]'},
+    {'big': 2 ** 70, 'neg': -(2 ** 65)},            # beyond 64 bits: stdlib fallback
+    {1: 'int key', 'nested': {2: [1, 2]}},           # non-str keys: stdlib fallback
+    {'floats': [0.1, 1.5, 123456.789, -0.0, 1e15]},
+    [], {}, '', 'plain', 0, True, None,
+]
+
+
+def make_rows(count: int) -> list:
+    rows = []
+    for i in range(count):
+        rows.append({
+            'id': f'8c1f4a2e-{i:04d}-4b7d-9e3a-5f6c7d8e9f0a',
+            'type': 'video' if i % 7 == 0 else 'text',
+            'content': CONTENTS[i % len(CONTENTS)],
+            'video_url': 'https://cdn.example.com/v/abc.mp4' if i % 7 == 0 else None,
+            'rating': (i % 5) + 1 if i % 4 else None,
+            'respondent_name': NAMES[i % len(NAMES)],
+            'respondent_photo_url': f'https://cdn.example.com/p/{i}.jpg' if i % 2 else None,
+            'respondent_role': 'Founder, Example Inc.' if i % 3 else None,
+            'attached_photos': [f'https://cdn.example.com/a/{i}-{j}.jpg' for j in range(i % 3)] if i % 5 else None,
+            'created_at': f'2026-01-{i % 28 + 1:02d}T12:{i % 60:02d}:00+00:00',
+        })
+    return rows
+
+
+def build_app(rows_by_size: dict) -> FastAPI:
+    app = FastAPI()
+
+    @app.get('/before/{size}', response_model=List[TestimonialPublic])
+    async def before(size: int):
+        return rows_by_size[size]
+
+    @app.get('/after/{size}', response_model=List[TestimonialPublic])
+    async def after(size: int):
+        return FastJSONResponse(rows_by_size[size])
+
+    return app
+
+
+def bench_encode(rows_by_size: dict, iterations: int) -> None:
+    from pydantic import TypeAdapter
+    adapter = TypeAdapter(List[TestimonialPublic])
+    reference = JSONResponse(content=None)
+    for size, rows in rows_by_size.items():
+        start = time.process_time()
+        for _ in range(iterations):
+            # What FastAPI's serialize_response does for a response_model (pydantic v2)
+            reference.render(adapter.dump_python(adapter.validate_python(rows), mode='json'))
+        before_us = (time.process_time() - start) / iterations * 1e6
+        start = time.process_time()
+        for _ in range(iterations):
+            dumps(rows)
+        after_us = (time.process_time() - start) / iterations * 1e6
+        print(f"encode {size:4d} rows   {before_us:9.1f} -> {after_us:7.1f} us   ({before_us / after_us:.1f}x)")
+
+
+async def bench_routes(client: httpx.AsyncClient, sizes, requests: int, concurrency: int) -> None:
+    for size in sizes:
+        rates = {}
+        for variant in ('before', 'after'):
+            remaining = requests
+
+            async def worker():
+                nonlocal remaining
+                while remaining > 0:
+                    remaining -= 1
+                    response = await client.get(f'/{variant}/{size}')
+                    assert response.status_code == 200
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            rates[variant] = requests / (time.perf_counter() - start)
+        print(f"route  {size:4d} rows   {rates['before']:7.0f} -> {rates['after']:7.0f} req/s   "
+              f"({rates['after'] / rates['before']:.2f}x)")
+
+
+async def main(args):
+    logging.disable(logging.WARNING)
+    print(f"encoder: {fast_json.JSON_ENCODER}")
+    sizes = (1, 20, 100)
+    rows_by_size = {size: make_rows(size) for size in sizes}
+    transport = httpx.ASGITransport(app=build_app(rows_by_size))
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        bench_encode(rows_by_size, args.iterations)
+        await bench_routes(client, sizes, args.requests, args.concurrency)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--concurrency', type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,95 @@
+"""
+Benchmark: sequential vs concurrent public-data lookups.
+
+Loads the widget payload for one space against the local stand-in backend
+with an injected per-query latency, first with the original one-after-another
+awaits, then with the concurrent fan-out in server._load_space_public_data.
+
+    cd backend && python -m benchmarks.bench_public_data --latency-ms 20 --iterations 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault('DATA_BACKEND', 'local')
+
+import server  # noqa: E402
+
+
+SPACE_ID = 'bench-space'
+
+
+def seed(testimonials: int):
+    tables = server.supabase.tables
+    tables['spaces'].append({'id': SPACE_ID, 'slug': 'bench', 'space_name': 'Bench', 'cta_selector': '#buy'})
+    tables['widget_configurations'].append({'space_id': SPACE_ID, 'settings': {'popupsEnabled': True}})
+    for i in range(testimonials):
+        tables['testimonials'].append({
+            'id': f't{i}', 'space_id': SPACE_ID, 'is_liked': True, 'type': 'text',
+            'content': 'Great product!', 'rating': 5, 'respondent_name': f'User {i}',
+            'created_at': f'2026-01-01T00:00:{i % 60:02d}+00:00',
+        })
+
+
+async def load_sequential(space_id: str) -> dict:
+    """The pre-fan-out implementation: three awaits in a row"""
+    db = server.db
+    testimonials_res = await db.execute(
+        db.table('testimonials')
+        .select('id, is_liked, type, content, video_url, rating, respondent_name, respondent_photo_url, respondent_role, attached_photos, created_at')
+        .eq('space_id', space_id)
+        .eq('is_liked', True)
+        .eq('type', 'text')
+        .order('created_at', desc=True)
+    )
+    settings_res = await db.execute(
+        db.table('widget_configurations').select('settings').eq('space_id', space_id)
+    )
+    cta_res = await db.execute(
+        db.table('spaces').select('cta_selector').eq('id', space_id).single()
+    )
+    return {
+        "status": "success",
+        "testimonials": testimonials_res.data or [],
+        "widget_settings": settings_res.data[0]['settings'] if settings_res.data else {},
+        "cta_selector": cta_res.data.get('cta_selector') if cta_res.data else None
+    }
+
+
+async def measure(fn, iterations: int) -> list:
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await fn(SPACE_ID)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(label: str, timings: list):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<12} mean {statistics.mean(timings):7.2f} ms   p50 {statistics.median(timings):7.2f} ms   p95 {p95:7.2f} ms")
+
+
+async def main(args):
+    server.supabase.latency = args.latency_ms / 1000
+    seed(args.testimonials)
+
+    sequential = await measure(load_sequential, args.iterations)
+    concurrent = await measure(server._load_space_public_data, args.iterations)
+
+    print(f"public-data lookups, {args.latency_ms} ms injected latency per query, {args.iterations} iterations")
+    report("sequential", sequential)
+    report("concurrent", concurrent)
+    print(f"speedup      {statistics.mean(sequential) / statistics.mean(concurrent):.2f}x")
+    server.db.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--testimonials', type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,116 @@
+"""
+Load test: request coalescing under a cold-cache burst.
+
+Fires N concurrent requests for the same space at
+GET /spaces/{id}/public-data and GET /widget-settings/{id} against the
+local stand-in backend (with per-query latency), once with single-flight
+disabled and once enabled, and reports backend queries and wall time.
+The public payload cache is cleared before each burst so every request
+starts cold.
+
+Also checks the coalescing semantics directly:
+- an error reaches every waiter and is not remembered
+- cancelling the first caller doesn't cancel the shared call
+
+    cd backend && python -m benchmarks.bench_singleflight --requests 500 --latency-ms 20
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+os.environ.setdefault('DATA_BACKEND', 'local')
+
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+from singleflight import SingleFlight  # noqa: E402
+
+SPACE_ID = 'bench-space'
+
+
+def seed(testimonials: int):
+    tables = server.supabase.tables
+    tables['spaces'].append({'id': SPACE_ID, 'slug': 'bench', 'space_name': 'Bench', 'cta_selector': '#buy'})
+    tables['widget_configurations'].append({'space_id': SPACE_ID, 'settings': {'popupsEnabled': True}})
+    for i in range(testimonials):
+        tables['testimonials'].append({
+            'id': f't{i:05d}', 'space_id': SPACE_ID, 'is_liked': True, 'type': 'text',
+            'content': 'Great product!', 'rating': 5, 'respondent_name': f'User {i}',
+            'created_at': f'2026-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}+00:00',
+        })
+
+
+async def burst(client: httpx.AsyncClient, path: str, requests: int, enabled: bool):
+    server.public_flights.enabled = enabled
+    server.public_cache.clear()
+    before = server.supabase.query_count
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(client.get(path) for _ in range(requests)))
+    elapsed = (time.perf_counter() - start) * 1000
+    queries = server.supabase.query_count - before
+    # public-data degrades to status "partial"/"error" when lookups time out
+    degraded = sum(1 for r in responses if r.status_code != 200 or r.json().get('status') != 'success')
+    label = 'single-flight' if enabled else 'no coalescing'
+    print(f"  {label:<14} {queries:6d} queries {elapsed:10.1f} ms   degraded responses {degraded}")
+    return queries
+
+
+async def check_semantics():
+    flights = SingleFlight(enabled=True)
+    runs = 0
+
+    async def failing():
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("backend down")
+
+    results = await asyncio.gather(*(flights.do(('k',), failing) for _ in range(10)), return_exceptions=True)
+    errors_shared = runs == 1 and all(isinstance(r, RuntimeError) for r in results)
+    await asyncio.gather(flights.do(('k',), failing), return_exceptions=True)
+    errors_not_cached = runs == 2
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return 'value'
+
+    leader = asyncio.ensure_future(flights.do(('c',), slow))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(flights.do(('c',), slow))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    survived = await follower == 'value' and leader.cancelled()
+
+    print(f"semantics: errors shared {errors_shared}, errors not cached {errors_not_cached}, "
+          f"leader cancellation isolated {survived}")
+
+
+async def main(args):
+    # The uncoalesced burst logs a warning per timed-out lookup
+    logging.disable(logging.WARNING)
+    server.supabase.latency = args.latency_ms / 1000
+    seed(args.testimonials)
+    print(f"{args.requests} concurrent requests, {args.latency_ms} ms per backend query, "
+          f"DB_MAX_CONCURRENCY={server.db.max_concurrency}")
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+        for path in (f'/api/spaces/{SPACE_ID}/public-data', f'/api/widget-settings/{SPACE_ID}'):
+            print(path)
+            without = await burst(client, path, args.requests, enabled=False)
+            with_sf = await burst(client, path, args.requests, enabled=True)
+            print(f"  queries: {without} -> {with_sf}")
+
+    await check_semantics()
+    print(server.public_flights.stats())
+    server.db.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--testimonials', type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
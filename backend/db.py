@@ -0,0 +1,93 @@
+"""
+Async data-access layer for TrustFlow.
+
+The supabase-py client is synchronous: every ``.execute()`` is a blocking
+HTTP round trip to PostgREST. Calling it directly from an ``async def``
+route stalls the single uvicorn event loop for the whole round trip.
+
+``Database`` wraps the client behind one interface. Routes build their
+queries exactly as before (``db.table(...).select(...).eq(...)``) and hand
+the builder to ``await db.execute(query)``, which runs the blocking call on
+a bounded thread pool. A semaphore caps how many calls may be in flight at
+once so a slow backend cannot pile up unbounded work.
+"""
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+
+from metrics import DB_QUERY_DURATION, DB_QUERY_ERRORS, query_labels
+from profiler import record_query
+
+logger = logging.getLogger(__name__)
+
+# Concurrency limits (override via environment)
+DB_MAX_WORKERS = int(os.environ.get('DB_MAX_WORKERS', '16'))
+DB_MAX_CONCURRENCY = int(os.environ.get('DB_MAX_CONCURRENCY', str(DB_MAX_WORKERS)))
+
+
+class Database:
+    """
+    Repository interface over a supabase (or local stand-in) client.
+
+    - table()/rpc() return the client's own query builders
+    - execute() runs a builder's blocking .execute() off the event loop
+    - run() does the same for any other blocking client call (e.g. auth)
+    """
+
+    def __init__(self, client: Any, max_workers: int = DB_MAX_WORKERS,
+                 max_concurrency: int = DB_MAX_CONCURRENCY):
+        self.client = client
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='db')
+        # One semaphore per event loop (asyncio primitives are loop-bound)
+        self._semaphores = {}
+
+    @property
+    def auth(self):
+        return self.client.auth
+
+    def table(self, name: str):
+        return self.client.table(name)
+
+    def rpc(self, fn: str, params: dict):
+        return self.client.rpc(fn, params)
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores = {l: s for l, s in self._semaphores.items() if not l.is_closed()}
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking client call on the worker pool"""
+        async with self._semaphore():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+
+    async def execute(self, query: Any) -> Any:
+        """Execute a query builder without blocking the event loop (timed per table)"""
+        table, op = query_labels(query)
+        start = time.perf_counter()
+        error = False
+        try:
+            return await self.run(query.execute)
+        except Exception:
+            error = True
+            DB_QUERY_ERRORS.inc(table, op)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            DB_QUERY_DURATION.observe(elapsed, table, op)
+            record_query(table, op, start, elapsed, error)
+
+    def shutdown(self, wait: bool = True):
+        logger.info("Shutting down database worker pool")
+        self._executor.shutdown(wait=wait)
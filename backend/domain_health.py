@@ -0,0 +1,137 @@
+"""
+Concurrent CNAME checks for custom domains.
+
+health_check_domains used to call the blocking dns.resolver.resolve once
+per active domain, serially, inside the async handler. DomainHealthChecker
+resolves with dns.asyncresolver instead:
+
+- at most DNS_CHECK_CONCURRENCY lookups in flight (semaphore)
+- each attempt bounded by DNS_LOOKUP_TIMEOUT seconds
+- transient failures (timeout, no reachable nameservers, other resolver
+  errors) are retried DNS_CHECK_RETRIES times with jittered exponential
+  backoff; a domain that still only fails transiently is reported as
+  inconclusive rather than unhealthy, so one bad resolver minute doesn't
+  disconnect every domain
+- NXDOMAIN / no CNAME / wrong target are definitive and never retried;
+  a domain is healthy if any of its CNAME records points at Vercel
+
+The resolver is injectable (anything with an async
+resolve(name, rdtype, lifetime=...)), which is how
+benchmarks/bench_domain_health.py drives thousands of fake domains and
+tests/test_domain_health.py scripts each outcome.
+"""
+import asyncio
+import logging
+import os
+import random
+from contextlib import nullcontext
+from typing import Any, Iterable, List, Optional
+
+import dns.asyncresolver
+import dns.exception
+import dns.resolver
+
+logger = logging.getLogger(__name__)
+
+# Vercel's CNAME targets (universal for all Vercel-hosted domains)
+VERCEL_CNAME_TARGETS = ('cname.vercel-dns.com', 'cname-china.vercel-dns.com')
+
+DNS_CHECK_CONCURRENCY = int(os.environ.get('DNS_CHECK_CONCURRENCY', '50'))
+DNS_LOOKUP_TIMEOUT = float(os.environ.get('DNS_LOOKUP_TIMEOUT', '3.0'))  # seconds per attempt
+DNS_CHECK_RETRIES = int(os.environ.get('DNS_CHECK_RETRIES', '2'))
+DNS_RETRY_BASE_DELAY = float(os.environ.get('DNS_RETRY_BASE_DELAY', '0.25'))  # seconds
+
+
+class CnameResult:
+    """
+    Outcome of checking one domain.
+    healthy is True/False for a definitive answer and None when every
+    attempt failed transiently. error is one of 'nxdomain', 'no_answer',
+    'wrong_target', 'timeout', 'no_nameservers', 'error' or None.
+    """
+    __slots__ = ('domain', 'cname', 'healthy', 'error', 'attempts')
+
+    def __init__(self, domain: str, cname: Optional[str], healthy: Optional[bool],
+                 error: Optional[str], attempts: int):
+        self.domain = domain
+        self.cname = cname
+        self.healthy = healthy
+        self.error = error
+        self.attempts = attempts
+
+    @property
+    def inconclusive(self) -> bool:
+        return self.healthy is None
+
+
+def is_vercel_target(cname: Optional[str]) -> bool:
+    return bool(cname) and cname.lower() in VERCEL_CNAME_TARGETS
+
+
+class DomainHealthChecker:
+    def __init__(self, resolver: Any = None,
+                 concurrency: int = DNS_CHECK_CONCURRENCY,
+                 timeout: float = DNS_LOOKUP_TIMEOUT,
+                 retries: int = DNS_CHECK_RETRIES,
+                 base_delay: float = DNS_RETRY_BASE_DELAY):
+        self.resolver = resolver or dns.asyncresolver.Resolver()
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.base_delay = base_delay
+
+    async def _resolve_once(self, domain: str) -> Optional[str]:
+        """A Vercel target if any record points at one, else the first target (None if empty)"""
+        # wait_for backs up the resolver's own lifetime in case it overruns
+        answers = await asyncio.wait_for(
+            self.resolver.resolve(domain, 'CNAME', lifetime=self.timeout),
+            self.timeout + 0.5
+        )
+        first = None
+        for rdata in answers:
+            cname = str(rdata.target).rstrip('.')
+            if is_vercel_target(cname):
+                return cname
+            if first is None:
+                first = cname
+        return first
+
+    async def lookup(self, domain: str, semaphore: Optional[asyncio.Semaphore] = None) -> CnameResult:
+        """
+        Resolve one domain's CNAME, retrying transient failures with jitter.
+        The semaphore slot is held per attempt, not across backoff sleeps.
+        """
+        error = None
+        for attempt in range(1, self.retries + 2):
+            try:
+                async with semaphore or nullcontext():
+                    cname = await self._resolve_once(domain)
+            except dns.resolver.NXDOMAIN:
+                return CnameResult(domain, None, False, 'nxdomain', attempt)
+            except dns.resolver.NoAnswer:
+                return CnameResult(domain, None, False, 'no_answer', attempt)
+            except (dns.exception.Timeout, asyncio.TimeoutError):
+                error = 'timeout'
+            except dns.resolver.NoNameservers:
+                error = 'no_nameservers'
+            except Exception as e:
+                logger.debug(f"DNS lookup error for {domain}: {e}")
+                error = 'error'
+            else:
+                if cname is None:
+                    return CnameResult(domain, None, False, 'no_answer', attempt)
+                if is_vercel_target(cname):
+                    return CnameResult(domain, cname, True, None, attempt)
+                return CnameResult(domain, cname, False, 'wrong_target', attempt)
+
+            if attempt <= self.retries:
+                # ±50% jitter on the exponential step keeps retries from synchronizing
+                delay = self.base_delay * (2 ** (attempt - 1))
+                await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+
+        return CnameResult(domain, None, None, error, self.retries + 1)
+
+    async def check_many(self, domains: Iterable[str]) -> List[CnameResult]:
+        """Check all domains concurrently (bounded); results are in input order"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        return await asyncio.gather(*(self.lookup(d, semaphore) for d in domains))
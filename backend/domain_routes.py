@@ -0,0 +1,243 @@
+"""
+In-process hostname -> space routing table for custom domains.
+
+/custom-domains/resolve used to run a joined custom_domains -> spaces
+query for every visitor on a custom domain. The set of active domains
+only changes when an admin activates one, a domain is deleted, or a
+health sweep disconnects it, so DomainRoutingTable keeps the whole set in
+a dict:
+
+- loaded at startup, reloaded right after those transitions
+  (invalidate()) and in the background once older than ROUTING_TABLE_TTL,
+  so other workers' changes are picked up too
+- a branding edit to a routed space re-reads only that space's domains
+  (invalidate_space(), one indexed query); calls arriving while that read
+  is in flight share it plus at most one follow-up read
+- a hostname not in the table gets one indexed fallback lookup (it may
+  have been activated by another worker since the last load); the
+  concurrency of those lookups is capped and unknown hostnames are kept
+  in a bounded negative cache, so a flood of random Host headers costs
+  at most one query per distinct name
+- a failed load backs off (ROUTING_RETRY_MIN doubling up to
+  ROUTING_RETRY_MAX) before the next attempt; until then requests are
+  served from the last good table, or by per-hostname fallback lookups if
+  no load has succeeded yet, so a database blip never turns into one
+  full-table load per request
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Optional, Set
+
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+ROUTING_TABLE_TTL = float(os.environ.get('ROUTING_TABLE_TTL', '60'))  # seconds
+ROUTING_NEGATIVE_SIZE = int(os.environ.get('ROUTING_NEGATIVE_SIZE', '10000'))
+ROUTING_NEGATIVE_TTL = int(os.environ.get('ROUTING_NEGATIVE_TTL', '300'))  # seconds
+ROUTING_MISS_CONCURRENCY = int(os.environ.get('ROUTING_MISS_CONCURRENCY', '4'))
+ROUTING_RETRY_MIN = float(os.environ.get('ROUTING_RETRY_MIN', '1'))  # seconds
+ROUTING_RETRY_MAX = float(os.environ.get('ROUTING_RETRY_MAX', '60'))  # seconds
+ROUTING_PAGE_SIZE = 1000
+
+ROUTE_COLUMNS = 'id, domain, status, spaces(id, slug, space_name, logo_url, header_title, custom_message, collect_star_rating)'
+
+
+def normalize_host(hostname: str) -> str:
+    return hostname.strip().lower().rstrip('.')
+
+
+def _route(row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if not row.get('spaces'):
+        return None
+    return {
+        "space": row['spaces'],
+        "domain": {"id": row['id'], "domain": row['domain'], "status": row['status']},
+    }
+
+
+class DomainRoutingTable:
+    def __init__(self, db: Any, ttl: float = ROUTING_TABLE_TTL,
+                 negative_size: int = ROUTING_NEGATIVE_SIZE,
+                 negative_ttl: int = ROUTING_NEGATIVE_TTL,
+                 miss_concurrency: int = ROUTING_MISS_CONCURRENCY,
+                 retry_min: float = ROUTING_RETRY_MIN,
+                 retry_max: float = ROUTING_RETRY_MAX):
+        self.db = db
+        self.ttl = ttl
+        self.miss_concurrency = miss_concurrency
+        self.retry_min = retry_min
+        self.retry_max = retry_max
+        self._routes: Dict[str, Dict[str, Any]] = {}
+        self._negative = TTLCache(maxsize=negative_size, ttl=negative_ttl)
+        self._loaded_at: Optional[float] = None
+        # After a failed load: no new attempt before _retry_at (monotonic)
+        self._retry_at: Optional[float] = None
+        self._consecutive_failures = 0
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._miss_semaphore: Optional[asyncio.Semaphore] = None
+        # space_id -> in-flight per-space reload, and spaces edited since it started
+        self._space_refreshes: Dict[str, asyncio.Task] = {}
+        self._stale_spaces: Set[str] = set()
+
+        # Metrics
+        self.hits = 0
+        self.negative_hits = 0
+        self.fallback_lookups = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.space_refreshes = 0
+
+    async def start(self):
+        self._miss_semaphore = asyncio.Semaphore(self.miss_concurrency)
+        await self.refresh()
+
+    async def refresh(self):
+        """Reload every active domain (paged) and swap the table in one assignment"""
+        routes = {}
+        try:
+            offset = 0
+            while True:
+                res = await self.db.execute(
+                    self.db.table('custom_domains')
+                    .select(ROUTE_COLUMNS)
+                    .eq('status', 'active')
+                    .order('id')
+                    .range(offset, offset + ROUTING_PAGE_SIZE - 1)
+                )
+                rows = res.data or []
+                for row in rows:
+                    route = _route(row)
+                    if route:
+                        routes[normalize_host(row['domain'])] = route
+                if len(rows) < ROUTING_PAGE_SIZE:
+                    break
+                offset += ROUTING_PAGE_SIZE
+        except Exception as e:
+            self.refresh_failures += 1
+            self._consecutive_failures += 1
+            delay = min(self.retry_min * 2 ** (self._consecutive_failures - 1), self.retry_max)
+            self._retry_at = time.monotonic() + delay
+            logger.error(f"Failed to load custom domain routing table, retrying in {delay:.0f}s: {e}")
+            return
+        # Negative entries can stay: the table is checked before them
+        self._routes = routes
+        self._loaded_at = time.monotonic()
+        self._retry_at = None
+        self._consecutive_failures = 0
+        self.refreshes += 1
+        logger.info(f"Custom domain routing table loaded ({len(routes)} active domains)")
+
+    def _refresh_in_background(self) -> asyncio.Task:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh())
+        return self._refresh_task
+
+    def _may_refresh(self) -> bool:
+        return self._retry_at is None or time.monotonic() >= self._retry_at
+
+    async def invalidate(self):
+        """Reload now (after activate/delete/disconnect), waiting for the new table"""
+        if self._refresh_task and not self._refresh_task.done():
+            await self._refresh_task
+        await self.refresh()
+
+    async def invalidate_space(self, space_id: str):
+        """Re-read a routed space's domains (its branding is part of the cached route)"""
+        if not any(route["space"].get('id') == space_id for route in self._routes.values()):
+            return
+        self._stale_spaces.add(space_id)
+        task = self._space_refreshes.get(space_id)
+        if task is None:
+            task = asyncio.create_task(self._refresh_space(space_id))
+            self._space_refreshes[space_id] = task
+        # A caller going away must not cancel the reload others are waiting on
+        await asyncio.shield(task)
+
+    async def _refresh_space(self, space_id: str):
+        try:
+            # Loop until no edit arrived after the last read started
+            while space_id in self._stale_spaces:
+                self._stale_spaces.discard(space_id)
+                try:
+                    res = await self.db.execute(
+                        self.db.table('custom_domains')
+                        .select(ROUTE_COLUMNS)
+                        .eq('space_id', space_id)
+                        .eq('status', 'active')
+                    )
+                except Exception as e:
+                    self.refresh_failures += 1
+                    logger.error(f"Failed to reload custom domain routes for space {space_id}: {e}")
+                    return
+                routes = {host: route for host, route in self._routes.items()
+                          if route["space"].get('id') != space_id}
+                for row in res.data or []:
+                    route = _route(row)
+                    if route:
+                        routes[normalize_host(row['domain'])] = route
+                self._routes = routes
+                self.space_refreshes += 1
+        finally:
+            self._space_refreshes.pop(space_id, None)
+
+    async def _lookup(self, host: str) -> Optional[Dict[str, Any]]:
+        if self._miss_semaphore is None:
+            self._miss_semaphore = asyncio.Semaphore(self.miss_concurrency)
+        async with self._miss_semaphore:
+            # Another request may have resolved it while we waited
+            if host in self._routes:
+                return self._routes[host]
+            if host in self._negative:
+                return None
+            self.fallback_lookups += 1
+            res = await self.db.execute(
+                self.db.table('custom_domains')
+                .select(ROUTE_COLUMNS)
+                .eq('domain', host)
+                .eq('status', 'active')
+            )
+        route = _route(res.data[0]) if res.data else None
+        if route:
+            self._routes[host] = route
+        else:
+            self._negative[host] = True
+        return route
+
+    async def resolve(self, hostname: str) -> Optional[Dict[str, Any]]:
+        """{"space": ..., "domain": ...} for an active custom domain, else None"""
+        if self._loaded_at is None:
+            if self._may_refresh():
+                # Concurrent first requests share one load
+                await asyncio.shield(self._refresh_in_background())
+            # Still unloaded (backing off): misses go to the fallback lookup
+        elif time.monotonic() - self._loaded_at > self.ttl and self._may_refresh():
+            # Serve the current table while a fresh copy loads
+            self._refresh_in_background()
+
+        host = normalize_host(hostname)
+        route = self._routes.get(host)
+        if route is not None:
+            self.hits += 1
+            return route
+        if host in self._negative:
+            self.negative_hits += 1
+            return None
+        return await self._lookup(host)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active_domains": len(self._routes),
+            "negative_entries": len(self._negative),
+            "negative_capacity": self._negative.maxsize,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "fallback_lookups": self.fallback_lookups,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "retry_in_seconds": round(max(self._retry_at - time.monotonic(), 0), 1) if self._retry_at else None,
+            "space_refreshes": self.space_refreshes,
+            "age_seconds": round(time.monotonic() - self._loaded_at, 1) if self._loaded_at else None,
+        }
@@ -0,0 +1,276 @@
+"""
+Background DNS work for custom domains.
+
+Verification and health checks used to run inside HTTP requests: the
+user's "Verify" click waited on a blocking DNS lookup, and active domains
+were only swept when an admin called the health-check endpoint.
+DomainScheduler runs that work in-process, started from the app lifespan:
+
+- pending/failed domains are re-verified on their own schedule with
+  exponential backoff (DOMAIN_VERIFY_BASE_DELAY doubling per failed
+  check, capped at DOMAIN_VERIFY_MAX_DELAY)
+- active domains are swept every DOMAIN_HEALTH_SWEEP_INTERVAL seconds
+- request_verify() / request_sweep() let endpoints queue work for the
+  next loop iteration and return immediately with the last known state
+
+Status writes are batched: one update per resulting status, not per
+domain. Each update is guarded by the status the domains were selected
+under, so an admin activating, deleting or re-verifying a domain while its
+DNS check runs is never overwritten. Selects are paged on id so
+PostgREST's row cap can't drop domains. State (backoff, last results) is
+per process.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from domain_health import DomainHealthChecker, CnameResult
+
+logger = logging.getLogger(__name__)
+
+DOMAIN_SCHEDULER_ENABLED = os.environ.get('DOMAIN_SCHEDULER_ENABLED', 'true').lower() == 'true'
+DOMAIN_SCHEDULER_TICK = float(os.environ.get('DOMAIN_SCHEDULER_TICK', '30'))  # seconds
+DOMAIN_VERIFY_BASE_DELAY = float(os.environ.get('DOMAIN_VERIFY_BASE_DELAY', '60'))  # seconds
+DOMAIN_VERIFY_MAX_DELAY = float(os.environ.get('DOMAIN_VERIFY_MAX_DELAY', '21600'))  # 6 hours
+DOMAIN_HEALTH_SWEEP_INTERVAL = float(os.environ.get('DOMAIN_HEALTH_SWEEP_INTERVAL', '3600'))  # seconds
+
+EXPECTED_CNAME = 'cname.vercel-dns.com'
+VERIFIABLE_STATUSES = ['pending', 'failed']
+DOMAIN_PAGE_SIZE = 1000
+
+
+def verification_message(result: CnameResult) -> str:
+    """User-facing explanation of a verification result"""
+    if result.healthy:
+        return "DNS verified! Awaiting activation by admin. This usually takes 24-48 hours."
+    return {
+        'wrong_target': f"CNAME points to wrong target. Found: {result.cname}. Expected: {EXPECTED_CNAME}",
+        'nxdomain': "Domain does not exist. Please check the domain name.",
+        'no_answer': "No CNAME record found. Please add the CNAME record in your DNS settings.",
+        'timeout': "DNS lookup timed out. We'll keep checking automatically.",
+        'no_nameservers': "Could not reach DNS servers. We'll keep checking automatically.",
+    }.get(result.error, f"DNS lookup failed. Make sure your domain has a CNAME record pointing to {EXPECTED_CNAME}")
+
+
+class DomainScheduler:
+    def __init__(self, db: Any, checker: DomainHealthChecker,
+                 enabled: bool = DOMAIN_SCHEDULER_ENABLED,
+                 tick: float = DOMAIN_SCHEDULER_TICK,
+                 base_delay: float = DOMAIN_VERIFY_BASE_DELAY,
+                 max_delay: float = DOMAIN_VERIFY_MAX_DELAY,
+                 sweep_interval: float = DOMAIN_HEALTH_SWEEP_INTERVAL,
+                 on_disconnect: Optional[Callable[[], Awaitable[None]]] = None):
+        self.db = db
+        # Called after a sweep disconnects domains (e.g. to reload the routing table)
+        self.on_disconnect = on_disconnect
+        self.checker = checker
+        self.enabled = enabled
+        self.tick = tick
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sweep_interval = sweep_interval
+
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._requested: set = set()
+        self._in_flight: set = set()
+        self._sweep_requested = False
+        self._next_sweep_at = 0.0
+
+        # domain_id -> consecutive failed checks / monotonic time of next check
+        self._failures: Dict[str, int] = {}
+        self._next_check: Dict[str, float] = {}
+        # domain_id -> last verification result (as returned by the API)
+        self.last_checks: Dict[str, Dict[str, Any]] = {}
+        self.last_sweep: Optional[Dict[str, Any]] = None
+
+    async def start(self):
+        if not self.enabled:
+            logger.info("Domain scheduler disabled")
+            return
+        self._wake = asyncio.Event()
+        self._next_sweep_at = time.monotonic() + self.sweep_interval
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Domain scheduler started (tick={self.tick}s, sweep every {self.sweep_interval}s)")
+
+    async def stop(self):
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Domain scheduler stopped")
+
+    # --- Requests from endpoints ---
+    def request_verify(self, domain_id: str):
+        """Check this domain on the next loop iteration, ignoring its backoff"""
+        self._requested.add(domain_id)
+        if self._wake:
+            self._wake.set()
+
+    def request_sweep(self):
+        self._sweep_requested = True
+        if self._wake:
+            self._wake.set()
+
+    def is_queued(self, domain_id: str) -> bool:
+        """Requested or currently being checked"""
+        return domain_id in self._requested or domain_id in self._in_flight
+
+    def next_check_in(self, domain_id: str) -> Optional[float]:
+        due = self._next_check.get(domain_id)
+        return max(0.0, round(due - time.monotonic(), 1)) if due is not None else None
+
+    # --- Loop ---
+    async def _run(self):
+        while True:
+            # Cleared before the work so requests made during it wake the next iteration
+            self._wake.clear()
+            try:
+                await self.run_due_verifications()
+                if self._sweep_requested or time.monotonic() >= self._next_sweep_at:
+                    self._sweep_requested = False
+                    self._next_sweep_at = time.monotonic() + self.sweep_interval
+                    await self.sweep_active()
+            except Exception as e:
+                logger.error(f"Domain scheduler iteration failed: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.tick)
+            except asyncio.TimeoutError:
+                pass
+
+    def _backoff(self, domain_id: str) -> float:
+        failures = self._failures.get(domain_id, 0)
+        return min(self.base_delay * (2 ** max(failures - 1, 0)), self.max_delay)
+
+    async def _select_domains(self, columns: str, statuses: List[str]) -> List[Dict[str, Any]]:
+        """Every custom domain in the given statuses, paged on id"""
+        rows = []
+        offset = 0
+        while True:
+            response = await self.db.execute(
+                self.db.table('custom_domains')
+                .select(columns)
+                .in_('status', statuses)
+                .order('id')
+                .range(offset, offset + DOMAIN_PAGE_SIZE - 1)
+            )
+            page = response.data or []
+            rows.extend(page)
+            if len(page) < DOMAIN_PAGE_SIZE:
+                return rows
+            offset += DOMAIN_PAGE_SIZE
+
+    async def run_due_verifications(self) -> List[Dict[str, Any]]:
+        """Verify pending/failed domains whose backoff has elapsed (or that were requested)"""
+        rows = await self._select_domains('id, domain, status', VERIFIABLE_STATUSES)
+        now = time.monotonic()
+        requested, self._requested = self._requested, set()
+        due = [
+            row for row in rows
+            if row['id'] in requested or self._next_check.get(row['id'], 0) <= now
+        ]
+        if not due:
+            return []
+        return await self.verify(due)
+
+    async def verify(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        ids = {row['id'] for row in rows}
+        self._in_flight |= ids
+        try:
+            return await self._verify(rows)
+        finally:
+            self._in_flight -= ids
+
+    async def _verify(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        results = await self.checker.check_many([row['domain'] for row in rows])
+        checked_at = datetime.now(timezone.utc).isoformat()
+
+        verified_ids, failed_ids, states = [], [], []
+        for row, result in zip(rows, results):
+            if result.healthy:
+                verified_ids.append(row['id'])
+                self._failures.pop(row['id'], None)
+                self._next_check.pop(row['id'], None)
+                dns_status = 'dns_verified'
+                # Log for admin notification
+                logger.info(f"🔔 ADMIN ACTION REQUIRED: Domain '{row['domain']}' DNS verified. Add to Vercel dashboard.")
+            else:
+                if result.healthy is False:
+                    failed_ids.append(row['id'])
+                    dns_status = 'failed'
+                else:
+                    # Inconclusive (transient DNS errors): keep the current status
+                    dns_status = row['status']
+                self._failures[row['id']] = self._failures.get(row['id'], 0) + 1
+                self._next_check[row['id']] = time.monotonic() + self._backoff(row['id'])
+
+            state = {
+                "domain_id": row['id'],
+                "domain": row['domain'],
+                "verified": bool(result.healthy),
+                "dns_status": dns_status,
+                "message": verification_message(result),
+                "cname_found": result.cname,
+                "error": result.error,
+                "expected_cname": EXPECTED_CNAME,
+                "checked_at": checked_at,
+            }
+            self.last_checks[row['id']] = state
+            states.append(state)
+
+        if verified_ids:
+            await self.db.execute(
+                self.db.table('custom_domains')
+                .update({'status': 'dns_verified', 'dns_verified_at': checked_at})
+                .in_('id', verified_ids)
+                .in_('status', VERIFIABLE_STATUSES)
+            )
+        if failed_ids:
+            await self.db.execute(
+                self.db.table('custom_domains')
+                .update({'status': 'failed'})
+                .in_('id', failed_ids)
+                .in_('status', VERIFIABLE_STATUSES)
+            )
+        return states
+
+    async def sweep_active(self) -> Dict[str, Any]:
+        """
+        Check all active domains; definitive failures are disconnected in
+        one bulk update, transient-only failures are left active.
+        """
+        domains = await self._select_domains('id, domain', ['active'])
+        checks = await self.checker.check_many([d['domain'] for d in domains])
+        checked_at = datetime.now(timezone.utc).isoformat()
+
+        disconnected = [d for d, c in zip(domains, checks) if c.healthy is False]
+        if disconnected:
+            await self.db.execute(
+                self.db.table('custom_domains')
+                .update({'status': 'disconnected', 'disconnected_at': checked_at})
+                .in_('id', [d['id'] for d in disconnected])
+                .eq('status', 'active')
+            )
+            for domain in disconnected:
+                logger.warning(f"⚠️ Domain '{domain['domain']}' marked as DISCONNECTED")
+            if self.on_disconnect:
+                await self.on_disconnect()
+
+        self.last_sweep = {
+            "checked_at": checked_at,
+            "checked": len(checks),
+            "disconnected": len(disconnected),
+            "inconclusive": sum(1 for c in checks if c.inconclusive),
+            "results": [
+                {"domain": c.domain, "healthy": c.healthy, "error": c.error, "attempts": c.attempts}
+                for c in checks
+            ],
+        }
+        return self.last_sweep
@@ -0,0 +1,60 @@
+"""
+Fast JSON responses for the hot public endpoints.
+
+A route that returns a dict goes through jsonable_encoder (a recursive
+walk copying every value) and stdlib json.dumps; with a response_model it
+first validates every row into a Pydantic model and dumps it back out -
+for /public/testimonials that is a full model round trip per testimonial
+on every widget load, over rows we selected ourselves.
+
+FastJSONResponse is opt-in: a route returns it directly, which skips
+response_model validation and jsonable_encoder, and the body is encoded
+by dumps(): orjson when installed, else the stdlib with FastAPI's exact
+settings. Only use it for trusted, already JSON-shaped data (DB rows,
+dicts of str/int/float/bool/None); the route keeps its response_model
+for the OpenAPI schema.
+
+dumps() produces the same bytes as FastAPI's JSONResponse (compact
+separators, UTF-8, no ASCII escaping). Values orjson refuses - non-str
+dict keys, integers beyond 64 bits - fall back to the stdlib encoder.
+Remaining differences, none of which our rows contain: floats in exponent
+form are spelled 1e-7 rather than 1e-07 (same value), and NaN/Infinity
+come out as null where JSONResponse raises.
+"""
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+JSON_ENCODER = 'orjson' if orjson is not None else 'json'
+
+
+def _stdlib_dumps(payload: Any) -> bytes:
+    """Serialize exactly like FastAPI's JSONResponse"""
+    return json.dumps(
+        payload,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+if orjson is not None:
+    def dumps(payload: Any) -> bytes:
+        try:
+            return orjson.dumps(payload)
+        except TypeError:
+            return _stdlib_dumps(payload)
+else:
+    dumps = _stdlib_dumps
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,167 @@
+"""
+Application-lifetime outbound HTTP pools.
+
+Routes used to open a fresh httpx.AsyncClient per call, paying DNS, TCP
+and TLS setup every time. OutboundHTTP owns one long-lived client per
+destination class, created in the FastAPI lifespan and closed on shutdown:
+
+- 'lemonsqueezy': api.lemonsqueezy.com (checkout, portal), HTTP/2 so
+  concurrent calls multiplex over one connection
+- 'webhooks':     everything else (user-supplied webhook URLs); many
+  distinct hosts, so idle connections expire sooner
+
+Each pool has its own connection/keep-alive limits, so a burst of slow
+webhook tests cannot starve the payment API of connections.
+
+Pool hit rate comes from httpcore's trace extension: a request that emits
+'connection.connect_tcp' opened a new connection, any other request reused
+a pooled one.
+"""
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from metrics import OUTBOUND_DURATION
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401  (httpx needs it for http2=True)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+HTTP2_ENABLED = os.environ.get('HTTP2_ENABLED', 'true').lower() == 'true' and HTTP2_AVAILABLE
+
+
+def _pool_config(name: str, hosts: tuple, max_connections: int, max_keepalive: int,
+                 keepalive_expiry: float) -> Dict[str, Any]:
+    prefix = f"HTTP_POOL_{name.upper()}_"
+    return {
+        "hosts": hosts,
+        "limits": httpx.Limits(
+            max_connections=int(os.environ.get(prefix + 'MAX_CONNECTIONS', str(max_connections))),
+            max_keepalive_connections=int(os.environ.get(prefix + 'MAX_KEEPALIVE', str(max_keepalive))),
+            keepalive_expiry=float(os.environ.get(prefix + 'KEEPALIVE_EXPIRY', str(keepalive_expiry))),
+        ),
+    }
+
+
+DEFAULT_POOL = 'webhooks'
+POOLS = {
+    'lemonsqueezy': _pool_config('lemonsqueezy', ('api.lemonsqueezy.com',), 20, 10, 60.0),
+    'webhooks': _pool_config('webhooks', (), 50, 20, 15.0),
+}
+
+
+class PoolStats:
+    __slots__ = ('requests', 'new_connections', 'errors', 'total_ms')
+
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+        self.errors = 0
+        self.total_ms = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        reused = self.requests - self.new_connections
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused_connections": reused,
+            "hit_rate": round(reused / self.requests, 4) if self.requests else 0,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / self.requests, 2) if self.requests else 0,
+        }
+
+
+class OutboundHTTP:
+    def __init__(self, pools: Dict[str, Dict[str, Any]] = POOLS, http2: bool = HTTP2_ENABLED):
+        self.pools = pools
+        self.http2 = http2
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._host_pool = {host: name for name, cfg in pools.items() for host in cfg["hosts"]}
+        self._stats = {name: PoolStats() for name in pools}
+
+    def _create(self, name: str) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            http2=self.http2,
+            limits=self.pools[name]["limits"],
+            timeout=httpx.Timeout(30.0, connect=10.0),
+        )
+
+    async def start(self):
+        for name in self.pools:
+            if name not in self._clients:
+                self._clients[name] = self._create(name)
+        logger.info(f"Outbound HTTP pools started ({', '.join(self.pools)}; http2={self.http2})")
+
+    async def aclose(self):
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+        logger.info("Outbound HTTP pools closed")
+
+    def pool_for(self, url: str) -> str:
+        host = (urlsplit(url).hostname or '').lower()
+        return self._host_pool.get(host, DEFAULT_POOL)
+
+    def client(self, pool: str) -> httpx.AsyncClient:
+        client = self._clients.get(pool)
+        if client is None:
+            # Used outside the lifespan (scripts, tests): create on first use
+            client = self._clients[pool] = self._create(pool)
+        return client
+
+    async def request(self, method: str, url: str, pool: Optional[str] = None, **kwargs) -> httpx.Response:
+        """Send through the destination's pooled client; accepts httpx.AsyncClient.request kwargs"""
+        pool = pool or self.pool_for(url)
+        stats = self._stats[pool]
+        opened = False
+
+        async def trace(event_name: str, info: dict):
+            nonlocal opened
+            if event_name == 'connection.connect_tcp.started':
+                opened = True
+
+        extensions = dict(kwargs.pop('extensions', None) or {})
+        extensions['trace'] = trace
+        status = 'error'
+        start = time.perf_counter()
+        try:
+            response = await self.client(pool).request(method, url, extensions=extensions, **kwargs)
+            status = str(response.status_code)
+            return response
+        except httpx.HTTPError:
+            stats.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            stats.requests += 1
+            stats.new_connections += opened
+            stats.total_ms += elapsed * 1000
+            OUTBOUND_DURATION.observe(elapsed, pool, status)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request('POST', url, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "http2": self.http2,
+            "pools": {
+                name: {
+                    **self._stats[name].as_dict(),
+                    "max_connections": cfg["limits"].max_connections,
+                    "max_keepalive_connections": cfg["limits"].max_keepalive_connections,
+                    "keepalive_expiry": cfg["limits"].keepalive_expiry,
+                }
+                for name, cfg in self.pools.items()
+            },
+        }
@@ -0,0 +1,192 @@
+"""
+Buffered ingestion pipeline for analytics events.
+
+/track used to do one analytics_events insert per beacon inside the
+request. EventIngestor instead accepts events into a bounded in-process
+queue (the request returns 202 immediately) and a single background
+worker coalesces them into bulk inserts, flushing when either
+TRACK_BATCH_SIZE events are buffered or TRACK_FLUSH_INTERVAL seconds have
+passed since the first event of the batch.
+
+When the queue is full submit() returns False so the route can shed load
+(503 + Retry-After) instead of buffering without bound. stop() drains and
+flushes everything still queued before the app shuts down.
+
+A failed bulk insert is retried once. The first attempt may have been
+committed even though it raised (e.g. a timeout after the write), so each
+event gets its id client-side before the first attempt and the batch is
+written as an upsert that ignores existing ids: the retry cannot insert
+the same events twice. on_flush runs once per batch that landed; its
+errors are logged and never stop the worker.
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TRACK_QUEUE_SIZE = int(os.environ.get('TRACK_QUEUE_SIZE', '10000'))
+TRACK_BATCH_SIZE = int(os.environ.get('TRACK_BATCH_SIZE', '500'))
+TRACK_FLUSH_INTERVAL = float(os.environ.get('TRACK_FLUSH_INTERVAL', '1.0'))  # seconds
+
+_STOP = object()
+
+
+class EventIngestor:
+    def __init__(self, db: Any, table: str = 'analytics_events',
+                 max_queue: int = TRACK_QUEUE_SIZE,
+                 batch_size: int = TRACK_BATCH_SIZE,
+                 flush_interval: float = TRACK_FLUSH_INTERVAL,
+                 on_flush: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None):
+        self.db = db
+        self.table = table
+        # Called with each successfully inserted batch (e.g. rollup maintenance)
+        self.on_flush = on_flush
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._accepting = False
+
+        # Metrics
+        self.accepted = 0
+        self.rejected = 0
+        self.flushed_events = 0
+        self.failed_events = 0
+        self.on_flush_errors = 0
+        self.batches = 0
+        self.last_batch_size = 0
+        self.last_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._accepting = True
+        self._worker = asyncio.create_task(self._run())
+        logger.info(f"Event ingestor started (queue={self.max_queue}, batch={self.batch_size}, interval={self.flush_interval}s)")
+
+    def submit(self, event: Dict[str, Any]) -> bool:
+        """Enqueue an event without waiting. Returns False if the queue is full or closed."""
+        if not self._accepting:
+            self.rejected += 1
+            return False
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.accepted += 1
+        return True
+
+    def submit_many(self, events: List[Dict[str, Any]]) -> bool:
+        """Enqueue all events or none (False if they don't all fit). They land
+        contiguously in the queue, so they normally share one bulk insert."""
+        if not self._accepting or self._queue.maxsize - self._queue.qsize() < len(events):
+            self.rejected += len(events)
+            return False
+        for event in events:
+            self._queue.put_nowait(event)
+        self.accepted += len(events)
+        return True
+
+    async def _next_batch(self) -> Tuple[List[Dict[str, Any]], bool]:
+        """Block for the first event, then gather more until size or time threshold"""
+        loop = asyncio.get_running_loop()
+        first = await self._queue.get()
+        if first is _STOP:
+            return [], True
+
+        batch = [first]
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                # Not wait_for(): on timeout it can drop an item that arrived at the last moment
+                getter = asyncio.ensure_future(self._queue.get())
+                done, _ = await asyncio.wait({getter}, timeout=remaining)
+                if not done:
+                    getter.cancel()
+                    try:
+                        item = await getter
+                    except asyncio.CancelledError:
+                        break
+                else:
+                    item = getter.result()
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _flush(self, batch: List[Dict[str, Any]]):
+        start = time.perf_counter()
+        for event in batch:
+            event.setdefault('id', str(uuid.uuid4()))
+        for attempt in range(2):
+            try:
+                # Idempotent on id: a retry after an ambiguous failure skips rows already written
+                await self.db.execute(
+                    self.db.table(self.table).upsert(batch, on_conflict='id', ignore_duplicates=True)
+                )
+                break
+            except Exception as e:
+                if attempt == 0:
+                    logger.warning(f"Bulk insert of {len(batch)} events failed, retrying: {e}")
+                    await asyncio.sleep(0.5)
+                else:
+                    logger.error(f"Dropping {len(batch)} events after failed bulk insert: {e}")
+                    self.failed_events += len(batch)
+                    return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.flushed_events += len(batch)
+        self.batches += 1
+        self.last_batch_size = len(batch)
+        self.last_flush_ms = elapsed_ms
+        self.total_flush_ms += elapsed_ms
+        if self.on_flush:
+            try:
+                await self.on_flush(batch)
+            except Exception as e:
+                self.on_flush_errors += 1
+                logger.error(f"on_flush callback failed for {len(batch)} events: {e}")
+
+    async def _run(self):
+        while True:
+            batch, stopping = await self._next_batch()
+            if batch:
+                await self._flush(batch)
+            if stopping:
+                return
+
+    async def stop(self):
+        """Stop accepting events, flush everything queued, and wait for the worker"""
+        if not self._worker:
+            return
+        self._accepting = False
+        await self._queue.put(_STOP)
+        await self._worker
+        self._worker = None
+        logger.info(f"Event ingestor stopped ({self.flushed_events} events flushed, {self.failed_events} failed)")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_capacity": self.max_queue,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "flushed_events": self.flushed_events,
+            "failed_events": self.failed_events,
+            "on_flush_errors": self.on_flush_errors,
+            "batches": self.batches,
+            "last_batch_size": self.last_batch_size,
+            "avg_batch_size": round(self.flushed_events / self.batches, 2) if self.batches else 0,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "avg_flush_ms": round(self.total_flush_ms / self.batches, 2) if self.batches else 0,
+        }
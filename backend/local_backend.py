@@ -0,0 +1,420 @@
+"""
+In-process stand-in for the Supabase client.
+
+Implements the subset of the PostgREST query builder and auth surface that
+server.py uses (table().select().eq()...execute(), insert/upsert/update/delete,
+single(), or_() (incl. nested and()), embedded selects like 'spaces(id, slug)', auth.get_user)
+against plain Python lists. Used for local development and benchmarks:
+
+    DATA_BACKEND=local uvicorn server:app
+
+An optional per-call latency simulates the PostgREST round trip. Calls
+block (time.sleep) just like the real synchronous client does.
+"""
+import copy
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+from postgrest.exceptions import APIError
+
+
+class LocalResponse:
+    def __init__(self, data: Any = None, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+def _split_columns(columns: str) -> List[str]:
+    """Split a select string on top-level commas: 'a, b(c, d)' -> ['a', 'b(c, d)']"""
+    parts, depth, current = [], 0, ''
+    for ch in columns:
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        if ch == ',' and depth == 0:
+            parts.append(current.strip())
+            current = ''
+        else:
+            current += ch
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+def _as_text(value: Any) -> str:
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def _split_top_level(expr: str) -> List[str]:
+    """Split on commas outside parentheses and double quotes"""
+    parts, depth, quoted, current = [], 0, False, ''
+    i = 0
+    while i < len(expr):
+        ch = expr[i]
+        if quoted and ch == '\\':
+            current += expr[i:i + 2]
+            i += 2
+            continue
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == '(':
+            depth += 1
+        elif not quoted and ch == ')':
+            depth -= 1
+        if ch == ',' and depth == 0 and not quoted:
+            parts.append(current)
+            current = ''
+        else:
+            current += ch
+        i += 1
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+    return value
+
+
+_COMPARATORS = {
+    'eq': lambda a, b: a == b,
+    'neq': lambda a, b: a != b,
+    'lt': lambda a, b: a < b,
+    'lte': lambda a, b: a <= b,
+    'gt': lambda a, b: a > b,
+    'gte': lambda a, b: a >= b,
+}
+
+
+def _parse_logic(expr: str, combine: Callable) -> Callable[[dict], bool]:
+    """Build a predicate for a PostgREST logic tree body ('a.eq.1,and(b.lt.2,c.eq.3)')"""
+    clauses = []
+    for clause in _split_top_level(expr):
+        for keyword, inner_combine in (('and(', all), ('or(', any)):
+            if clause.startswith(keyword) and clause.endswith(')'):
+                clauses.append(_parse_logic(clause[len(keyword):-1], inner_combine))
+                break
+        else:
+            column, op, value = clause.split('.', 2)
+            if op not in _COMPARATORS:
+                raise ValueError(
+                    f"Unsupported or_ operator '{op}' in '{clause}' "
+                    f"(local backend supports {', '.join(_COMPARATORS)})"
+                )
+            compare, value = _COMPARATORS[op], _unquote(value)
+
+            def predicate(r, column=column, compare=compare, value=value):
+                cell = r.get(column)
+                return cell is not None and compare(_as_text(cell), value)
+            clauses.append(predicate)
+    return lambda r: combine(c(r) for c in clauses)
+
+
+class LocalQuery:
+    """Chainable query builder mirroring postgrest's SyncRequestBuilder"""
+
+    def __init__(self, backend: 'LocalSupabase', table: str):
+        self.backend = backend
+        self.table_name = table
+        self._op = 'select'
+        self._columns = '*'
+        self._count = None
+        self._payload = None
+        self._on_conflict = None
+        self._ignore_duplicates = False
+        self._filters: List[Callable[[dict], bool]] = []
+        self._order: List[tuple] = []
+        self._limit = None
+        self._offset = 0
+        self._single = False
+        self._maybe_single = False
+
+    # --- Operations ---
+    def select(self, columns: str = '*', count: Optional[str] = None):
+        self._op, self._columns, self._count = 'select', columns, count
+        return self
+
+    def insert(self, payload):
+        self._op, self._payload = 'insert', payload
+        return self
+
+    def upsert(self, payload, on_conflict: str = 'id', ignore_duplicates: bool = False):
+        self._op, self._payload, self._on_conflict = 'upsert', payload, on_conflict
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, payload: dict):
+        self._op, self._payload = 'update', payload
+        return self
+
+    def delete(self):
+        self._op = 'delete'
+        return self
+
+    # --- Filters ---
+    def _filter(self, fn: Callable[[dict], bool]):
+        self._filters.append(fn)
+        return self
+
+    def eq(self, column: str, value: Any):
+        return self._filter(lambda r: r.get(column) == value or _as_text(r.get(column)) == _as_text(value))
+
+    def neq(self, column: str, value: Any):
+        return self._filter(lambda r: _as_text(r.get(column)) != _as_text(value))
+
+    def gt(self, column: str, value: Any):
+        return self._filter(lambda r: r.get(column) is not None and r.get(column) > value)
+
+    def gte(self, column: str, value: Any):
+        return self._filter(lambda r: r.get(column) is not None and r.get(column) >= value)
+
+    def lt(self, column: str, value: Any):
+        return self._filter(lambda r: r.get(column) is not None and r.get(column) < value)
+
+    def lte(self, column: str, value: Any):
+        return self._filter(lambda r: r.get(column) is not None and r.get(column) <= value)
+
+    def in_(self, column: str, values: List[Any]):
+        wanted = {_as_text(v) for v in values}
+        return self._filter(lambda r: _as_text(r.get(column)) in wanted)
+
+    def is_(self, column: str, value: Any):
+        if value in (None, 'null'):
+            return self._filter(lambda r: r.get(column) is None)
+        return self.eq(column, value)
+
+    def or_(self, filters: str):
+        """Supports 'col.op.value,...' with eq/neq/lt/lte/gt/gte, quoted values and nested and(...)"""
+        predicate = _parse_logic(filters, any)
+        return self._filter(predicate)
+
+    # --- Modifiers ---
+    def order(self, column: str, desc: bool = False):
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, size: int):
+        self._limit = size
+        return self
+
+    def range(self, start: int, end: int):
+        self._offset, self._limit = start, end - start + 1
+        return self
+
+    def single(self):
+        self._single = True
+        return self
+
+    def maybe_single(self):
+        self._maybe_single = True
+        return self
+
+    # --- Execution ---
+    def _matches(self, row: dict) -> bool:
+        return all(f(row) for f in self._filters)
+
+    def _project(self, row: dict) -> dict:
+        columns = _split_columns(self._columns)
+        result = {}
+        for column in columns:
+            if column == '*':
+                result.update(row)
+            elif '(' in column:
+                relation, inner = column[:-1].split('(', 1)
+                relation = relation.strip()
+                foreign_key = f"{relation.rstrip('s')}_id"
+                related = next(
+                    (r for r in self.backend.tables[relation] if r.get('id') == row.get(foreign_key)),
+                    None
+                )
+                if related is None:
+                    result[relation] = None
+                else:
+                    sub = LocalQuery(self.backend, relation).select(inner)
+                    result[relation] = sub._project(related)
+            elif column != 'count':
+                result[column] = row.get(column)
+        return copy.deepcopy(result)
+
+    def _apply_defaults(self, row: dict) -> dict:
+        row = dict(row)
+        row.setdefault('id', str(uuid.uuid4()))
+        row.setdefault('created_at', datetime.now(timezone.utc).isoformat())
+        return row
+
+    def _run(self) -> LocalResponse:
+        rows = self.backend.tables[self.table_name]
+
+        if self._op == 'insert':
+            payload = self._payload if isinstance(self._payload, list) else [self._payload]
+            inserted = [self._apply_defaults(r) for r in payload]
+            rows.extend(inserted)
+            return LocalResponse(copy.deepcopy(inserted))
+
+        if self._op == 'upsert':
+            payload = self._payload if isinstance(self._payload, list) else [self._payload]
+            keys = [k.strip() for k in self._on_conflict.split(',')]
+            written = []
+            for new_row in payload:
+                existing = next((r for r in rows if all(r.get(k) == new_row.get(k) for k in keys)), None)
+                if existing is not None:
+                    # ON CONFLICT DO NOTHING returns only the rows it inserted
+                    if self._ignore_duplicates:
+                        continue
+                    existing.update(new_row)
+                    written.append(existing)
+                else:
+                    new_row = self._apply_defaults(new_row)
+                    rows.append(new_row)
+                    written.append(new_row)
+            return LocalResponse(copy.deepcopy(written))
+
+        matched = [r for r in rows if self._matches(r)]
+
+        if self._op == 'update':
+            for row in matched:
+                row.update(self._payload)
+            return LocalResponse(copy.deepcopy(matched))
+
+        if self._op == 'delete':
+            self.backend.tables[self.table_name] = [r for r in rows if not self._matches(r)]
+            return LocalResponse(copy.deepcopy(matched))
+
+        # select
+        for column, desc in reversed(self._order):
+            matched.sort(key=lambda r: (r.get(column) is None, r.get(column) or ''), reverse=desc)
+        count = len(matched) if self._count else None
+        if self._offset:
+            matched = matched[self._offset:]
+        if self._limit is not None:
+            matched = matched[:self._limit]
+        data = [self._project(r) for r in matched]
+
+        if self._single or self._maybe_single:
+            if len(data) == 1:
+                return LocalResponse(data[0], count)
+            if self._maybe_single and not data:
+                return None
+            raise APIError({
+                'message': 'JSON object requested, multiple (or no) rows returned',
+                'code': 'PGRST116',
+                'details': f'The result contains {len(data)} rows',
+                'hint': None,
+            })
+        return LocalResponse(data, count)
+
+    def execute(self) -> LocalResponse:
+        self.backend.simulate_round_trip()
+        with self.backend.lock:
+            self.backend.query_count += 1
+            return self._run()
+
+
+class LocalRPC:
+    def __init__(self, backend: 'LocalSupabase', fn: str, params: dict):
+        self.backend = backend
+        self.fn = fn
+        self.params = params
+
+    def execute(self) -> LocalResponse:
+        self.backend.simulate_round_trip()
+        handler = self.backend.functions.get(self.fn)
+        if handler is None:
+            raise APIError({
+                'message': f'Could not find the function public.{self.fn}',
+                'code': 'PGRST202',
+                'details': None,
+                'hint': None,
+            })
+        with self.backend.lock:
+            self.backend.query_count += 1
+            return LocalResponse(handler(self.backend, **self.params))
+
+
+class LocalAuth:
+    def __init__(self, backend: 'LocalSupabase'):
+        self.backend = backend
+        self.users: Dict[str, SimpleNamespace] = {}
+
+    def add_user(self, token: str, user_id: str, email: str, user_metadata: Optional[dict] = None):
+        self.users[token] = SimpleNamespace(id=user_id, email=email, user_metadata=user_metadata or {})
+
+    def get_user(self, token: str):
+        self.backend.simulate_round_trip()
+        user = self.users.get(token)
+        if user is None:
+            raise Exception("Invalid JWT")
+        return SimpleNamespace(user=user)
+
+
+# --- Stand-ins for the SQL functions in docs/*.sql ---
+
+def _increment_analytics_rollups(backend: 'LocalSupabase', deltas: List[dict]):
+    rows = backend.tables['analytics_rollups']
+    for delta in deltas:
+        key = (delta['space_id'], delta['granularity'], delta['bucket_start'])
+        existing = next(
+            (r for r in rows if (r['space_id'], r['granularity'], r['bucket_start']) == key),
+            None
+        )
+        if existing is None:
+            rows.append(dict(delta))
+        else:
+            existing['impressions'] += delta['impressions']
+            existing['conversions'] += delta['conversions']
+
+
+def _analytics_daily_counts(backend: 'LocalSupabase', p_space_id: str, p_since: Optional[str] = None):
+    groups: Dict[str, dict] = {}
+    for event in backend.tables['analytics_events']:
+        if event['space_id'] != p_space_id or (p_since and event['created_at'] < p_since):
+            continue
+        date = event['created_at'][:10]
+        group = groups.get(date)
+        if group is None:
+            group = groups[date] = {'date': date, 'impressions': 0, 'conversions': 0}
+        if event['event_type'] == 'impression':
+            group['impressions'] += 1
+        else:
+            group['conversions'] += 1
+    return [groups[d] for d in sorted(groups)]
+
+
+BUILTIN_FUNCTIONS = {
+    'increment_analytics_rollups': _increment_analytics_rollups,
+    'analytics_daily_counts': _analytics_daily_counts,
+}
+
+
+class LocalSupabase:
+    """Drop-in replacement for supabase.Client backed by in-memory tables"""
+
+    def __init__(self, latency: float = 0.0, tables: Optional[Dict[str, List[dict]]] = None):
+        self.latency = latency
+        self.tables: Dict[str, List[dict]] = defaultdict(list)
+        for name, rows in (tables or {}).items():
+            self.tables[name] = [dict(r) for r in rows]
+        self.functions: Dict[str, Callable] = dict(BUILTIN_FUNCTIONS)
+        self.auth = LocalAuth(self)
+        self.lock = threading.RLock()
+        self.query_count = 0
+
+    def simulate_round_trip(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def table(self, name: str) -> LocalQuery:
+        return LocalQuery(self, name)
+
+    def rpc(self, fn: str, params: dict) -> LocalRPC:
+        return LocalRPC(self, fn, params)
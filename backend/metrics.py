@@ -0,0 +1,214 @@
+"""
+Minimal Prometheus-style metrics (text exposition format 0.0.4).
+
+No client library: counters, gauges and histograms are plain dicts keyed
+by label-value tuples, updated from the event loop thread only (route
+middleware, Database.execute after its await, OutboundHTTP.request), so
+recording needs no locks and costs a dict lookup plus a bisect.
+
+Exposed metrics:
+- http_requests_total{method,route,status}
+- http_request_duration_seconds{method,route}             (histogram)
+- http_requests_in_flight
+- db_query_duration_seconds{table,op}                      (histogram)
+- db_query_errors_total{table,op}
+- outbound_http_duration_seconds{destination,status}       (histogram)
+- plus callback gauges registered by server.py (queue depth, cache sizes)
+
+Route labels use the matched route template ('/api/spaces/{space_id}/public-data'),
+never the raw path, so label cardinality stays bounded.
+"""
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Seconds; covers cache hits (sub-ms) through slow analytics scans
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1):
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_labels(self.labelnames, key)} {_format(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 function: Callable[[], Iterable[Tuple[Tuple[str, ...], float]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        # Optional callback producing (labelvalues, value) pairs at scrape time
+        self._function = function
+
+    def inc(self, *labelvalues: str, amount: float = 1):
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def dec(self, *labelvalues: str, amount: float = 1):
+        self._values[labelvalues] = self._values.get(labelvalues, 0) - amount
+
+    def set(self, value: float, *labelvalues: str):
+        self._values[labelvalues] = value
+
+    def render(self) -> List[str]:
+        values = dict(self._values)
+        if self._function:
+            values.update(self._function())
+        return self.header() + [
+            f"{self.name}{_labels(self.labelnames, key)} {_format(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labelvalues -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labelvalues: str):
+        series = self._series.get(labelvalues)
+        if series is None:
+            series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += count
+                le = 'le="' + _format(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_format(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    'http_requests_total', 'HTTP requests by route template and status code', ('method', 'route', 'status')))
+HTTP_DURATION = REGISTRY.register(Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route template', ('method', 'route')))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge(
+    'http_requests_in_flight', 'HTTP requests currently being served'))
+DB_QUERY_DURATION = REGISTRY.register(Histogram(
+    'db_query_duration_seconds', 'Backend (PostgREST) query latency by table and operation', ('table', 'op')))
+DB_QUERY_ERRORS = REGISTRY.register(Counter(
+    'db_query_errors_total', 'Backend queries that raised, by table and operation', ('table', 'op')))
+OUTBOUND_DURATION = REGISTRY.register(Histogram(
+    'outbound_http_duration_seconds', 'Outbound HTTP call latency by destination pool and status',
+    ('destination', 'status')))
+
+_METHOD_OPS = {'GET': 'select', 'HEAD': 'select', 'POST': 'insert', 'PATCH': 'update', 'DELETE': 'delete'}
+
+
+def query_labels(query) -> Tuple[str, str]:
+    """(table, op) for a postgrest request builder or a local_backend query"""
+    table = getattr(query, 'table_name', None)
+    if table is not None:
+        return table, getattr(query, '_op', 'select')
+    fn = getattr(query, 'fn', None)
+    if fn is not None:
+        return f"rpc/{fn}", 'rpc'
+    request = getattr(query, 'request', None)
+    if request is None:
+        return 'unknown', 'unknown'
+    path = str(request.path).split('/rest/v1/')[-1]
+    if path.startswith('rpc/'):
+        return path, 'rpc'
+    return path, _METHOD_OPS.get(request.http_method, request.http_method.lower())
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (no BaseHTTPMiddleware task/stream overhead)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        status = 500
+        start = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # Set by FastAPI's router once a route matched
+            route = scope.get('route')
+            template = getattr(route, 'path_format', None) or '<unmatched>'
+            method = scope['method']
+            HTTP_DURATION.observe(time.perf_counter() - start, method, template)
+            HTTP_REQUESTS.inc(method, template, str(status))
@@ -0,0 +1,73 @@
+"""
+Keyset (cursor) pagination for newest-first listings.
+
+Listings are ordered by (created_at DESC, id DESC); id breaks ties between
+rows sharing a timestamp so no row is skipped or repeated across pages.
+The cursor is the (created_at, id) of the last row served, encoded as an
+opaque url-safe token. The next page is everything strictly "before" it:
+
+    created_at < c  OR  (created_at = c AND id < i)
+
+which PostgREST evaluates with an index range scan on
+(space_id, created_at DESC, id DESC) instead of an OFFSET that re-reads
+every earlier row.
+"""
+import base64
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+TESTIMONIALS_PAGE_SIZE = int(os.environ.get('TESTIMONIALS_PAGE_SIZE', '50'))
+TESTIMONIALS_MAX_PAGE_SIZE = int(os.environ.get('TESTIMONIALS_MAX_PAGE_SIZE', '200'))
+TESTIMONIALS_EXPORT_PAGE_SIZE = int(os.environ.get('TESTIMONIALS_EXPORT_PAGE_SIZE', '500'))
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    raw = json.dumps([row['created_at'], str(row['id'])], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Raises ValueError for anything that isn't a cursor we issued"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(created_at, str) or not isinstance(row_id, str):
+        raise ValueError("Invalid cursor")
+    return created_at, row_id
+
+
+def _quote(value: str) -> str:
+    # PostgREST reserves , . : ( ) inside or=() values; double quotes escape them
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def apply_keyset(query: Any, cursor: Optional[str], limit: int) -> Any:
+    """Order newest-first and restrict to the page after `cursor` (fetches one extra row)"""
+    query = query.order('created_at', desc=True).order('id', desc=True)
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.or_(
+            f"created_at.lt.{_quote(created_at)},"
+            f"and(created_at.eq.{_quote(created_at)},id.lt.{_quote(row_id)})"
+        )
+    # limit + 1 tells us whether another page exists without a count query
+    return query.limit(limit + 1)
+
+
+def split_page(rows: List[Dict[str, Any]], limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Trim the look-ahead row and return (page, next_cursor)"""
+    if len(rows) > limit:
+        page = rows[:limit]
+        return page, encode_cursor(page[-1])
+    return rows, None
+
+
+def clamp_limit(limit: Optional[int]) -> int:
+    if limit is None:
+        return TESTIMONIALS_PAGE_SIZE
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    return min(limit, TESTIMONIALS_MAX_PAGE_SIZE)
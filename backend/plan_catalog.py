@@ -0,0 +1,204 @@
+"""
+In-process plan catalog and per-user entitlement cache.
+
+The plans table (pricing.sql) is a handful of rows that change only on a
+pricing update, yet /subscription/status joined it on every call and the
+Lemon Squeezy webhook looked plans up by variant with an or_() query.
+
+PlanCatalog loads every plan once, keeps an id -> plan map and a
+variant_id -> plan_id index (monthly and yearly Lemon Squeezy variants),
+and reloads after PLAN_CATALOG_TTL seconds. A failed reload keeps serving
+the previous catalog; concurrent callers share one reload.
+
+EntitlementCache keeps, per user, the subscription row and the resolved
+entitlements: plan limits and features with subscriptions.custom_overrides
+merged on top, the same precedence the dashboard's SubscriptionContext
+applies (override value wins, per feature). Entries live
+ENTITLEMENT_CACHE_TTL seconds and are dropped by the webhook handler when a
+subscription changes, so /subscription/status is answered from memory.
+Limits and feature gates are still enforced by the dashboard from that
+response; no backend route checks them.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+PLAN_CATALOG_TTL = float(os.environ.get('PLAN_CATALOG_TTL', '300'))  # seconds
+ENTITLEMENT_CACHE_SIZE = int(os.environ.get('ENTITLEMENT_CACHE_SIZE', '10000'))
+ENTITLEMENT_CACHE_TTL = int(os.environ.get('ENTITLEMENT_CACHE_TTL', '300'))  # seconds
+
+DEFAULT_PLAN_ID = 'free'
+LIMIT_FIELDS = ('max_spaces', 'max_text_testimonials', 'max_videos')
+VARIANT_FIELDS = ('lemon_squeezy_variant_id_monthly', 'lemon_squeezy_variant_id_yearly')
+
+# Used when the plans table has no 'free' row (mirrors the dashboard's default)
+FALLBACK_PLAN = {
+    'id': DEFAULT_PLAN_ID,
+    'name': 'Free Tier',
+    'max_spaces': 1,
+    'max_text_testimonials': 10,
+    'max_videos': 0,
+    'features': {},
+}
+
+
+def resolve_entitlements(plan: Dict[str, Any], overrides: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Plan limits/features with custom_overrides applied (override wins per limit and per feature)"""
+    overrides = overrides or {}
+    limits = {}
+    for field in LIMIT_FIELDS:
+        value = overrides.get(field)
+        limits[field] = value if value is not None else plan.get(field)
+
+    features: Dict[str, Any] = {}
+    for source in (plan.get('features') or {}, overrides.get('features') or {}):
+        for category, flags in source.items():
+            if isinstance(flags, dict):
+                features[category] = {**features.get(category, {}), **flags}
+            else:
+                features[category] = flags
+
+    return {'plan_id': plan.get('id'), 'plan_name': plan.get('name'), 'limits': limits, 'features': features}
+
+
+class PlanCatalog:
+    def __init__(self, db: Any, ttl: float = PLAN_CATALOG_TTL):
+        self.db = db
+        self.ttl = ttl
+        self._plans: Dict[str, Dict[str, Any]] = {}
+        self._by_variant: Dict[str, str] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def _fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    async def refresh(self):
+        response = await self.db.execute(self.db.table('plans').select('*'))
+        plans = {row['id']: row for row in response.data or []}
+        by_variant = {}
+        for plan_id, row in plans.items():
+            for field in VARIANT_FIELDS:
+                if row.get(field):
+                    by_variant[str(row[field])] = plan_id
+        self._plans, self._by_variant = plans, by_variant
+        self._loaded_at = time.monotonic()
+        self.refreshes += 1
+
+    async def _ensure_loaded(self):
+        if self._fresh():
+            return
+        async with self._lock:
+            if self._fresh():
+                return
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.refresh_errors += 1
+                if self._loaded_at is None:
+                    raise
+                # Keep serving the previous catalog; retry after another TTL
+                logger.warning(f"Plan catalog refresh failed, serving cached plans: {e}")
+                self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    async def get(self, plan_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        await self._ensure_loaded()
+        return self._plans.get(plan_id)
+
+    async def default_plan(self) -> Dict[str, Any]:
+        return await self.get(DEFAULT_PLAN_ID) or FALLBACK_PLAN
+
+    async def plan_for_variant(self, variant_id: Any) -> Optional[str]:
+        """plan id for a Lemon Squeezy variant (monthly or yearly), or None"""
+        await self._ensure_loaded()
+        return self._by_variant.get(str(variant_id))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "plans": len(self._plans),
+            "variants": len(self._by_variant),
+            "age_seconds": round(time.monotonic() - self._loaded_at, 1) if self._loaded_at else None,
+            "ttl": self.ttl,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+        }
+
+
+class EntitlementCache:
+    def __init__(self, db: Any, catalog: PlanCatalog,
+                 maxsize: int = ENTITLEMENT_CACHE_SIZE, ttl: int = ENTITLEMENT_CACHE_TTL):
+        self.db = db
+        self.catalog = catalog
+        # user_id -> (subscription row or None, resolved entitlements)
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Bumped by every invalidation so a load that raced a webhook isn't stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def _load(self, user_id: str) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+        response = await self.db.execute(
+            self.db.table('subscriptions')
+            .select('*')
+            .eq('user_id', user_id)
+            .maybe_single()
+        )
+        subscription = response.data if response else None
+        plan = None
+        if subscription:
+            plan = await self.catalog.get(subscription.get('plan_id'))
+        if plan is None:
+            plan = await self.catalog.default_plan()
+        entitlements = resolve_entitlements(plan, (subscription or {}).get('custom_overrides'))
+        entitlements['status'] = subscription.get('status') if subscription else None
+        return subscription, entitlements
+
+    async def lookup(self, user_id: str) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+        """(subscription row or None, resolved entitlements) for a user"""
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        generation = self._generation
+        entry = await self._load(user_id)
+        if generation == self._generation:
+            self._entries[user_id] = entry
+        return entry
+
+    async def get(self, user_id: str) -> Dict[str, Any]:
+        return (await self.lookup(user_id))[1]
+
+    def invalidate(self, user_id: Optional[str] = None, customer_id: Optional[str] = None):
+        """Drop a user's entry (by user id, or by Lemon Squeezy customer id)"""
+        self._generation += 1
+        if user_id:
+            self._entries.pop(user_id, None)
+        if customer_id:
+            for cached_user, (subscription, _) in list(self._entries.items()):
+                if subscription and str(subscription.get('lemon_squeezy_customer_id')) == customer_id:
+                    self._entries.pop(cached_user, None)
+
+    def clear(self):
+        self._generation += 1
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0,
+        }
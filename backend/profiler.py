@@ -0,0 +1,286 @@
+"""
+Opt-in, sampled request profiling for hot-path investigation.
+
+Off by default. A request is profiled when:
+- profiling is enabled (PROFILING_ENABLED or the admin toggle) and it wins
+  the PROFILE_SAMPLE_RATE dice roll, optionally restricted to PROFILE_ROUTES
+  (comma-separated route templates, e.g. '/api/spaces/{space_id}/public-data')
+- or it carries 'X-Profile: <PROFILE_HEADER_TOKEN>', which forces a
+  profile of that one request even while sampling is off. The token has
+  its own variable and no default: header profiling is off unless it is set
+
+A profile is a wall-clock picture of one request:
+- stack samples: a daemon thread wakes every PROFILE_INTERVAL_MS while any
+  profile is active and grabs the event loop thread's stack; a sample is
+  attributed to the request whose task the loop is running at that moment,
+  otherwise it counts as 'waiting' (awaiting I/O, a DB worker, or another
+  request's work holding the loop)
+- per-query timings: Database.execute reports every query made under the
+  request's context (child tasks included) with its offset and duration
+
+Finished profiles go into a ring buffer of the last PROFILE_BUFFER_SIZE.
+Requests that aren't profiled pay one random() call and, with the header
+trigger on, a scan of the request headers.
+"""
+import asyncio
+import contextvars
+import hmac
+import itertools
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from starlette.routing import Match
+
+logger = logging.getLogger(__name__)
+
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0.01'))
+PROFILE_ROUTES = [r.strip() for r in os.environ.get('PROFILE_ROUTES', '').split(',') if r.strip()]
+PROFILE_BUFFER_SIZE = int(os.environ.get('PROFILE_BUFFER_SIZE', '50'))
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', '5'))
+PROFILE_HEADER_TOKEN = os.environ.get('PROFILE_HEADER_TOKEN') or None
+PROFILE_MAX_STACK_DEPTH = 40
+PROFILE_TOP_STACKS = 25
+PROFILE_MAX_QUERIES = 500
+
+PROFILE_HEADER = b'x-profile'
+
+# The profile of the request running in this context, if any
+_current: contextvars.ContextVar[Optional['Profile']] = contextvars.ContextVar('current_profile', default=None)
+
+
+def _fold(frame) -> str:
+    """'file:function:line;...' from outermost to innermost frame"""
+    parts = []
+    while frame is not None and len(parts) < PROFILE_MAX_STACK_DEPTH:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ';'.join(reversed(parts))
+
+
+class Profile:
+    _ids = itertools.count(1)
+
+    def __init__(self, method: str, path: str, reason: str):
+        self.id = next(self._ids)
+        self.method = method
+        self.path = path
+        self.reason = reason
+        self.route: Optional[str] = None
+        self.status: Optional[int] = None
+        self.started_at = datetime.now(timezone.utc)
+        self.start = time.perf_counter()
+        self.duration_ms = 0.0
+        self.task: Optional[asyncio.Task] = None
+        self.stacks: Counter = Counter()
+        self.on_loop_samples = 0
+        self.waiting_samples = 0
+        self.queries: List[Dict[str, Any]] = []
+        self.dropped_queries = 0
+
+    def add_query(self, table: str, op: str, start: float, elapsed: float, error: bool):
+        if len(self.queries) >= PROFILE_MAX_QUERIES:
+            self.dropped_queries += 1
+            return
+        self.queries.append({
+            "table": table,
+            "op": op,
+            "offset_ms": round((start - self.start) * 1000, 3),
+            "duration_ms": round(elapsed * 1000, 3),
+            "error": error,
+        })
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "reason": self.reason,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration_ms, 3),
+            "query_count": len(self.queries) + self.dropped_queries,
+            "query_ms": round(sum(q["duration_ms"] for q in self.queries), 3),
+            "samples": self.on_loop_samples + self.waiting_samples,
+        }
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            **self.summary(),
+            "sample_interval_ms": PROFILE_INTERVAL_MS,
+            "on_loop_samples": self.on_loop_samples,
+            "waiting_samples": self.waiting_samples,
+            "stacks": [{"stack": stack, "samples": count}
+                       for stack, count in self.stacks.most_common(PROFILE_TOP_STACKS)],
+            "queries": self.queries,
+            "dropped_queries": self.dropped_queries,
+        }
+
+
+def record_query(table: str, op: str, start: float, elapsed: float, error: bool):
+    """Called by Database.execute; no-op unless the current request is being profiled"""
+    profile = _current.get()
+    if profile is not None:
+        profile.add_query(table, op, start, elapsed, error)
+
+
+class Profiler:
+    def __init__(self, enabled: bool = PROFILING_ENABLED, sample_rate: float = PROFILE_SAMPLE_RATE,
+                 routes: List[str] = PROFILE_ROUTES, buffer_size: int = PROFILE_BUFFER_SIZE,
+                 interval_ms: float = PROFILE_INTERVAL_MS, header_token: Optional[str] = None):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.routes = set(routes)
+        self.interval = interval_ms / 1000
+        self.header_token = header_token.encode() if header_token else None
+        self.profiles: deque = deque(maxlen=buffer_size)
+        self.profiled = 0
+        self._active: Dict[asyncio.Task, Profile] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._sampler: Optional[threading.Thread] = None
+
+    def configure(self, enabled: Optional[bool] = None, sample_rate: Optional[float] = None,
+                  routes: Optional[List[str]] = None):
+        if enabled is not None:
+            self.enabled = enabled
+        if sample_rate is not None:
+            self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        if routes is not None:
+            self.routes = set(routes)
+
+    def _reason(self, scope) -> Optional[str]:
+        if self.header_token is not None:
+            for name, value in scope['headers']:
+                if name == PROFILE_HEADER and hmac.compare_digest(value, self.header_token):
+                    return 'header'
+        if self.enabled and random.random() < self.sample_rate:
+            if not self.routes or _route_template(scope) in self.routes:
+                return 'sampled'
+        return None
+
+    def begin(self, scope) -> Optional[Profile]:
+        reason = self._reason(scope)
+        if reason is None:
+            return None
+        profile = Profile(scope['method'], scope['path'], reason)
+        profile.task = asyncio.current_task()
+        with self._lock:
+            self._active[profile.task] = profile
+        self._ensure_sampler()
+        return profile
+
+    def end(self, profile: Profile, scope, status: Optional[int]):
+        profile.duration_ms = (time.perf_counter() - profile.start) * 1000
+        profile.status = status
+        route = scope.get('route')
+        profile.route = getattr(route, 'path_format', None) or '<unmatched>'
+        with self._lock:
+            self._active.pop(profile.task, None)
+        profile.task = None
+        self.profiles.append(profile)
+        self.profiled += 1
+
+    def _ensure_sampler(self):
+        if self._sampler is not None and self._sampler.is_alive():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._sampler = threading.Thread(target=self._sample_loop, name='request-profiler', daemon=True)
+        self._sampler.start()
+
+    def _sample_loop(self):
+        # Runs only while there is something to profile; begin() restarts it
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    self._sampler = None
+                    return
+                frame = sys._current_frames().get(self._loop_thread)
+                running = asyncio.current_task(self._loop)
+                stack = _fold(frame) if frame is not None else None
+                for task, profile in self._active.items():
+                    if task is running and stack is not None:
+                        profile.on_loop_samples += 1
+                        profile.stacks[stack] += 1
+                    else:
+                        profile.waiting_samples += 1
+
+    def list(self, route: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        profiles = [p for p in reversed(self.profiles) if route is None or p.route == route]
+        return [p.summary() for p in profiles[:limit]]
+
+    def get(self, profile_id: int) -> Optional[Dict[str, Any]]:
+        for profile in self.profiles:
+            if profile.id == profile_id:
+                return profile.as_dict()
+        return None
+
+    def clear(self):
+        self.profiles.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "routes": sorted(self.routes),
+            "header_trigger": self.header_token is not None,
+            "interval_ms": self.interval * 1000,
+            "buffer_size": self.profiles.maxlen,
+            "buffered": len(self.profiles),
+            "active": len(self._active),
+            "profiled": self.profiled,
+        }
+
+
+def _route_template(scope) -> Optional[str]:
+    """Route template for a request that hasn't been routed yet (only used with PROFILE_ROUTES)"""
+    for route in scope['app'].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, 'path_format', None)
+    return None
+
+
+class ProfilingMiddleware:
+    """Pure ASGI; a pass-through unless the request is picked for profiling"""
+
+    def __init__(self, app, profiler: Profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        profile = self.profiler.begin(scope)
+        if profile is None:
+            return await self.app(scope, receive, send)
+
+        status = None
+        token = _current.set(profile)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                message.setdefault('headers', [])
+                message['headers'] = list(message['headers']) + [(b'x-profile-id', str(profile.id).encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            self.profiler.end(profile, scope, status)
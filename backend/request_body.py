@@ -0,0 +1,82 @@
+"""
+Size-limited, single-pass request body reading for raw Request routes.
+
+Routes that take a Request instead of a Pydantic model (/track,
+/track/batch, /track/compact, the Lemon Squeezy webhook) used to go
+through request.json() or request.body() + json.loads: the whole body was
+buffered with no size limit, and the webhook read it twice (once for the
+HMAC, once more via request.json()).
+
+read_body() checks Content-Length up front and stops streaming as soon as
+the body grows past the limit, so an oversized request is rejected without
+being buffered. The bytes it returns are what signatures are verified over
+and what loads() decodes - one read, one parse, straight from the buffer.
+
+loads() uses orjson when it is installed (several times faster than the
+stdlib on the payloads we get) and falls back to json.loads. orjson is
+stricter: NaN/Infinity and integers beyond 64 bits are rejected as invalid
+JSON, neither of which a tracking event or webhook legitimately contains.
+"""
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+JSON_DECODER = 'orjson' if orjson is not None else 'json'
+
+
+class BodyTooLarge(ValueError):
+    def __init__(self, limit: int):
+        super().__init__(f"Request body exceeds {limit} bytes")
+        self.limit = limit
+
+
+class InvalidJSON(ValueError):
+    pass
+
+
+async def read_body(request, limit: int) -> bytes:
+    """Read the raw request body once; raises BodyTooLarge past limit bytes"""
+    declared = request.headers.get('content-length')
+    if declared is not None and declared.isdigit() and int(declared) > limit:
+        raise BodyTooLarge(limit)
+
+    body = b''
+    buffer = None
+    async for chunk in request.stream():
+        if not chunk:
+            continue
+        if buffer is None and not body:
+            # Common case: the whole body arrives in one chunk, keep it as-is
+            body = chunk
+        else:
+            if buffer is None:
+                buffer = bytearray(body)
+            buffer += chunk
+        if len(buffer if buffer is not None else body) > limit:
+            raise BodyTooLarge(limit)
+    return bytes(buffer) if buffer is not None else body
+
+
+if orjson is not None:
+    def loads(raw: bytes) -> Any:
+        """Decode a JSON body; raises InvalidJSON"""
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError as e:
+            raise InvalidJSON(str(e))
+else:
+    def loads(raw: bytes) -> Any:
+        """Decode a JSON body; raises InvalidJSON"""
+        try:
+            return json.loads(raw)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise InvalidJSON(str(e))
+
+
+async def read_json(request, limit: int) -> Any:
+    """read_body() + loads(); raises BodyTooLarge or InvalidJSON"""
+    return loads(await read_body(request, limit))
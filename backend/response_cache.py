@@ -0,0 +1,207 @@
+"""
+In-process cache for assembled public API payloads.
+
+Entries are stored already serialized together with a strong ETag (a hash
+of the exact bytes sent), so a cache hit never re-queries the database or
+re-encodes JSON, and a client/edge revalidating with If-None-Match gets a
+bodyless 304.
+
+Bodies of at least PUBLIC_COMPRESS_MIN_BYTES are also compressed once, when
+the entry is stored: gzip always, brotli when the Brotli package is
+installed. respond() picks the variant from Accept-Encoding (brotli first
+at equal preference) and writes the stored bytes with their own ETag, so a
+hit does no encoding or compression work. Smaller bodies are sent as-is:
+compressing a few hundred bytes saves less than the header overhead.
+Compression runs on the event loop during the fill, so levels are moderate
+(gzip 6, brotli 5: most of the ratio for a fraction of the CPU of level 9)
+and bodies above PUBLIC_COMPRESS_MAX_BYTES are stored uncompressed rather
+than stalling every other request on a large space's payload.
+
+Keys are tuples whose first element is the space_id, which lets writes
+(widget settings, CTA selector, testimonial approval) drop everything
+cached for that space with invalidate(space_id). A load that started
+before an invalidation must not store its (pre-write) result afterwards:
+callers take generation() before loading and pass it to put(), which
+skips storing when the space was invalidated in between.
+"""
+import gzip
+import hashlib
+import logging
+import os
+from functools import lru_cache
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from cachetools import TTLCache
+from fastapi.responses import Response
+
+from fast_json import dumps
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+PUBLIC_CACHE_SIZE = int(os.environ.get('PUBLIC_CACHE_SIZE', '5000'))
+PUBLIC_CACHE_TTL = int(os.environ.get('PUBLIC_CACHE_TTL', '60'))  # seconds (in-process)
+PUBLIC_CACHE_MAX_AGE = int(os.environ.get('PUBLIC_CACHE_MAX_AGE', '30'))  # seconds (browser/edge)
+PUBLIC_CACHE_SWR = int(os.environ.get('PUBLIC_CACHE_SWR', '300'))  # stale-while-revalidate window
+
+# Pre-compression of cached bodies (once per cache fill, on the event loop)
+PUBLIC_COMPRESS_MIN_BYTES = int(os.environ.get('PUBLIC_COMPRESS_MIN_BYTES', '1024'))
+PUBLIC_COMPRESS_MAX_BYTES = int(os.environ.get('PUBLIC_COMPRESS_MAX_BYTES', '1048576'))
+PUBLIC_GZIP_LEVEL = int(os.environ.get('PUBLIC_GZIP_LEVEL', '6'))
+PUBLIC_BROTLI_QUALITY = int(os.environ.get('PUBLIC_BROTLI_QUALITY', '5'))
+
+# Preferred first when the client accepts several equally
+if brotli is not None:
+    COMPRESSORS = (
+        ('br', lambda body: brotli.compress(body, quality=PUBLIC_BROTLI_QUALITY)),
+        ('gzip', lambda body: gzip.compress(body, PUBLIC_GZIP_LEVEL, mtime=0)),
+    )
+else:
+    COMPRESSORS = (
+        ('gzip', lambda body: gzip.compress(body, PUBLIC_GZIP_LEVEL, mtime=0)),
+    )
+
+
+def encode_json(payload: Any) -> bytes:
+    """Serialize like FastAPI's JSONResponse (orjson-backed, see fast_json)"""
+    return dumps(payload)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison: W/"x" matches "x"; '*' matches anything"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+@lru_cache(maxsize=256)
+def choose_encoding(accept_encoding: Optional[str], available: Tuple[str, ...]) -> Optional[str]:
+    """Best of the available encodings for an Accept-Encoding header (None = identity)"""
+    if not accept_encoding or not available:
+        return None
+    weights = {}
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.partition(';')
+        weight = 1.0
+        params = params.replace(' ', '')
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip()] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in available:
+        weight = weights.get(encoding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+class CachedPayload:
+    __slots__ = ('body', 'etag', 'headers', 'variants', 'encodings', 'etags')
+
+    def __init__(self, body: bytes, headers: Optional[Dict[str, str]] = None,
+                 min_compress: int = PUBLIC_COMPRESS_MIN_BYTES,
+                 max_compress: int = PUBLIC_COMPRESS_MAX_BYTES):
+        self.body = body
+        digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        self.etag = '"' + digest + '"'
+        # Extra response headers stored with the body (e.g. X-Next-Cursor)
+        self.headers = headers or {}
+        # encoding -> (compressed body, ETag); only kept when actually smaller
+        self.variants: Dict[str, Tuple[bytes, str]] = {}
+        if min_compress <= len(body) <= max_compress:
+            for encoding, compress in COMPRESSORS:
+                compressed = compress(body)
+                if len(compressed) < len(body):
+                    self.variants[encoding] = (compressed, f'"{digest}-{encoding}"')
+        self.encodings = tuple(self.variants)
+        self.etags = (self.etag,) + tuple(etag for _, etag in self.variants.values())
+
+
+class ResponseCache:
+    def __init__(self, maxsize: int = PUBLIC_CACHE_SIZE, ttl: int = PUBLIC_CACHE_TTL,
+                 max_age: int = PUBLIC_CACHE_MAX_AGE, stale_while_revalidate: int = PUBLIC_CACHE_SWR):
+        self._entries: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Bumped by every invalidation; space_id -> generation of its last invalidation.
+        # Kept well past any load's lifetime (loads are bounded by query timeouts).
+        self._generation = 0
+        self._invalidated: TTLCache = TTLCache(maxsize=maxsize, ttl=max(ttl, 300))
+        self.stale_puts = 0
+        self.cache_control = f"public, max-age={max_age}, stale-while-revalidate={stale_while_revalidate}"
+        self.hits = 0
+        self.misses = 0
+        # 200 responses written per encoding ('identity', 'gzip', 'br')
+        self.served: Dict[str, int] = {'identity': 0, 'gzip': 0, 'br': 0}
+
+    def get(self, key: Tuple[Hashable, ...]) -> Optional[CachedPayload]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def generation(self) -> int:
+        """Take before loading a payload; pass to put()"""
+        return self._generation
+
+    def put(self, key: Tuple[Hashable, ...], payload: Any,
+            headers: Optional[Dict[str, str]] = None,
+            generation: Optional[int] = None) -> CachedPayload:
+        """Store and return the entry; a load that raced an invalidation is returned but not stored"""
+        entry = CachedPayload(encode_json(payload), headers)
+        if generation is not None and self._invalidated.get(key[0], 0) > generation:
+            self.stale_puts += 1
+        else:
+            self._entries[key] = entry
+        return entry
+
+    def invalidate(self, space_id: str):
+        self._generation += 1
+        self._invalidated[space_id] = self._generation
+        stale = [key for key in list(self._entries.keys()) if key[0] == space_id]
+        for key in stale:
+            self._entries.pop(key, None)
+        if stale:
+            logger.info(f"Invalidated {len(stale)} cached payload(s) for space {space_id}")
+
+    def clear(self):
+        self._entries.clear()
+
+    def respond(self, entry: CachedPayload, if_none_match: Optional[str],
+                accept_encoding: Optional[str] = None) -> Response:
+        encoding = choose_encoding(accept_encoding, entry.encodings)
+        if encoding is None:
+            body, etag = entry.body, entry.etag
+        else:
+            body, etag = entry.variants[encoding]
+
+        headers = {"ETag": etag, "Cache-Control": self.cache_control, **entry.headers}
+        if entry.encodings:
+            headers["Vary"] = "Accept-Encoding"
+        # Any variant's ETag identifies the same content version
+        if any(etag_matches(if_none_match, candidate) for candidate in entry.etags):
+            return Response(status_code=304, headers=headers)
+        self.served[encoding or 'identity'] += 1
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries),
+                "stale_puts": self.stale_puts, "served": dict(self.served)}
@@ -0,0 +1,179 @@
+"""
+Pre-aggregated analytics rollups.
+
+analytics_rollups holds per-space impression/conversion counters in hourly
+and daily UTC buckets (see docs/ANALYTICS_ROLLUPS_MIGRATION.sql). The event
+ingestor calls AnalyticsRollups.record() after each bulk insert, which adds
+the batch's counts through the increment_analytics_rollups RPC.
+
+daily_counts() answers an analytics range by stitching together:
+- hourly rollups for the partial first day of the range
+- daily rollups for every complete day
+- hourly rollups for today's completed hours
+- the raw analytics_events tail for the current hour only, counted in the
+  database by the analytics_daily_counts RPC
+so the raw scan is bounded by one hour of traffic regardless of range.
+
+PostgREST caps rows per response (1000 by default), so rollup reads page
+on bucket_start; without the RPC the tail is paged on (created_at, id).
+"""
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from pagination import apply_keyset, split_page
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_ROLLUPS_ENABLED = os.environ.get('ANALYTICS_ROLLUPS_ENABLED', 'true').lower() == 'true'
+# Rows per read; stays within PostgREST's default 1000-row response cap
+ROLLUPS_PAGE_SIZE = int(os.environ.get('ROLLUPS_PAGE_SIZE', '999'))
+
+
+def _floor_hour(dt: datetime) -> datetime:
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def _floor_day(dt: datetime) -> datetime:
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def rollup_deltas(events: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Aggregate raw events into hour and day counter deltas.
+    Events carry created_at as a UTC ISO string ('YYYY-MM-DDTHH:MM:SS...+00:00').
+    """
+    counts = defaultdict(lambda: [0, 0])
+    for event in events:
+        created_at = event['created_at']
+        column = 0 if event['event_type'] == 'impression' else 1
+        counts[(event['space_id'], 'hour', f"{created_at[:13]}:00:00+00:00")][column] += 1
+        counts[(event['space_id'], 'day', f"{created_at[:10]}T00:00:00+00:00")][column] += 1
+
+    return [
+        {
+            "space_id": space_id,
+            "granularity": granularity,
+            "bucket_start": bucket_start,
+            "impressions": impressions,
+            "conversions": conversions
+        }
+        for (space_id, granularity, bucket_start), (impressions, conversions) in counts.items()
+    ]
+
+
+class AnalyticsRollups:
+    def __init__(self, db: Any, enabled: bool = ANALYTICS_ROLLUPS_ENABLED):
+        self.db = db
+        self.enabled = enabled
+
+    async def record(self, events: List[Dict[str, Any]]):
+        """Add a flushed batch to the rollup counters (called by the ingestor)"""
+        if not self.enabled or not events:
+            return
+        try:
+            await self.db.execute(self.db.rpc('increment_analytics_rollups', {'deltas': rollup_deltas(events)}))
+        except Exception as e:
+            # Counts for this batch can be repaired with compact_analytics_rollups()
+            logger.error(f"Failed to update analytics rollups for {len(events)} events: {e}")
+
+    async def _read(self, space_id: str, granularity: str, start: Optional[datetime], end: datetime) -> list:
+        if start is not None and start >= end:
+            return []
+        rows = []
+        after = None
+        while True:
+            query = self.db.table('analytics_rollups') \
+                .select('bucket_start, impressions, conversions') \
+                .eq('space_id', space_id) \
+                .eq('granularity', granularity) \
+                .lt('bucket_start', end.isoformat())
+            if start is not None:
+                query = query.gte('bucket_start', start.isoformat())
+            # bucket_start is unique per (space, granularity), so it is a complete keyset
+            if after is not None:
+                query = query.gt('bucket_start', after)
+            response = await self.db.execute(query.order('bucket_start').limit(ROLLUPS_PAGE_SIZE))
+            page = response.data or []
+            rows.extend(page)
+            if len(page) < ROLLUPS_PAGE_SIZE:
+                return rows
+            after = page[-1]['bucket_start']
+
+    async def _read_tail(self, space_id: str, start: datetime) -> list:
+        """Per-day {'date', 'impressions', 'conversions'} for raw events since start"""
+        try:
+            response = await self.db.execute(
+                self.db.rpc('analytics_daily_counts', {'p_space_id': space_id, 'p_since': start.isoformat()})
+            )
+            return response.data or []
+        except Exception as e:
+            logger.warning(f"analytics_daily_counts unavailable, paging raw tail for {space_id}: {e}")
+
+        counts: Dict[str, Dict[str, Any]] = {}
+        cursor = None
+        while True:
+            query = self.db.table('analytics_events') \
+                .select('id, event_type, created_at') \
+                .eq('space_id', space_id) \
+                .gte('created_at', start.isoformat())
+            response = await self.db.execute(apply_keyset(query, cursor, ROLLUPS_PAGE_SIZE))
+            page, cursor = split_page(response.data or [], ROLLUPS_PAGE_SIZE)
+            for event in page:
+                date = event['created_at'][:10]
+                row = counts.setdefault(date, {'date': date, 'impressions': 0, 'conversions': 0})
+                row['impressions' if event['event_type'] == 'impression' else 'conversions'] += 1
+            if cursor is None:
+                return list(counts.values())
+
+    async def daily_counts(self, space_id: str, start: Optional[datetime],
+                           now: Optional[datetime] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Return {date: {'date', 'impressions', 'conversions'}} for [start, now].
+        start=None means all time. The first day is resolved to the hour.
+        Raises if rollups are disabled or unavailable so callers can fall back.
+        """
+        if not self.enabled:
+            raise RuntimeError("Analytics rollups are disabled")
+
+        now = now or datetime.now(timezone.utc)
+        today = _floor_day(now)
+        current_hour = _floor_hour(now)
+
+        if start is None:
+            head_start, days_start = None, None
+        else:
+            head_start = _floor_hour(start)
+            days_start = _floor_day(start)
+            if days_start < head_start:
+                days_start += timedelta(days=1)
+
+        reads = [
+            self._read(space_id, 'day', days_start, today),
+            self._read(space_id, 'hour', max(today, head_start) if head_start else today, current_hour),
+            self._read_tail(space_id, current_hour),
+        ]
+        if head_start is not None:
+            reads.append(self._read(space_id, 'hour', head_start, min(days_start, today)))
+
+        results = await asyncio.gather(*reads)
+
+        date_groups: Dict[str, Dict[str, Any]] = {}
+
+        def add(date: str, impressions: int, conversions: int):
+            group = date_groups.setdefault(date, {'date': date, 'impressions': 0, 'conversions': 0})
+            group['impressions'] += impressions
+            group['conversions'] += conversions
+
+        daily, today_hours, tail = results[0], results[1], results[2]
+        head_hours = results[3] if len(results) > 3 else []
+
+        for row in daily + today_hours + head_hours:
+            add(row['bucket_start'][:10], row['impressions'], row['conversions'])
+        for row in tail:
+            add(row['date'], row['impressions'], row['conversions'])
+
+        return date_groups
@@ -1,13 +1,15 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Request, Header
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from supabase import create_client, Client
 import os
 import logging
+from contextlib import asynccontextmanager
 from pathlib import Path
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
+import asyncio
 import uuid
 from datetime import datetime, timezone, timedelta
 import hmac
@@ -16,17 +18,51 @@ import httpx
 import jwt
 import base64
 
+from db import Database, DB_MAX_WORKERS, DB_MAX_CONCURRENCY
+from local_backend import LocalSupabase
+from token_verifier import TokenVerifier
+from response_cache import ResponseCache, encode_json
+from fast_json import FastJSONResponse
+from ingest import EventIngestor
+from rollups import AnalyticsRollups
+from http_client import OutboundHTTP
+from domain_health import DomainHealthChecker
+from domain_scheduler import DomainScheduler
+from domain_routes import DomainRoutingTable
+from slug_cache import SlugCache, MISSING
+from singleflight import SingleFlight
+from plan_catalog import PlanCatalog, EntitlementCache
+from webhook_events import WebhookEventProcessor
+from beacon import BeaconError, BeaconTooLarge, BEACON_MAX_BYTES, PIXEL_GIF, parse_beacon
+from request_body import BodyTooLarge, InvalidJSON, read_body, read_json, loads as loads_json
+from metrics import REGISTRY, Gauge, MetricsMiddleware
+from profiler import Profiler, ProfilingMiddleware, PROFILE_HEADER_TOKEN
+import analytics_engine
+from pagination import (
+    TESTIMONIALS_EXPORT_PAGE_SIZE,
+    apply_keyset, split_page, clamp_limit, decode_cursor
+)
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# Supabase connection
-supabase_url = os.environ.get('SUPABASE_URL')
-supabase_key = os.environ.get('SUPABASE_SERVICE_ROLE_KEY')
+# Data backend: 'supabase' (default) or 'local' in-memory stand-in for dev/benchmarks
+DATA_BACKEND = os.environ.get('DATA_BACKEND', 'supabase')
+
+if DATA_BACKEND == 'local':
+    supabase = LocalSupabase(latency=float(os.environ.get('LOCAL_BACKEND_LATENCY_MS', '0')) / 1000)
+else:
+    # Supabase connection
+    supabase_url = os.environ.get('SUPABASE_URL')
+    supabase_key = os.environ.get('SUPABASE_SERVICE_ROLE_KEY')
+
+    if not supabase_url or not supabase_key:
+        raise ValueError("Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY")
 
-if not supabase_url or not supabase_key:
-    raise ValueError("Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY")
+    supabase: Client = create_client(supabase_url, supabase_key)
 
-supabase: Client = create_client(supabase_url, supabase_key)
+# All routes go through the async data-access layer (never call .execute() directly)
+db = Database(supabase, max_workers=DB_MAX_WORKERS, max_concurrency=DB_MAX_CONCURRENCY)
 
 # Lemon Squeezy Configuration
 LEMON_SQUEEZY_API_KEY = os.environ.get('LEMON_SQUEEZY_API_KEY', '')
@@ -40,8 +76,89 @@ try:
 except Exception:
     SUPABASE_JWT_SECRET = _jwt_secret_raw.encode() if _jwt_secret_raw else b''
 
+# Page size when streaming raw analytics_events rows (PostgREST caps rows per response
+# at 1000 and apply_keyset() fetches one look-ahead row on top of the page)
+ANALYTICS_PAGE_SIZE = int(os.environ.get('ANALYTICS_PAGE_SIZE', '999'))
+# Longest range /analytics/{space_id}/timeseries will scan raw events for
+ANALYTICS_MAX_RANGE_DAYS = int(os.environ.get('ANALYTICS_MAX_RANGE_DAYS', '366'))
+
+# /track/batch bounds: events per request and raw body size
+TRACK_BATCH_MAX_EVENTS = int(os.environ.get('TRACK_BATCH_MAX_EVENTS', '50'))
+TRACK_BATCH_MAX_BYTES = int(os.environ.get('TRACK_BATCH_MAX_BYTES', '65536'))
+
+# Raw body limits for /track and the Lemon Squeezy webhook (413 above these)
+TRACK_MAX_BYTES = int(os.environ.get('TRACK_MAX_BYTES', '16384'))
+WEBHOOK_MAX_BYTES = int(os.environ.get('WEBHOOK_MAX_BYTES', '1048576'))
+
+# Buffered /track ingestion (bulk inserts off the request path),
+# maintaining the hourly/daily analytics rollups as batches land
+analytics_rollups = AnalyticsRollups(db)
+event_ingestor = EventIngestor(db, on_flush=analytics_rollups.record)
+
+# Assembled public widget payloads (ETag + Cache-Control), invalidated on writes
+public_cache = ResponseCache()
+
+# Coalesces identical concurrent public reads (cold-cache bursts) into one backend call
+public_flights = SingleFlight()
+
+
+def invalidate_public_payloads(space_id: str):
+    """Drop cached widget payloads for a space and detach reads started before the write"""
+    public_cache.invalidate(space_id)
+    public_flights.forget((space_id,))
+
+
+# slug -> SpacePublic for submission forms, with bounded negative entries
+slug_cache = SlugCache()
+
+# Per-lookup timeout for the public-data fan-out (seconds)
+PUBLIC_QUERY_TIMEOUT = float(os.environ.get('PUBLIC_QUERY_TIMEOUT', '3.0'))
+
+# Offline token verification: try the decoded secret, then the raw string form
+token_verifier = TokenVerifier(
+    secrets=[SUPABASE_JWT_SECRET, _jwt_secret_raw.encode()],
+    jwks_url=f"{supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json" if DATA_BACKEND != 'local' else None
+)
+
+
+# Pooled outbound HTTP (webhook tests, Lemon Squeezy), kept open for the app's lifetime
+outbound_http = OutboundHTTP()
+
+# Async CNAME checks for custom domains (bounded concurrency, retry with jitter)
+domain_checker = DomainHealthChecker()
+
+# Hostname -> space map for /custom-domains/resolve, reloaded when active domains change
+domain_routes = DomainRoutingTable(db)
+
+# Plans (reloaded on a TTL, indexed by Lemon Squeezy variant) and per-user resolved
+# entitlements (plan + custom_overrides), dropped by subscription webhooks
+plan_catalog = PlanCatalog(db)
+entitlement_cache = EntitlementCache(db, plan_catalog)
+
+# Sampled request profiles (off unless PROFILING_ENABLED, the admin toggle, or an X-Profile header)
+request_profiler = Profiler(header_token=PROFILE_HEADER_TOKEN)
+
+# Re-verifies pending/failed domains (with backoff) and sweeps active ones in the background
+domain_scheduler = DomainScheduler(db, domain_checker, on_disconnect=domain_routes.invalidate)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await outbound_http.start()
+    await event_ingestor.start()
+    await domain_routes.start()
+    await domain_scheduler.start()
+    await webhook_processor.start()
+    yield
+    await webhook_processor.stop()
+    await domain_scheduler.stop()
+    await event_ingestor.stop()
+    await outbound_http.aclose()
+    db.shutdown()
+
+
 # Create the main app
-app = FastAPI(title="TrustFlow API")
+app = FastAPI(title="TrustFlow API", lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -55,10 +172,33 @@ logger = logging.getLogger(__name__)
 
 
 # --- JWT Token Verification Helper ---
+async def _verify_token_remote(token: str) -> dict:
+    """Verify a token with Supabase's auth.get_user() (one network round trip)"""
+    user_response = await db.run(db.auth.get_user, token)
+    
+    if not user_response or not user_response.user:
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid authentication token. Please log in again."
+        )
+    
+    user = user_response.user
+    logger.info(f"Token verified remotely for user: {user.id}")
+    
+    # Return user info in a format similar to JWT payload
+    return {
+        "sub": user.id,
+        "email": user.email,
+        "user_metadata": user.user_metadata if hasattr(user, 'user_metadata') else {}
+    }
+
+
 async def verify_supabase_token(authorization: str = Header(None)) -> dict:
     """
     Verify Supabase JWT token from Authorization header.
-    Uses Supabase's auth.get_user() to validate the token.
+    Checks signature, expiry and audience locally (SUPABASE_JWT_SECRET / JWKS)
+    and caches verified tokens; falls back to auth.get_user() only when the
+    token is signed with a key we don't know.
     Returns the decoded token payload with user info.
     Raises HTTPException if token is invalid or missing.
     """
@@ -79,26 +219,7 @@ async def verify_supabase_token(authorization: str = Header(None)) -> dict:
     token = parts[1]
     
     try:
-        # Use Supabase's built-in auth verification
-        # This is the most reliable way to verify Supabase tokens
-        user_response = supabase.auth.get_user(token)
-        
-        if not user_response or not user_response.user:
-            raise HTTPException(
-                status_code=401,
-                detail="Invalid authentication token. Please log in again."
-            )
-        
-        user = user_response.user
-        logger.info(f"Token verified successfully for user: {user.id}")
-        
-        # Return user info in a format similar to JWT payload
-        return {
-            "sub": user.id,
-            "email": user.email,
-            "user_metadata": user.user_metadata if hasattr(user, 'user_metadata') else {}
-        }
-        
+        return await token_verifier.verify(token, _verify_token_remote)
     except HTTPException:
         raise
     except Exception as e:
@@ -109,6 +230,35 @@ async def verify_supabase_token(authorization: str = Header(None)) -> dict:
         )
 
 
+async def require_space_owner(space_id: str, authorization: Optional[str]) -> dict:
+    """
+    Verify the caller's Supabase JWT and that they own the space.
+    Returns the space row (id, slug); 401/403/404 otherwise.
+    """
+    token_payload = await verify_supabase_token(authorization)
+    user_id = token_payload.get('sub')
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Invalid authentication token. Please log in again.")
+    
+    try:
+        response = await db.execute(
+            db.table('spaces')
+            .select('id, slug, owner_id')
+            .eq('id', space_id)
+            .maybe_single()
+        )
+    except Exception as e:
+        logger.error(f"Error checking space ownership for {space_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch space")
+    
+    if not response or not response.data:
+        raise HTTPException(status_code=404, detail="Space not found")
+    if response.data.get('owner_id') != user_id:
+        logger.warning(f"User {user_id} attempted to modify space {space_id}")
+        raise HTTPException(status_code=403, detail="Access denied. You can only manage your own spaces.")
+    return response.data
+
+
 # Models
 class TestimonialPublic(BaseModel):
     id: str
@@ -178,17 +328,22 @@ async def get_widget_settings(space_id: str):
     """Retrieve widget configurations for a specific space"""
     try:
         # Fetch settings from the 'widget_configurations' table
-        response = supabase.table('widget_configurations') \
-            .select('settings') \
-            .eq('space_id', space_id) \
-            .execute()
+        # (concurrent loads of the same space share one query)
+        response = await public_flights.do(
+            (space_id, 'widget-settings'),
+            lambda: db.execute(
+                db.table('widget_configurations')
+                .select('settings')
+                .eq('space_id', space_id)
+            )
+        )
         
         # If data exists, return it
         if response.data and len(response.data) > 0:
-            return {"status": "success", "settings": response.data[0]['settings']}
+            return FastJSONResponse({"status": "success", "settings": response.data[0]['settings']})
         
         # If no data found, return empty dict (frontend will use defaults)
-        return {"status": "success", "settings": {}}
+        return FastJSONResponse({"status": "success", "settings": {}})
 
     except Exception as e:
         logger.error(f"Error fetching widget settings: {e}")
@@ -208,9 +363,11 @@ async def save_widget_settings(space_id: str, config: WidgetSettingsUpdate):
             'updated_at': datetime.now(timezone.utc).isoformat()
         }
         
-        response = supabase.table('widget_configurations') \
-            .upsert(data, on_conflict='space_id') \
-            .execute()
+        response = await db.execute(
+            db.table('widget_configurations')
+            .upsert(data, on_conflict='space_id')
+        )
+        invalidate_public_payloads(space_id)
             
         return {"status": "success", "message": "Settings saved successfully"}
 
@@ -229,89 +386,285 @@ async def health_check():
     return {"status": "healthy", "timestamp": datetime.now(timezone.utc).isoformat()}
 
 
+PUBLIC_TESTIMONIAL_COLUMNS = 'id, type, content, video_url, rating, respondent_name, respondent_photo_url, respondent_role, attached_photos, created_at'
+# The widget payload also carries is_liked (embed.js filters on it)
+WIDGET_TESTIMONIAL_COLUMNS = 'id, is_liked, type, content, video_url, rating, respondent_name, respondent_photo_url, respondent_role, attached_photos, created_at'
+
+
+def _approved_testimonials_query(space_id: str, columns: str = PUBLIC_TESTIMONIAL_COLUMNS):
+    return (
+        db.table('testimonials')
+        .select(columns)
+        .eq('space_id', space_id)
+        .eq('is_liked', True)
+    )
+
+
+async def _stream_testimonials_ndjson(space_id: str, first_page: list, next_cursor: Optional[str]):
+    """Yield one JSON line per testimonial, fetching keyset pages as the client reads"""
+    page = first_page
+    while True:
+        for row in page:
+            yield encode_json(row) + b"\n"
+        if not next_cursor:
+            return
+        try:
+            res = await db.execute(
+                apply_keyset(_approved_testimonials_query(space_id), next_cursor, TESTIMONIALS_EXPORT_PAGE_SIZE)
+            )
+        except Exception as e:
+            # Headers are already sent; end the stream and leave it truncated
+            logger.error(f"Error streaming testimonials for {space_id}: {e}")
+            return
+        page, next_cursor = split_page(res.data or [], TESTIMONIALS_EXPORT_PAGE_SIZE)
+
+
 @api_router.get("/public/testimonials", response_model=List[TestimonialPublic])
-async def get_public_testimonials(space_id: str):
-    """Get approved testimonials for a space (for widget)"""
+async def get_public_testimonials(space_id: str, request: Request, limit: Optional[int] = None,
+                                  cursor: Optional[str] = None, format: str = "json"):
+    """
+    Get approved testimonials for a space (for widget), newest first.
+    Returns every approved testimonial by default (read in keyset pages so
+    PostgREST's row cap can't truncate them). Passing limit or cursor returns
+    one page of at most `limit` rows; when more exist the X-Next-Cursor
+    header carries the cursor for the next page. format=ndjson streams every
+    approved testimonial as newline-delimited JSON, paging internally.
+    Rows are selected with exactly the TestimonialPublic columns and sent
+    as-is, without re-validating them into the model. JSON responses are
+    served from the public cache (ETag, pre-compressed per Accept-Encoding).
+    """
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'ndjson'")
+    paged = format == "json" and (limit is not None or cursor is not None)
+    try:
+        page_size = clamp_limit(limit) if paged else TESTIMONIALS_EXPORT_PAGE_SIZE
+        query = apply_keyset(_approved_testimonials_query(space_id), cursor, page_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def load_all():
+        rows, next_cursor = [], None
+        while True:
+            res = await db.execute(apply_keyset(_approved_testimonials_query(space_id), next_cursor, page_size))
+            page, next_cursor = split_page(res.data or [], page_size)
+            rows.extend(page)
+            if not next_cursor:
+                return rows
+
+    cache_key = (space_id, 'testimonials', page_size if paged else None, cursor)
+    if format == "json":
+        entry = public_cache.get(cache_key)
+        if entry is not None:
+            return public_cache.respond(entry, request.headers.get('if-none-match'),
+                                        request.headers.get('accept-encoding'))
+    generation = public_cache.generation()
+
     try:
-        response = supabase.table('testimonials') \
-            .select('id, type, content, video_url, rating, respondent_name, respondent_photo_url, respondent_role, attached_photos, created_at') \
-            .eq('space_id', space_id) \
-            .eq('is_liked', True) \
-            .order('created_at', desc=True) \
-            .execute()
-        
-        return response.data
+        if paged:
+            res = await public_flights.do(cache_key, lambda: db.execute(query))
+        elif format == "json":
+            rows = await public_flights.do(cache_key, load_all)
+        else:
+            res = await db.execute(query)
     except Exception as e:
         logger.error(f"Error fetching testimonials: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch testimonials")
 
+    if format == "ndjson":
+        page, next_cursor = split_page(res.data or [], page_size)
+        return StreamingResponse(
+            _stream_testimonials_ndjson(space_id, page, next_cursor),
+            media_type="application/x-ndjson",
+            headers={"Content-Disposition": f'attachment; filename="testimonials-{space_id}.ndjson"'}
+        )
+
+    headers = None
+    if paged:
+        rows, next_cursor = split_page(res.data or [], page_size)
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    entry = public_cache.put(cache_key, rows, headers=headers, generation=generation)
+    return public_cache.respond(entry, request.headers.get('if-none-match'),
+                                request.headers.get('accept-encoding'))
+
 
 @api_router.get("/public/space/{slug}", response_model=SpacePublic)
 async def get_public_space(slug: str):
-    """Get space info by slug (for submission form)"""
+    """Get space info by slug (for submission form), served from the slug cache"""
+    cached = slug_cache.get(slug)
+    if cached is MISSING:
+        raise HTTPException(status_code=404, detail="Space not found")
+    if cached is not None:
+        return FastJSONResponse(cached)
+    
     try:
-        response = supabase.table('spaces') \
-            .select('id, space_name, slug, logo_url, header_title, custom_message, collect_star_rating') \
-            .eq('slug', slug) \
-            .single() \
-            .execute()
-        
-        if not response.data:
-            raise HTTPException(status_code=404, detail="Space not found")
-        
-        return response.data
-    except HTTPException:
-        raise
+        response = await db.execute(
+            db.table('spaces')
+            .select('id, space_name, slug, logo_url, header_title, custom_message, collect_star_rating')
+            .eq('slug', slug)
+            .maybe_single()
+        )
     except Exception as e:
         logger.error(f"Error fetching space: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch space")
     
+    # maybe_single() returns None (instead of raising) when no row matches
+    if not response or not response.data:
+        slug_cache.put_missing(slug)
+        raise HTTPException(status_code=404, detail="Space not found")
+    
+    slug_cache.put(slug, response.data)
+    return FastJSONResponse(response.data)
+
+
+@api_router.post("/spaces/{space_id}/invalidate")
+async def invalidate_space_caches(space_id: str, authorization: str = Header(None)):
+    """
+    Drop every cached public view of a space after the dashboard edits it
+    (name, slug, branding): slug lookup, widget payloads and custom-domain
+    route. Requires the space owner's Supabase JWT. A cached 404 for the
+    space's current slug (e.g. just renamed to it) is dropped too.
+    """
+    space = await require_space_owner(space_id, authorization)
+    slug_cache.invalidate_space(space_id, space.get('slug'))
+    invalidate_public_payloads(space_id)
+    await domain_routes.invalidate_space(space_id)
+    return {"status": "success", "message": "Cache invalidated"}
+
+    
 # --- NEW: Combined Endpoint for Popups & Embed ---
+async def _load_space_public_data(space_id: str, limit: Optional[int] = None,
+                                  cursor: Optional[str] = None) -> dict:
+    """
+    Assemble the widget payload for a space.
+    Without a limit, testimonials are every approved text testimonial
+    (newest first, read in keyset pages so PostgREST's row cap can't
+    truncate them). With a limit they are one keyset page and
+    "next_cursor" is set when older ones exist.
+    The three lookups are independent, so they run concurrently, each with
+    its own timeout (PUBLIC_QUERY_TIMEOUT). A lookup that fails or times out
+    falls back to its empty default and is listed in "missing" with status
+    "partial"; if every lookup fails the status is "error".
+    """
+    # 1. Testimonials (Recent First)
+    def page_query(page_cursor, page_size):
+        return apply_keyset(
+            _approved_testimonials_query(space_id, WIDGET_TESTIMONIAL_COLUMNS).eq('type', 'text'),
+            page_cursor, page_size
+        )
+
+    async def fetch_testimonials():
+        if limit is not None:
+            res = await db.execute(page_query(cursor, limit))
+            page, payload["next_cursor"] = split_page(res.data or [], limit)
+            return page
+        rows, next_cursor = [], None
+        while True:
+            res = await db.execute(page_query(next_cursor, TESTIMONIALS_EXPORT_PAGE_SIZE))
+            page, next_cursor = split_page(res.data or [], TESTIMONIALS_EXPORT_PAGE_SIZE)
+            rows.extend(page)
+            if not next_cursor:
+                return rows
+
+    # 2. Settings
+    async def fetch_widget_settings():
+        res = await db.execute(
+            db.table('widget_configurations')
+            .select('settings')
+            .eq('space_id', space_id)
+        )
+        if res.data and len(res.data) > 0:
+            return res.data[0]['settings']
+        return {}
+
+    # 3. CTA Selector for Analytics
+    async def fetch_cta_selector():
+        res = await db.execute(
+            db.table('spaces')
+            .select('cta_selector')
+            .eq('id', space_id)
+            .single()
+        )
+        return res.data.get('cta_selector') if res.data else None
+
+    lookups = {
+        "testimonials": (fetch_testimonials, []),
+        "widget_settings": (fetch_widget_settings, {}),
+        "cta_selector": (fetch_cta_selector, None),
+    }
+    payload = {"status": "success", "next_cursor": None}
+    results = await asyncio.gather(
+        *(asyncio.wait_for(fetch(), PUBLIC_QUERY_TIMEOUT) for fetch, _ in lookups.values()),
+        return_exceptions=True
+    )
+
+    missing = []
+    for (name, (_, default)), result in zip(lookups.items(), results):
+        if isinstance(result, Exception):
+            logger.warning(f"Public data lookup '{name}' failed for {space_id}: {result!r}")
+            payload[name] = default
+            missing.append(name)
+        else:
+            payload[name] = result
+
+    if missing:
+        payload["status"] = "error" if len(missing) == len(lookups) else "partial"
+        payload["missing"] = missing
+    return payload
+
+
 @api_router.get("/spaces/{space_id}/public-data")
-async def get_space_public_data(space_id: str):
+async def get_space_public_data(space_id: str, request: Request, limit: Optional[int] = None,
+                                cursor: Optional[str] = None):
+    """
+    Widget payload for popups & embeds.
+    Served from the in-process cache with a strong ETag; clients/edges
+    revalidating with If-None-Match get a 304. Larger payloads are stored
+    pre-compressed and sent gzip/brotli per Accept-Encoding.
+    By default every approved testimonial is returned (what embed.js
+    expects); paging is opt-in with limit/cursor (see "next_cursor").
+    """
     try:
-        # 1. Testimonials (Recent First)
-        testimonials_res = supabase.table('testimonials') \
-            .select('id, is_liked, type, content, video_url, rating, respondent_name, respondent_photo_url, respondent_role, attached_photos, created_at') \
-            .eq('space_id', space_id) \
-            .eq('is_liked', True) \
-            .eq('type', 'text') \
-            .order('created_at', desc=True) \
-            .execute()
-        
-        testimonials = testimonials_res.data if testimonials_res.data else []
-
-        # 2. Settings
-        settings_res = supabase.table('widget_configurations') \
-            .select('settings') \
-            .eq('space_id', space_id) \
-            .execute()
-        
-        widget_settings = {}
-        if settings_res.data and len(settings_res.data) > 0:
-            widget_settings = settings_res.data[0]['settings']
-
-        # 3. CTA Selector for Analytics
-        cta_res = supabase.table('spaces') \
-            .select('cta_selector') \
-            .eq('id', space_id) \
-            .single() \
-            .execute()
-        
-        cta_selector = None
-        if cta_res.data:
-            cta_selector = cta_res.data.get('cta_selector')
+        if limit is not None or cursor:
+            limit = clamp_limit(limit)
+        if cursor:
+            decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    cache_key = (space_id, 'public-data', limit, cursor)
+    entry = public_cache.get(cache_key)
+    
+    if entry is None:
+        # Taken before loading: a write landing mid-load keeps this result out of the cache
+        generation = public_cache.generation()
+        try:
+            # Concurrent cold-cache loads of the same page share one fan-out
+            payload = await public_flights.do(
+                cache_key, lambda: _load_space_public_data(space_id, limit, cursor)
+            )
+        except Exception as e:
+            logger.error(f"Error fetching public data for {space_id}: {e}")
+            payload = {"status": "error", "testimonials": [], "widget_settings": {}, "cta_selector": None, "next_cursor": None}
+        
+        # Only complete payloads are cached
+        if payload["status"] != "success":
+            return FastJSONResponse(payload, headers={"Cache-Control": "no-store"})
+        entry = public_cache.put(cache_key, payload, generation=generation)
+    
+    return public_cache.respond(entry, request.headers.get('if-none-match'),
+                                request.headers.get('accept-encoding'))
 
-        return {
-            "status": "success",
-            "testimonials": testimonials,
-            "widget_settings": widget_settings,
-            "cta_selector": cta_selector
-        }
 
-    except Exception as e:
-        logger.error(f"Error fetching public data for {space_id}: {e}")
-        return {"status": "error", "testimonials": [], "widget_settings": {}, "cta_selector": None}
+@api_router.post("/spaces/{space_id}/public-data/invalidate")
+async def invalidate_space_public_data(space_id: str, authorization: str = Header(None)):
+    """
+    Drop cached widget payloads for a space (called after testimonial approval changes).
+    Requires the space owner's Supabase JWT.
+    """
+    await require_space_owner(space_id, authorization)
+    invalidate_public_payloads(space_id)
+    return {"status": "success", "message": "Cache invalidated"}
+
 
 @api_router.get("/setup-db")
 async def setup_database():
@@ -319,7 +672,7 @@ async def setup_database():
     try:
         # This endpoint helps verify the Supabase connection
         # The actual tables should be created in Supabase Dashboard
-        response = supabase.table('spaces').select('count', count='exact').execute()
+        response = await db.execute(db.table('spaces').select('count', count='exact'))
         return {
             "status": "connected",
             "spaces_count": response.count,
@@ -336,9 +689,56 @@ async def setup_database():
 
 # --- ANALYTICS & TRACKING ROUTES ---
 
+async def _aggregate_analytics_events(space_id: str, start_date: Optional[datetime]) -> dict:
+    """
+    Count events per day inside Postgres (analytics_daily_counts RPC, see
+    docs/ANALYTICS_PUSHDOWN_MIGRATION.sql): transfers O(days) rows, not O(events).
+    """
+    response = await db.execute(db.rpc('analytics_daily_counts', {
+        'p_space_id': space_id,
+        'p_since': start_date.isoformat() if start_date else None
+    }))
+    return {
+        row['date']: {'date': row['date'], 'impressions': row['impressions'], 'conversions': row['conversions']}
+        for row in response.data or []
+    }
+
+
+async def _scan_analytics_events(space_id: str, start_date: Optional[datetime]) -> dict:
+    """Fallback: aggregate raw analytics_events rows by date in Python"""
+    # Build base query
+    query = db.table('analytics_events').select('event_type, created_at').eq('space_id', space_id)
+    
+    if start_date:
+        query = query.gte('created_at', start_date.isoformat())
+    
+    response = await db.execute(query.order('created_at', desc=True))
+    events = response.data or []
+    
+    # Group by date for chart data
+    date_groups = {}
+    for event in events:
+        # Parse date and extract just the date part
+        event_date = event['created_at'][:10]  # YYYY-MM-DD
+        if event_date not in date_groups:
+            date_groups[event_date] = {'date': event_date, 'impressions': 0, 'conversions': 0}
+        if event['event_type'] == 'impression':
+            date_groups[event_date]['impressions'] += 1
+        else:
+            date_groups[event_date]['conversions'] += 1
+    
+    return date_groups
+
+
 @api_router.get("/analytics/{space_id}")
 async def get_analytics(space_id: str, range: str = "7d"):
-    """Fetch analytics data for a space with date range filtering"""
+    """
+    Fetch analytics data for a space with date range filtering.
+    Sources, in order of preference:
+    1. pre-aggregated rollups (raw events only for the current hour)
+    2. per-day counts computed in the database (RPC push-down)
+    3. scanning raw events in Python
+    """
     try:
         # Calculate date range
         now = datetime.now(timezone.utc)
@@ -349,35 +749,24 @@ async def get_analytics(space_id: str, range: str = "7d"):
         else:  # 'all' or any other value
             start_date = None
         
-        # Build base query
-        query = supabase.table('analytics_events').select('*').eq('space_id', space_id)
-        
-        if start_date:
-            query = query.gte('created_at', start_date.isoformat())
+        try:
+            date_groups = await analytics_rollups.daily_counts(space_id, start_date, now)
+        except Exception as e:
+            logger.warning(f"Analytics rollups unavailable for {space_id}, aggregating in database: {e}")
+            try:
+                date_groups = await _aggregate_analytics_events(space_id, start_date)
+            except Exception as e:
+                logger.warning(f"Analytics push-down unavailable for {space_id}, scanning raw events: {e}")
+                date_groups = await _scan_analytics_events(space_id, start_date)
         
-        response = query.order('created_at', desc=True).execute()
-        events = response.data or []
+        # Convert to sorted list
+        chart_data = sorted(date_groups.values(), key=lambda x: x['date'])
         
         # Aggregate counts
-        impressions = sum(1 for e in events if e['event_type'] == 'impression')
-        conversions = sum(1 for e in events if e['event_type'] == 'conversion')
+        impressions = sum(d['impressions'] for d in chart_data)
+        conversions = sum(d['conversions'] for d in chart_data)
         ctr = round((conversions / impressions * 100), 2) if impressions > 0 else 0
         
-        # Group by date for chart data
-        date_groups = {}
-        for event in events:
-            # Parse date and extract just the date part
-            event_date = event['created_at'][:10]  # YYYY-MM-DD
-            if event_date not in date_groups:
-                date_groups[event_date] = {'date': event_date, 'impressions': 0, 'conversions': 0}
-            if event['event_type'] == 'impression':
-                date_groups[event_date]['impressions'] += 1
-            else:
-                date_groups[event_date]['conversions'] += 1
-        
-        # Convert to sorted list
-        chart_data = sorted(date_groups.values(), key=lambda x: x['date'])
-        
         return {
             "status": "success",
             "summary": {
@@ -393,16 +782,84 @@ async def get_analytics(space_id: str, range: str = "7d"):
         raise HTTPException(status_code=500, detail="Failed to fetch analytics")
 
 
+@api_router.get("/analytics/{space_id}/timeseries")
+async def get_analytics_timeseries(
+    space_id: str,
+    granularity: str = "day",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    tz: str = "UTC",
+    window: int = 7
+):
+    """
+    Analytics series for an arbitrary range.
+    - granularity: 'hour', 'day' or 'week' (weeks start Monday)
+    - start/end: ISO timestamps (naive values are read in tz); default last 30 days
+    - tz: IANA timezone used for bucket boundaries
+    - window: buckets in the trailing moving averages
+    """
+    try:
+        if granularity not in analytics_engine.GRANULARITIES:
+            raise HTTPException(status_code=400, detail="Invalid granularity. Must be 'hour', 'day' or 'week'")
+        if window < 1 or window > 365:
+            raise HTTPException(status_code=400, detail="window must be between 1 and 365")
+        try:
+            start_dt, end_dt = analytics_engine.parse_range(start, end, tz)
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid start, end or tz")
+        # Reject oversized ranges before any rows are loaded
+        try:
+            start_dt, end_dt = analytics_engine.check_range(start_dt, end_dt, granularity, tz)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if end_dt - start_dt > timedelta(days=ANALYTICS_MAX_RANGE_DAYS):
+            raise HTTPException(status_code=400, detail=f"Range too large (max {ANALYTICS_MAX_RANGE_DAYS} days)")
+        
+        # Fetch only the columns the engine needs, keyset-paged on (created_at, id):
+        # /track/batch stamps a whole batch with one created_at, so the id
+        # tiebreak keeps rows from being skipped or repeated between pages
+        events = []
+        cursor = None
+        while True:
+            query = (
+                db.table('analytics_events')
+                .select('id, event_type, created_at')
+                .eq('space_id', space_id)
+                .gte('created_at', start_dt.astimezone(timezone.utc).isoformat())
+                .lt('created_at', end_dt.astimezone(timezone.utc).isoformat())
+            )
+            response = await db.execute(apply_keyset(query, cursor, ANALYTICS_PAGE_SIZE))
+            page, cursor = split_page(response.data or [], ANALYTICS_PAGE_SIZE)
+            events.extend(page)
+            if cursor is None:
+                break
+        
+        try:
+            result = analytics_engine.aggregate(events, start_dt, end_dt, granularity, tz, window)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        return {"status": "success", **result}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching analytics timeseries for {space_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch analytics")
+
+
 @api_router.put("/spaces/{space_id}/cta")
 async def update_cta_selector(space_id: str, data: CTASelectorUpdate):
     """Update the CTA selector for conversion tracking"""
     try:
-        response = supabase.table('spaces') \
-            .update({'cta_selector': data.cta_selector}) \
-            .eq('id', space_id) \
-            .execute()
+        response = await db.execute(
+            db.table('spaces')
+            .update({'cta_selector': data.cta_selector})
+            .eq('id', space_id)
+        )
         
         if response.data:
+            invalidate_public_payloads(space_id)
             return {"status": "success", "message": "CTA selector updated"}
         
         raise HTTPException(status_code=404, detail="Space not found")
@@ -418,14 +875,15 @@ async def update_cta_selector(space_id: str, data: CTASelectorUpdate):
 async def get_cta_selector(space_id: str):
     """Get the CTA selector for a space"""
     try:
-        response = supabase.table('spaces') \
-            .select('cta_selector') \
-            .eq('id', space_id) \
-            .single() \
-            .execute()
+        response = await db.execute(
+            db.table('spaces')
+            .select('cta_selector')
+            .eq('id', space_id)
+            .single()
+        )
         
         if response.data:
-            return {"status": "success", "cta_selector": response.data.get('cta_selector')}
+            return FastJSONResponse({"status": "success", "cta_selector": response.data.get('cta_selector')})
         
         raise HTTPException(status_code=404, detail="Space not found")
     
@@ -436,42 +894,67 @@ async def get_cta_selector(space_id: str):
         raise HTTPException(status_code=500, detail="Failed to fetch CTA selector")
 
 
-@api_router.post("/track")
+def _queue_event(event: Dict[str, Any]):
+    """Timestamp an event and hand it to the bulk-insert queue (503 when the queue is full)"""
+    event['created_at'] = datetime.now(timezone.utc).isoformat()
+    if not event_ingestor.submit(event):
+        raise HTTPException(
+            status_code=503,
+            detail="Tracking is busy. Please retry shortly.",
+            headers={"Retry-After": "1"}
+        )
+
+
+def _validate_event(body: Any) -> Dict[str, Any]:
+    """Check a JSON tracking event against the impression/conversion rules; raises ValueError"""
+    if not isinstance(body, dict):
+        raise ValueError("Event must be an object")
+    
+    space_id = body.get('space_id')
+    event_type = body.get('event_type')
+    metadata = body.get('metadata', {})
+    
+    if not space_id or not event_type:
+        raise ValueError("Missing space_id or event_type")
+    
+    if event_type not in ['impression', 'conversion']:
+        raise ValueError("Invalid event_type. Must be 'impression' or 'conversion'")
+    
+    return {
+        'space_id': space_id,
+        'event_type': event_type,
+        'metadata': metadata
+    }
+
+
+@api_router.post("/track", status_code=202)
 async def track_event(request: Request):
     """
     Track impression/conversion events from embed script.
     Handles both JSON and sendBeacon requests.
     Uses credentials: 'omit' friendly CORS.
+    Events are queued and bulk-inserted in the background; returns 202
+    immediately, or 503 if the ingestion queue is full.
     """
     try:
         # Parse body (works for both fetch and sendBeacon with Blob)
-        body = await request.json()
-        
-        space_id = body.get('space_id')
-        event_type = body.get('event_type')
-        metadata = body.get('metadata', {})
+        try:
+            body = await read_json(request, TRACK_MAX_BYTES)
+        except BodyTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except InvalidJSON:
+            raise HTTPException(status_code=400, detail="Body must be JSON")
         
         # Validate
-        if not space_id or not event_type:
-            raise HTTPException(status_code=400, detail="Missing space_id or event_type")
-        
-        if event_type not in ['impression', 'conversion']:
-            raise HTTPException(status_code=400, detail="Invalid event_type. Must be 'impression' or 'conversion'")
-        
-        # Insert event
-        event_data = {
-            'space_id': space_id,
-            'event_type': event_type,
-            'metadata': metadata,
-            'created_at': datetime.now(timezone.utc).isoformat()
-        }
+        try:
+            event = _validate_event(body)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        response = supabase.table('analytics_events').insert(event_data).execute()
+        # Queue event for the next bulk insert
+        _queue_event(event)
         
-        if response.data:
-            return {"status": "success", "message": f"{event_type} tracked"}
-        
-        raise HTTPException(status_code=500, detail="Failed to insert event")
+        return {"status": "success", "message": f"{event['event_type']} queued"}
     
     except HTTPException:
         raise
@@ -480,32 +963,175 @@ async def track_event(request: Request):
         raise HTTPException(status_code=500, detail="Tracking failed")
 
 
+@api_router.post("/track/batch", status_code=202)
+async def track_events_batch(request: Request):
+    """
+    Track several events in one request: a JSON array of /track bodies, or
+    {"events": [...]}. At most TRACK_BATCH_MAX_EVENTS events and
+    TRACK_BATCH_MAX_BYTES of body.
+    Each event is validated on its own and reported in "results" by index;
+    the valid ones are queued together (all or nothing, 503 if the queue
+    can't take them) and land in the same bulk insert.
+    """
+    try:
+        body = await read_json(request, TRACK_BATCH_MAX_BYTES)
+    except BodyTooLarge:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {TRACK_BATCH_MAX_BYTES} bytes")
+    except InvalidJSON:
+        raise HTTPException(status_code=400, detail="Body must be JSON")
+    
+    events = body.get('events') if isinstance(body, dict) else body
+    if not isinstance(events, list) or not events:
+        raise HTTPException(status_code=400, detail="Expected a non-empty array of events")
+    if len(events) > TRACK_BATCH_MAX_EVENTS:
+        raise HTTPException(status_code=400, detail=f"At most {TRACK_BATCH_MAX_EVENTS} events per batch")
+    
+    now = datetime.now(timezone.utc).isoformat()
+    results = []
+    valid = []
+    for index, item in enumerate(events):
+        try:
+            event = _validate_event(item)
+        except ValueError as e:
+            results.append({"index": index, "status": "rejected", "error": str(e)})
+            continue
+        event['created_at'] = now
+        valid.append(event)
+        results.append({"index": index, "status": "queued"})
+    
+    if valid and not event_ingestor.submit_many(valid):
+        raise HTTPException(
+            status_code=503,
+            detail="Tracking is busy. Please retry shortly.",
+            headers={"Retry-After": "1"}
+        )
+    
+    return {
+        "status": "success" if len(valid) == len(events) else "partial",
+        "queued": len(valid),
+        "rejected": len(events) - len(valid),
+        "results": results
+    }
+
+
+@api_router.post("/track/compact", status_code=202)
+async def track_event_compact(request: Request):
+    """
+    Track an event sent in the compact beacon format (see beacon.py), e.g.
+    sendBeacon(url, 's=<space_id>&e=i&u=<url>') as a text/plain body.
+    Fixed fields and size limits; queued like /track.
+    """
+    try:
+        event = parse_beacon(await read_body(request, BEACON_MAX_BYTES))
+    except BodyTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except BeaconError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    _queue_event(event)
+    return Response(status_code=202)
+
+
+@api_router.get("/track/pixel")
+async def track_event_pixel(request: Request):
+    """
+    Track an event from a GET pixel: /api/track/pixel?s=<space_id>&e=c&...
+    (same fields and limits as /track/compact). Returns a 1x1 GIF.
+    """
+    try:
+        event = parse_beacon(request.scope['query_string'])
+    except BeaconTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except BeaconError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    _queue_event(event)
+    return Response(content=PIXEL_GIF, media_type="image/gif", headers={"Cache-Control": "no-store"})
+
+
+@api_router.get("/admin/ingest-stats")
+async def get_ingest_stats(admin_key: str = None):
+    """Admin endpoint: /track ingestion queue depth, batch sizes and flush latency"""
+    ADMIN_KEY = os.environ.get('ADMIN_API_KEY', 'trustflow-admin-secret')
+    
+    if admin_key != ADMIN_KEY:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    
+    return {"status": "success", "ingest": event_ingestor.stats()}
+
+
+@api_router.get("/admin/http-pool-stats")
+async def get_http_pool_stats(admin_key: str = None):
+    """Admin endpoint: outbound HTTP pool limits, connection reuse (hit rate) and latency"""
+    ADMIN_KEY = os.environ.get('ADMIN_API_KEY', 'trustflow-admin-secret')
+    
+    if admin_key != ADMIN_KEY:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    
+    return {"status": "success", "http": outbound_http.stats()}
+
+
+@api_router.get("/admin/domain-routing-stats")
+async def get_domain_routing_stats(admin_key: str = None):
+    """Admin endpoint: custom-domain routing table size, hit/negative-hit counts and age"""
+    ADMIN_KEY = os.environ.get('ADMIN_API_KEY', 'trustflow-admin-secret')
+    
+    if admin_key != ADMIN_KEY:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    
+    return {"status": "success", "routing": domain_routes.stats()}
+
+
+# Component state sampled at scrape time
+REGISTRY.register(Gauge(
+    'track_queue_depth', 'Events buffered for bulk insert',
+    function=lambda: [((), event_ingestor.stats()["queue_depth"])]))
+REGISTRY.register(Gauge(
+    'cache_entries', 'Entries held by in-process caches', ('cache',),
+    function=lambda: [(('public_data',), public_cache.stats()["size"]),
+                      (('slug',), slug_cache.stats()["entries"]),
+                      (('domain_routes',), domain_routes.stats()["active_domains"])]))
+
+
+@api_router.get("/metrics")
+async def get_metrics(admin_key: str = None):
+    """Admin endpoint: Prometheus text exposition of request, query and outbound-call metrics"""
+    ADMIN_KEY = os.environ.get('ADMIN_API_KEY', 'trustflow-admin-secret')
+    
+    if admin_key != ADMIN_KEY:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    
+    return Response(content=REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@api_router.get("/admin/cache-stats")
+async def get_cache_stats(admin_key: str = None):
+    """Admin endpoint: hit/miss counts for the public payload, slug and entitlement caches, request coalescing"""
+    ADMIN_KEY = os.environ.get('ADMIN_API_KEY', 'trustflow-admin-secret')
+    
+    if admin_key != ADMIN_KEY:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    
+    return {
+        "status": "success",
+        "public_data": public_cache.stats(),
+        "slug": slug_cache.stats(),
+        "coalescing": public_flights.stats(),
+        "plans": plan_catalog.stats(),
+        "entitlements": entitlement_cache.stats()
+    }
+
+
 # --- CUSTOM DOMAIN ROUTES (Pro Feature) ---
 @api_router.get("/custom-domains/resolve")
 async def resolve_custom_domain(domain: str):
     """Resolve a custom domain to its space - used by frontend for custom domain routing"""
     try:
-        # Lookup domain in custom_domains table
-        response = supabase.table('custom_domains') \
-            .select('*, spaces(id, slug, space_name, logo_url, header_title, custom_message, collect_star_rating)') \
-            .eq('domain', domain.lower().strip()) \
-            .eq('status', 'active') \
-            .execute()
+        # Served from the in-process routing table (see domain_routes)
+        route = await domain_routes.resolve(domain)
         
-        if response.data and len(response.data) > 0:
-            domain_data = response.data[0]
-            space_data = domain_data.get('spaces')
-            
-            if space_data:
-                return {
-                    "status": "success",
-                    "space": space_data,
-                    "domain": {
-                        "id": domain_data['id'],
-                        "domain": domain_data['domain'],
-                        "status": domain_data['status']
-                    }
-                }
+        if route:
+            return {"status": "success", "space": route["space"], "domain": route["domain"]}
         
         # Domain not found or not verified
         return {"status": "error", "message": "Domain not configured or not verified", "space": None}
@@ -518,10 +1144,11 @@ async def resolve_custom_domain(domain: str):
 async def get_custom_domain(space_id: str):
     """Get custom domain for a specific space"""
     try:
-        response = supabase.table('custom_domains') \
-            .select('*') \
-            .eq('space_id', space_id) \
-            .execute()
+        response = await db.execute(
+            db.table('custom_domains')
+            .select('*')
+            .eq('space_id', space_id)
+        )
         
         if response.data and len(response.data) > 0:
             return {"status": "success", "domain": response.data[0]}
@@ -540,19 +1167,21 @@ async def add_custom_domain(data: CustomDomainCreate):
     """Add a custom domain to a space"""
     try:
         # Check if space already has a custom domain
-        existing = supabase.table('custom_domains') \
-            .select('id') \
-            .eq('space_id', data.space_id) \
-            .execute()
+        existing = await db.execute(
+            db.table('custom_domains')
+            .select('id')
+            .eq('space_id', data.space_id)
+        )
         
         if existing.data and len(existing.data) > 0:
             raise HTTPException(status_code=400, detail="Space already has a custom domain. Remove it first.")
         
         # Check if domain is already in use
-        domain_check = supabase.table('custom_domains') \
-            .select('id') \
-            .eq('domain', data.domain.lower().strip()) \
-            .execute()
+        domain_check = await db.execute(
+            db.table('custom_domains')
+            .select('id')
+            .eq('domain', data.domain.lower().strip())
+        )
         
         if domain_check.data and len(domain_check.data) > 0:
             raise HTTPException(status_code=400, detail="This domain is already registered.")
@@ -564,9 +1193,10 @@ async def add_custom_domain(data: CustomDomainCreate):
             'status': 'pending'
         }
         
-        response = supabase.table('custom_domains') \
-            .insert(new_domain) \
-            .execute()
+        response = await db.execute(
+            db.table('custom_domains')
+            .insert(new_domain)
+        )
         
         if response.data:
             return {"status": "success", "domain": response.data[0], "message": "Domain added. Please configure DNS."}
@@ -580,164 +1210,60 @@ async def add_custom_domain(data: CustomDomainCreate):
         raise HTTPException(status_code=500, detail="Failed to add custom domain")
 
 
-@api_router.post("/custom-domains/verify/{domain_id}")
+def _domain_verification_state(domain: dict) -> dict:
+    """Last known verification state for a custom_domains row"""
+    last = domain_scheduler.last_checks.get(domain['id'])
+    verified = domain['status'] in ('dns_verified', 'active')
+    if verified:
+        message = "DNS verified! Awaiting activation by admin. This usually takes 24-48 hours." \
+            if domain['status'] == 'dns_verified' else "Domain is active."
+    elif last:
+        message = last['message']
+    else:
+        message = "DNS check queued. This page will update once it completes."
+    return {
+        "status": "success",
+        "verified": verified,
+        "dns_status": domain['status'],
+        "message": message,
+        "cname_found": last['cname_found'] if last else None,
+        "expected_cname": "cname.vercel-dns.com",
+        "queued": domain_scheduler.is_queued(domain['id']),
+        "last_checked_at": last['checked_at'] if last else None,
+        "next_check_in": domain_scheduler.next_check_in(domain['id']),
+    }
+
+
+async def _get_domain_or_404(domain_id: str) -> dict:
+    domain_res = await db.execute(
+        db.table('custom_domains')
+        .select('id, domain, status')
+        .eq('id', domain_id)
+        .maybe_single()
+    )
+    if not domain_res or not domain_res.data:
+        raise HTTPException(status_code=404, detail="Domain not found")
+    return domain_res.data
+
+
+@api_router.post("/custom-domains/verify/{domain_id}", status_code=202)
 async def verify_custom_domain(domain_id: str):
-    """Verify DNS configuration for a custom domain"""
-    import dns.resolver
-    
-    # Vercel's CNAME target (universal for all Vercel-hosted domains)
-    VERCEL_CNAME_TARGETS = ['cname.vercel-dns.com', 'cname-china.vercel-dns.com']
-    
+    """
+    Queue a DNS verification for a custom domain and return its last known state.
+    The check runs in the background scheduler; poll GET on the same path.
+    """
     try:
-        # Get domain info (simplified query)
-        domain_res = supabase.table('custom_domains') \
-            .select('*') \
-            .eq('id', domain_id) \
-            .single() \
-            .execute()
-        
-        if not domain_res.data:
-            raise HTTPException(status_code=404, detail="Domain not found")
+        domain = await _get_domain_or_404(domain_id)
         
-        domain_info = domain_res.data
-        domain_name = domain_info['domain']
-        
-        # Proper DNS CNAME Lookup
-        try:
-            # Query CNAME record
-            answers = dns.resolver.resolve(domain_name, 'CNAME')
-            
-            cname_found = None
-            for rdata in answers:
-                cname_found = str(rdata.target).rstrip('.')
-                break
-            
-            if cname_found:
-                # Check if CNAME points to Vercel
-                if cname_found.lower() in [t.lower() for t in VERCEL_CNAME_TARGETS]:
-                    # CNAME is correct - mark as dns_verified (awaiting admin activation)
-                    supabase.table('custom_domains') \
-                        .update({
-                            'status': 'dns_verified',
-                            'dns_verified_at': datetime.now(timezone.utc).isoformat()
-                        }) \
-                        .eq('id', domain_id) \
-                        .execute()
-                    
-                    # Log for admin notification
-                    logger.info(f"🔔 ADMIN ACTION REQUIRED: Domain '{domain_name}' DNS verified. Add to Vercel dashboard.")
-                    
-                    return {
-                        "status": "success",
-                        "verified": True,
-                        "dns_status": "dns_verified",
-                        "message": "DNS verified! Awaiting activation by admin. This usually takes 24-48 hours.",
-                        "cname_found": cname_found
-                    }
-                else:
-                    # CNAME exists but points to wrong target
-                    supabase.table('custom_domains') \
-                        .update({'status': 'failed'}) \
-                        .eq('id', domain_id) \
-                        .execute()
-                    
-                    return {
-                        "status": "success",
-                        "verified": False,
-                        "message": f"CNAME points to wrong target. Found: {cname_found}. Expected: cname.vercel-dns.com",
-                        "expected_cname": "cname.vercel-dns.com",
-                        "cname_found": cname_found
-                    }
+        if domain['status'] in ('pending', 'failed'):
+            if domain_scheduler.enabled:
+                domain_scheduler.request_verify(domain_id)
             else:
-                # No CNAME found
-                supabase.table('custom_domains') \
-                    .update({'status': 'failed'}) \
-                    .eq('id', domain_id) \
-                    .execute()
-                
-                return {
-                    "status": "success",
-                    "verified": False,
-                    "message": "No CNAME record found.",
-                    "expected_cname": "cname.vercel-dns.com"
-                }
-                
-        except dns.resolver.NXDOMAIN:
-            # Domain does not exist
-            supabase.table('custom_domains') \
-                .update({'status': 'failed'}) \
-                .eq('id', domain_id) \
-                .execute()
-            
-            return {
-                "status": "success",
-                "verified": False,
-                "message": "Domain does not exist. Please check the domain name.",
-                "expected_cname": "cname.vercel-dns.com"
-            }
-            
-        except dns.resolver.NoAnswer:
-            # No CNAME record configured
-            supabase.table('custom_domains') \
-                .update({'status': 'failed'}) \
-                .eq('id', domain_id) \
-                .execute()
-            
-            return {
-                "status": "success",
-                "verified": False,
-                "message": "No CNAME record found. Please add the CNAME record in your DNS settings.",
-                "expected_cname": "cname.vercel-dns.com"
-            }
-            
-        except dns.resolver.Timeout:
-            return {
-                "status": "error",
-                "verified": False,
-                "message": "DNS lookup timed out. Please try again.",
-                "expected_cname": "cname.vercel-dns.com"
-            }
+                # No background loop: verify inline
+                await domain_scheduler.verify([domain])
+                domain = await _get_domain_or_404(domain_id)
         
-        except dns.resolver.NoNameservers:
-            # No nameservers available
-            supabase.table('custom_domains') \
-                .update({'status': 'failed'}) \
-                .eq('id', domain_id) \
-                .execute()
-            
-            return {
-                "status": "success",
-                "verified": False,
-                "message": "Could not reach DNS servers. Please try again later.",
-                "expected_cname": "cname.vercel-dns.com"
-            }
-        
-        except Exception as dns_error:
-            # Catch any other DNS errors - give specific guidance
-            error_str = str(dns_error).lower()
-            logger.error(f"DNS lookup error for {domain_name}: {dns_error}")
-            
-            supabase.table('custom_domains') \
-                .update({'status': 'failed'}) \
-                .eq('id', domain_id) \
-                .execute()
-            
-            # Provide helpful message based on error type
-            if 'nxdomain' in error_str or 'does not exist' in error_str:
-                message = f"Domain '{domain_name}' does not exist or has no DNS records."
-            elif 'no answer' in error_str or 'no cname' in error_str:
-                message = "No CNAME record found. Please add the CNAME record pointing to cname.vercel-dns.com"
-            elif 'timeout' in error_str:
-                message = "DNS lookup timed out. Please wait a few minutes and try again."
-            else:
-                message = f"DNS lookup failed: {str(dns_error)[:100]}. Make sure your domain has a CNAME record pointing to cname.vercel-dns.com"
-            
-            return {
-                "status": "success",
-                "verified": False,
-                "message": message,
-                "expected_cname": "cname.vercel-dns.com"
-            }
+        return _domain_verification_state(domain)
     
     except HTTPException:
         raise
@@ -746,14 +1272,29 @@ async def verify_custom_domain(domain_id: str):
         raise HTTPException(status_code=500, detail="Verification failed")
 
 
+@api_router.get("/custom-domains/verify/{domain_id}")
+async def get_custom_domain_verification(domain_id: str):
+    """Last known DNS verification state for a custom domain"""
+    try:
+        return _domain_verification_state(await _get_domain_or_404(domain_id))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching domain verification: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch verification state")
+
+
 @api_router.delete("/custom-domains/{domain_id}")
 async def delete_custom_domain(domain_id: str):
     """Remove a custom domain"""
     try:
-        response = supabase.table('custom_domains') \
-            .delete() \
-            .eq('id', domain_id) \
-            .execute()
+        response = await db.execute(
+            db.table('custom_domains')
+            .delete()
+            .eq('id', domain_id)
+        )
+        if any(d.get('status') == 'active' for d in response.data or []):
+            await domain_routes.invalidate()
         
         return {"status": "success", "message": "Domain removed successfully"}
     
@@ -773,11 +1314,12 @@ async def activate_custom_domain(domain_id: str, admin_key: str = None):
     
     try:
         # Get domain info
-        domain_res = supabase.table('custom_domains') \
-            .select('*') \
-            .eq('id', domain_id) \
-            .single() \
-            .execute()
+        domain_res = await db.execute(
+            db.table('custom_domains')
+            .select('*')
+            .eq('id', domain_id)
+            .single()
+        )
         
         if not domain_res.data:
             raise HTTPException(status_code=404, detail="Domain not found")
@@ -787,13 +1329,16 @@ async def activate_custom_domain(domain_id: str, admin_key: str = None):
             raise HTTPException(status_code=400, detail="Domain DNS must be verified first")
         
         # Mark as active
-        supabase.table('custom_domains') \
+        await db.execute(
+            db.table('custom_domains')
             .update({
                 'status': 'active',
                 'activated_at': datetime.now(timezone.utc).isoformat()
-            }) \
-            .eq('id', domain_id) \
-            .execute()
+            })
+            .eq('id', domain_id)
+        )
+        
+        await domain_routes.invalidate()
         
         logger.info(f"✅ Domain '{domain_res.data['domain']}' activated by admin")
         
@@ -806,68 +1351,26 @@ async def activate_custom_domain(domain_id: str, admin_key: str = None):
         raise HTTPException(status_code=500, detail="Failed to activate domain")
 
 
-@api_router.post("/custom-domains/health-check")
+@api_router.post("/custom-domains/health-check", status_code=202)
 async def health_check_domains(admin_key: str = None):
-    """Admin endpoint: Check all active domains and mark disconnected if DNS fails"""
-    import dns.resolver
-    
+    """
+    Admin endpoint: Queue a sweep of all active domains (disconnecting those
+    whose DNS fails) and return the last completed sweep. Sweeps also run
+    on a schedule; see domain_scheduler.
+    """
     ADMIN_KEY = os.environ.get('ADMIN_API_KEY', 'trustflow-admin-secret')
-    VERCEL_CNAME_TARGETS = ['cname.vercel-dns.com', 'cname-china.vercel-dns.com']
     
     if admin_key != ADMIN_KEY:
         raise HTTPException(status_code=403, detail="Unauthorized")
     
     try:
-        # Get all active domains
-        response = supabase.table('custom_domains') \
-            .select('*') \
-            .eq('status', 'active') \
-            .execute()
-        
-        results = []
-        disconnected_count = 0
-        
-        for domain in response.data or []:
-            domain_name = domain['domain']
-            domain_id = domain['id']
-            is_healthy = False
-            
-            try:
-                answers = dns.resolver.resolve(domain_name, 'CNAME')
-                for rdata in answers:
-                    cname = str(rdata.target).rstrip('.')
-                    if cname.lower() in [t.lower() for t in VERCEL_CNAME_TARGETS]:
-                        is_healthy = True
-                        break
-            except Exception:
-                is_healthy = False
-            
-            if not is_healthy:
-                # Mark as disconnected
-                supabase.table('custom_domains') \
-                    .update({
-                        'status': 'disconnected',
-                        'disconnected_at': datetime.now(timezone.utc).isoformat()
-                    }) \
-                    .eq('id', domain_id) \
-                    .execute()
-                disconnected_count += 1
-                logger.warning(f"⚠️ Domain '{domain_name}' marked as DISCONNECTED")
-            
-            results.append({
-                "domain": domain_name,
-                "healthy": is_healthy
-            })
+        if domain_scheduler.enabled:
+            domain_scheduler.request_sweep()
+            return {"status": "success", "queued": True, "last_sweep": domain_scheduler.last_sweep}
         
-        return {
-            "status": "success",
-            "checked": len(results),
-            "disconnected": disconnected_count,
-            "results": results
-        }
+        # No background loop: sweep inline
+        return {"status": "success", "queued": False, "last_sweep": await domain_scheduler.sweep_active()}
     
-    except HTTPException:
-        raise
     except Exception as e:
         logger.error(f"Error in health check: {e}")
         raise HTTPException(status_code=500, detail="Health check failed")
@@ -882,11 +1385,12 @@ async def get_pending_domains(admin_key: str = None):
         raise HTTPException(status_code=403, detail="Unauthorized")
     
     try:
-        response = supabase.table('custom_domains') \
-            .select('*, spaces(space_name, slug)') \
-            .eq('status', 'dns_verified') \
-            .order('dns_verified_at', desc=True) \
-            .execute()
+        response = await db.execute(
+            db.table('custom_domains')
+            .select('*, spaces(space_name, slug)')
+            .eq('status', 'dns_verified')
+            .order('dns_verified_at', desc=True)
+        )
         
         return {
             "status": "success",
@@ -899,6 +1403,59 @@ async def get_pending_domains(admin_key: str = None):
         raise HTTPException(status_code=500, detail="Failed to fetch pending domains")
 
 
+@api_router.get("/admin/profiles")
+async def get_request_profiles(admin_key: str = None, route: str = None, limit: int = 50):
+    """Admin endpoint: most recent request profiles (newest first), optionally for one route template"""
+    ADMIN_KEY = os.environ.get('ADMIN_API_KEY', 'trustflow-admin-secret')
+    
+    if admin_key != ADMIN_KEY:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    
+    return {
+        "status": "success",
+        "profiler": request_profiler.stats(),
+        "profiles": request_profiler.list(route=route, limit=max(1, limit))
+    }
+
+
+@api_router.get("/admin/profiles/{profile_id}")
+async def get_request_profile(profile_id: int, admin_key: str = None):
+    """Admin endpoint: one profile with its stack samples and query timeline"""
+    ADMIN_KEY = os.environ.get('ADMIN_API_KEY', 'trustflow-admin-secret')
+    
+    if admin_key != ADMIN_KEY:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    
+    profile = request_profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found (it may have left the buffer)")
+    
+    return {"status": "success", "profile": profile}
+
+
+class ProfilingSettings(BaseModel):
+    enabled: Optional[bool] = None
+    sample_rate: Optional[float] = None
+    routes: Optional[List[str]] = None
+    clear: bool = False
+
+
+@api_router.post("/admin/profiling")
+async def configure_profiling(settings: ProfilingSettings, admin_key: str = None):
+    """Admin endpoint: turn sampling on/off, change the rate or route filter, clear the buffer"""
+    ADMIN_KEY = os.environ.get('ADMIN_API_KEY', 'trustflow-admin-secret')
+    
+    if admin_key != ADMIN_KEY:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    
+    request_profiler.configure(enabled=settings.enabled, sample_rate=settings.sample_rate, routes=settings.routes)
+    if settings.clear:
+        request_profiler.clear()
+    logger.info(f"Request profiling updated: {request_profiler.stats()}")
+    
+    return {"status": "success", "profiler": request_profiler.stats()}
+
+
 # --- WEBHOOK TEST ENDPOINT ---
 
 class WebhookTestRequest(BaseModel):
@@ -1033,8 +1590,6 @@ async def test_webhook(request: WebhookTestRequest):
     Test a webhook URL by sending a test payload.
     This acts as a proxy to avoid CORS issues when testing from the frontend.
     """
-    import httpx
-    
     # Security: Validate the webhook URL
     url = request.webhook_url.strip()
     
@@ -1094,41 +1649,41 @@ async def test_webhook(request: WebhookTestRequest):
         
         start_time = datetime.now(timezone.utc)
         
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.post(
-                url,
-                json=smart_payload,
-                headers={
-                    "Content-Type": "application/json",
-                    "User-Agent": "TrustFlow-Webhook-Test/1.0",
-                    "X-TrustFlow-Event": "testimonial.test",
-                    "X-TrustFlow-Delivery": str(uuid.uuid4()),
-                    "X-TrustFlow-Platform": platform,
-                }
-            )
-            
-            end_time = datetime.now(timezone.utc)
-            latency_ms = int((end_time - start_time).total_seconds() * 1000)
-            
-            # 2xx status codes are considered success
-            is_success = 200 <= response.status_code < 300
-            
-            # Try to get response body for debugging
-            try:
-                response_body = response.text[:500] if response.text else None
-            except:
-                response_body = None
-            
-            return {
-                "success": is_success,
-                "status_code": response.status_code,
-                "latency_ms": latency_ms,
-                "platform": platform,
-                "timestamp": end_time.isoformat(),
-                "request_payload": smart_payload,
-                "response_body": response_body,
-                "error": None if is_success else f"Received status {response.status_code}"
-            }
+        response = await outbound_http.post(
+            url,
+            json=smart_payload,
+            headers={
+                "Content-Type": "application/json",
+                "User-Agent": "TrustFlow-Webhook-Test/1.0",
+                "X-TrustFlow-Event": "testimonial.test",
+                "X-TrustFlow-Delivery": str(uuid.uuid4()),
+                "X-TrustFlow-Platform": platform,
+            },
+            timeout=5.0
+        )
+        
+        end_time = datetime.now(timezone.utc)
+        latency_ms = int((end_time - start_time).total_seconds() * 1000)
+        
+        # 2xx status codes are considered success
+        is_success = 200 <= response.status_code < 300
+        
+        # Try to get response body for debugging
+        try:
+            response_body = response.text[:500] if response.text else None
+        except:
+            response_body = None
+        
+        return {
+            "success": is_success,
+            "status_code": response.status_code,
+            "latency_ms": latency_ms,
+            "platform": platform,
+            "timestamp": end_time.isoformat(),
+            "request_payload": smart_payload,
+            "response_body": response_body,
+            "error": None if is_success else f"Received status {response.status_code}"
+        }
             
     except httpx.TimeoutException:
         return {
@@ -1263,38 +1818,38 @@ async def create_lemon_squeezy_checkout(request: LemonSqueezyCheckoutRequest):
         logger.info(f"Store ID: {LEMON_SQUEEZY_STORE_ID}, API Key exists: {bool(LEMON_SQUEEZY_API_KEY)}")
         
         # Make API request to Lemon Squeezy
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                "https://api.lemonsqueezy.com/v1/checkouts",
-                json=checkout_payload,
-                headers={
-                    "Accept": "application/vnd.api+json",
-                    "Content-Type": "application/vnd.api+json",
-                    "Authorization": f"Bearer {LEMON_SQUEEZY_API_KEY}"
-                }
-            )
+        response = await outbound_http.post(
+            "https://api.lemonsqueezy.com/v1/checkouts",
+            json=checkout_payload,
+            headers={
+                "Accept": "application/vnd.api+json",
+                "Content-Type": "application/vnd.api+json",
+                "Authorization": f"Bearer {LEMON_SQUEEZY_API_KEY}"
+            },
+            timeout=30.0
+        )
+        
+        if response.status_code == 201:
+            checkout_data = response.json()
+            checkout_url = checkout_data.get("data", {}).get("attributes", {}).get("url")
             
-            if response.status_code == 201:
-                checkout_data = response.json()
-                checkout_url = checkout_data.get("data", {}).get("attributes", {}).get("url")
-                
-                if checkout_url:
-                    logger.info(f"Checkout created successfully for user {request.user_id}, URL: {checkout_url}")
-                    return {"url": checkout_url, "status": "success"}
-                else:
-                    logger.error(f"No checkout URL in response: {checkout_data}")
-                    raise HTTPException(
-                        status_code=500, 
-                        detail="Payment service error. Please try again."
-                    )
+            if checkout_url:
+                logger.info(f"Checkout created successfully for user {request.user_id}, URL: {checkout_url}")
+                return {"url": checkout_url, "status": "success"}
             else:
-                error_body = response.text
-                logger.error(f"Lemon Squeezy API error: {response.status_code} - {error_body}")
-                logger.error(f"Request payload was: variant_id={request.variant_id}, store_id={LEMON_SQUEEZY_STORE_ID}")
+                logger.error(f"No checkout URL in response: {checkout_data}")
                 raise HTTPException(
                     status_code=500, 
-                    detail="Unable to create checkout session. Please try again later."
+                    detail="Payment service error. Please try again."
                 )
+        else:
+            error_body = response.text
+            logger.error(f"Lemon Squeezy API error: {response.status_code} - {error_body}")
+            logger.error(f"Request payload was: variant_id={request.variant_id}, store_id={LEMON_SQUEEZY_STORE_ID}")
+            raise HTTPException(
+                status_code=500, 
+                detail="Unable to create checkout session. Please try again later."
+            )
                 
     except HTTPException:
         raise
@@ -1361,10 +1916,11 @@ async def create_portal_session(
             )
         
         # Query subscriptions table to find lemon_squeezy_customer_id
-        subscription_response = supabase.table('subscriptions') \
-            .select('lemon_squeezy_customer_id') \
-            .eq('user_id', authenticated_user_id) \
-            .execute()
+        subscription_response = await db.execute(
+            db.table('subscriptions')
+            .select('lemon_squeezy_customer_id')
+            .eq('user_id', authenticated_user_id)
+        )
         
         if not subscription_response.data or len(subscription_response.data) == 0:
             logger.warning(f"No subscription found for user {authenticated_user_id}")
@@ -1385,42 +1941,42 @@ async def create_portal_session(
         logger.info(f"Fetching portal URL for customer {ls_customer_id} (user: {authenticated_user_id})")
         
         # Make API request to Lemon Squeezy to get customer data
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(
-                f"https://api.lemonsqueezy.com/v1/customers/{ls_customer_id}",
-                headers={
-                    "Accept": "application/vnd.api+json",
-                    "Content-Type": "application/vnd.api+json",
-                    "Authorization": f"Bearer {LEMON_SQUEEZY_API_KEY}"
-                }
-            )
+        response = await outbound_http.get(
+            f"https://api.lemonsqueezy.com/v1/customers/{ls_customer_id}",
+            headers={
+                "Accept": "application/vnd.api+json",
+                "Content-Type": "application/vnd.api+json",
+                "Authorization": f"Bearer {LEMON_SQUEEZY_API_KEY}"
+            },
+            timeout=30.0
+        )
+        
+        if response.status_code == 200:
+            customer_data = response.json()
+            portal_url = customer_data.get("data", {}).get("attributes", {}).get("urls", {}).get("customer_portal")
             
-            if response.status_code == 200:
-                customer_data = response.json()
-                portal_url = customer_data.get("data", {}).get("attributes", {}).get("urls", {}).get("customer_portal")
-                
-                if portal_url:
-                    logger.info(f"Portal URL retrieved successfully for user {authenticated_user_id}")
-                    return {"url": portal_url, "status": "success"}
-                else:
-                    logger.error(f"No portal URL in customer response: {customer_data}")
-                    raise HTTPException(
-                        status_code=500, 
-                        detail="Unable to retrieve billing portal. Please try again."
-                    )
-            elif response.status_code == 404:
-                logger.error(f"Customer {ls_customer_id} not found in Lemon Squeezy")
-                raise HTTPException(
-                    status_code=404, 
-                    detail="Customer record not found. Please contact support."
-                )
+            if portal_url:
+                logger.info(f"Portal URL retrieved successfully for user {authenticated_user_id}")
+                return {"url": portal_url, "status": "success"}
             else:
-                error_body = response.text
-                logger.error(f"Lemon Squeezy API error: {response.status_code} - {error_body}")
+                logger.error(f"No portal URL in customer response: {customer_data}")
                 raise HTTPException(
                     status_code=500, 
-                    detail="Unable to access billing portal. Please try again later."
+                    detail="Unable to retrieve billing portal. Please try again."
                 )
+        elif response.status_code == 404:
+            logger.error(f"Customer {ls_customer_id} not found in Lemon Squeezy")
+            raise HTTPException(
+                status_code=404, 
+                detail="Customer record not found. Please contact support."
+            )
+        else:
+            error_body = response.text
+            logger.error(f"Lemon Squeezy API error: {response.status_code} - {error_body}")
+            raise HTTPException(
+                status_code=500, 
+                detail="Unable to access billing portal. Please try again later."
+            )
                 
     except HTTPException:
         raise
@@ -1462,10 +2018,10 @@ def verify_lemon_squeezy_signature(payload: bytes, signature: str, secret: str)
         return False
 
 
-@api_router.post("/webhooks/lemonsqueezy")
-async def handle_lemon_squeezy_webhook(request: Request):
+async def apply_lemon_squeezy_event(payload: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Handle Lemon Squeezy webhook events for subscription lifecycle.
+    Apply one Lemon Squeezy webhook event to subscriptions (run by the
+    webhook worker, in order per subscription).
     
     Events handled:
     - subscription_created: New subscription activated
@@ -1476,188 +2032,226 @@ async def handle_lemon_squeezy_webhook(request: Request):
     - subscription_paused: Subscription paused
     - order_created: One-time order completed (if applicable)
     
-    Security:
-    - Validates X-Signature header using HMAC SHA256
-    - Returns 401 if signature is invalid
+    Raises on database errors so the worker retries the event.
     """
-    try:
-        # Get raw body for signature verification
-        raw_body = await request.body()
-        signature = request.headers.get("X-Signature", "")
+    # Extract event metadata
+    meta = payload.get("meta", {})
+    event_name = meta.get("event_name", "")
+    custom_data = meta.get("custom_data", {})
+    
+    # Extract subscription/order data
+    data = payload.get("data", {})
+    attributes = data.get("attributes", {})
+    
+    # Get user identification from custom data
+    user_id = custom_data.get("user_id")
+    plan_id = custom_data.get("plan_id")
+    billing_cycle = custom_data.get("billing_cycle", "monthly")
+    
+    # Extract Lemon Squeezy IDs
+    ls_customer_id = str(attributes.get("customer_id", ""))
+    ls_subscription_id = str(data.get("id", ""))
+    ls_order_id = str(attributes.get("order_id", "")) if attributes.get("order_id") else None
+    
+    # If user_id not in custom_data, try to find from existing subscription
+    if not user_id and ls_customer_id:
+        existing = await db.execute(
+            db.table('subscriptions')
+            .select('user_id')
+            .eq('lemon_squeezy_customer_id', ls_customer_id)
+        )
+        if existing.data and len(existing.data) > 0:
+            user_id = existing.data[0].get('user_id')
+    
+    logger.info(f"Lemon Squeezy webhook: {event_name} for user {user_id}, plan {plan_id}")
+    
+    # Process based on event type
+    if event_name in ["subscription_created", "subscription_updated", "subscription_resumed"]:
+        if not user_id:
+            logger.error(f"No user_id found in webhook for event {event_name}")
+            # Return 200 to acknowledge receipt but log error
+            return {"status": "warning", "message": "No user_id found, subscription not updated"}
+        
+        # Determine subscription status
+        ls_status = attributes.get("status", "active")
+        status_mapping = {
+            "active": "active",
+            "on_trial": "trialing",
+            "paused": "paused",
+            "past_due": "past_due",
+            "unpaid": "past_due",
+            "cancelled": "cancelled",
+            "expired": "expired"
+        }
+        subscription_status = status_mapping.get(ls_status, "active")
+        
+        # Get billing dates
+        renews_at = attributes.get("renews_at")
+        ends_at = attributes.get("ends_at")
+        created_at = attributes.get("created_at")
+        
+        # If plan_id not provided, try to get from variant
+        if not plan_id:
+            variant_id = str(attributes.get("variant_id", ""))
+            if variant_id:
+                # Lookup plan by variant ID (in-memory index)
+                plan_id = await plan_catalog.plan_for_variant(variant_id)
+        
+        # Default to starter if still no plan_id
+        if not plan_id:
+            plan_id = 'starter'
+            logger.warning(f"Could not determine plan_id, defaulting to 'starter'")
+        
+        # Check if subscription is scheduled to cancel/change at period end
+        cancel_at_period_end = attributes.get("cancelled", False) or attributes.get("ends_at") is not None
+        
+        # Prepare subscription data for upsert
+        subscription_data = {
+            "user_id": user_id,
+            "plan_id": plan_id,
+            "status": subscription_status,
+            "provider": "lemonsqueezy",
+            "lemon_squeezy_customer_id": ls_customer_id,
+            "lemon_squeezy_subscription_id": ls_subscription_id,
+            "lemon_squeezy_order_id": ls_order_id,
+            "current_period_end": renews_at or ends_at,
+            "cancel_at_period_end": cancel_at_period_end,
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        }
         
-        # Verify webhook signature
-        if LEMON_SQUEEZY_WEBHOOK_SECRET:
-            if not verify_lemon_squeezy_signature(raw_body, signature, LEMON_SQUEEZY_WEBHOOK_SECRET):
-                logger.warning("Invalid Lemon Squeezy webhook signature")
-                raise HTTPException(status_code=401, detail="Invalid signature")
+        # Upsert subscription (insert or update based on user_id)
+        result = await db.execute(
+            db.table('subscriptions')
+            .upsert(subscription_data, on_conflict='user_id')
+        )
+        entitlement_cache.invalidate(user_id=user_id)
         
-        # Parse webhook payload
-        try:
-            payload = await request.json()
-        except Exception:
-            logger.error("Invalid JSON in webhook payload")
-            raise HTTPException(status_code=400, detail="Invalid JSON payload")
-        
-        # Extract event metadata
-        meta = payload.get("meta", {})
-        event_name = meta.get("event_name", "")
-        custom_data = meta.get("custom_data", {})
-        
-        # Extract subscription/order data
-        data = payload.get("data", {})
-        attributes = data.get("attributes", {})
-        
-        # Get user identification from custom data
-        user_id = custom_data.get("user_id")
-        plan_id = custom_data.get("plan_id")
-        billing_cycle = custom_data.get("billing_cycle", "monthly")
-        
-        # Extract Lemon Squeezy IDs
-        ls_customer_id = str(attributes.get("customer_id", ""))
-        ls_subscription_id = str(data.get("id", ""))
-        ls_order_id = str(attributes.get("order_id", "")) if attributes.get("order_id") else None
-        
-        # If user_id not in custom_data, try to find from existing subscription
-        if not user_id and ls_customer_id:
-            existing = supabase.table('subscriptions') \
-                .select('user_id') \
-                .eq('lemon_squeezy_customer_id', ls_customer_id) \
-                .execute()
-            if existing.data and len(existing.data) > 0:
-                user_id = existing.data[0].get('user_id')
-        
-        logger.info(f"Lemon Squeezy webhook: {event_name} for user {user_id}, plan {plan_id}")
-        
-        # Process based on event type
-        if event_name in ["subscription_created", "subscription_updated", "subscription_resumed"]:
-            if not user_id:
-                logger.error(f"No user_id found in webhook for event {event_name}")
-                # Return 200 to acknowledge receipt but log error
-                return {"status": "warning", "message": "No user_id found, subscription not updated"}
-            
-            # Determine subscription status
-            ls_status = attributes.get("status", "active")
-            status_mapping = {
-                "active": "active",
-                "on_trial": "trialing",
-                "paused": "paused",
-                "past_due": "past_due",
-                "unpaid": "past_due",
-                "cancelled": "cancelled",
-                "expired": "expired"
-            }
-            subscription_status = status_mapping.get(ls_status, "active")
-            
-            # Get billing dates
-            renews_at = attributes.get("renews_at")
-            ends_at = attributes.get("ends_at")
-            created_at = attributes.get("created_at")
-            
-            # If plan_id not provided, try to get from variant
-            if not plan_id:
-                variant_id = str(attributes.get("variant_id", ""))
-                if variant_id:
-                    # Lookup plan by variant ID
-                    plan_lookup = supabase.table('plans') \
-                        .select('id') \
-                        .or_(f"lemon_squeezy_variant_id_monthly.eq.{variant_id},lemon_squeezy_variant_id_yearly.eq.{variant_id}") \
-                        .execute()
-                    if plan_lookup.data and len(plan_lookup.data) > 0:
-                        plan_id = plan_lookup.data[0].get('id')
-            
-            # Default to starter if still no plan_id
-            if not plan_id:
-                plan_id = 'starter'
-                logger.warning(f"Could not determine plan_id, defaulting to 'starter'")
-            
-            # Check if subscription is scheduled to cancel/change at period end
-            cancel_at_period_end = attributes.get("cancelled", False) or attributes.get("ends_at") is not None
-            
-            # Prepare subscription data for upsert
-            subscription_data = {
-                "user_id": user_id,
-                "plan_id": plan_id,
-                "status": subscription_status,
-                "provider": "lemonsqueezy",
-                "lemon_squeezy_customer_id": ls_customer_id,
-                "lemon_squeezy_subscription_id": ls_subscription_id,
-                "lemon_squeezy_order_id": ls_order_id,
-                "current_period_end": renews_at or ends_at,
-                "cancel_at_period_end": cancel_at_period_end,
-                "updated_at": datetime.now(timezone.utc).isoformat()
-            }
-            
-            # Upsert subscription (insert or update based on user_id)
-            result = supabase.table('subscriptions') \
-                .upsert(subscription_data, on_conflict='user_id') \
-                .execute()
-            
-            if result.data:
-                logger.info(f"Subscription upserted successfully for user {user_id}, plan: {plan_id}")
-                return {"status": "success", "message": f"Subscription {event_name} processed"}
-            else:
-                logger.error(f"Failed to upsert subscription for user {user_id}")
-                return {"status": "error", "message": "Database update failed"}
+        if not result.data:
+            # Raise so the webhook worker retries the event
+            raise RuntimeError(f"Failed to upsert subscription for user {user_id}")
         
-        elif event_name in ["subscription_cancelled", "subscription_expired"]:
-            if not user_id and not ls_customer_id:
-                logger.error("No user identification for cancellation event")
-                return {"status": "warning", "message": "No user identification found"}
-            
-            # Update subscription status
-            query = supabase.table('subscriptions')
-            
-            if user_id:
-                query = query.eq('user_id', user_id)
-            else:
-                query = query.eq('lemon_squeezy_customer_id', ls_customer_id)
-            
-            # Get the ends_at date if available
-            ends_at = attributes.get("ends_at")
-            
-            update_data = {
-                "status": "cancelled" if event_name == "subscription_cancelled" else "expired",
-                "cancel_at_period_end": True,
-                "updated_at": datetime.now(timezone.utc).isoformat()
-            }
-            
-            if ends_at:
-                update_data["current_period_end"] = ends_at
-            
-            result = query.update(update_data).execute()
-            
-            logger.info(f"Subscription {event_name} processed for user {user_id or ls_customer_id}")
-            return {"status": "success", "message": f"Subscription {event_name} processed"}
-        
-        elif event_name == "subscription_paused":
-            if user_id:
-                supabase.table('subscriptions') \
-                    .update({
-                        "status": "paused",
-                        "updated_at": datetime.now(timezone.utc).isoformat()
-                    }) \
-                    .eq('user_id', user_id) \
-                    .execute()
-                logger.info(f"Subscription paused for user {user_id}")
-            return {"status": "success", "message": "Subscription paused"}
-        
-        elif event_name == "order_created":
-            # Log order creation (useful for one-time purchases if you add them later)
-            logger.info(f"Order created: {ls_order_id} for user {user_id}")
-            return {"status": "success", "message": "Order acknowledged"}
+        logger.info(f"Subscription upserted successfully for user {user_id}, plan: {plan_id}")
+        return {"status": "success", "message": f"Subscription {event_name} processed"}
+    
+    elif event_name in ["subscription_cancelled", "subscription_expired"]:
+        if not user_id and not ls_customer_id:
+            logger.error("No user identification for cancellation event")
+            return {"status": "warning", "message": "No user identification found"}
+        
+        # Get the ends_at date if available
+        ends_at = attributes.get("ends_at")
+        
+        update_data = {
+            "status": "cancelled" if event_name == "subscription_cancelled" else "expired",
+            "cancel_at_period_end": True,
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        }
+        
+        if ends_at:
+            update_data["current_period_end"] = ends_at
         
+        # Update subscription status (filters go on the update builder;
+        # db.table() itself has no .eq())
+        query = db.table('subscriptions').update(update_data)
+        
+        if user_id:
+            query = query.eq('user_id', user_id)
         else:
-            # Acknowledge unknown events without error
-            logger.info(f"Unhandled Lemon Squeezy event: {event_name}")
-            return {"status": "success", "message": f"Event {event_name} acknowledged"}
+            query = query.eq('lemon_squeezy_customer_id', ls_customer_id)
+        
+        result = await db.execute(query)
+        entitlement_cache.invalidate(user_id=user_id, customer_id=ls_customer_id or None)
+        
+        logger.info(f"Subscription {event_name} processed for user {user_id or ls_customer_id}")
+        return {"status": "success", "message": f"Subscription {event_name} processed"}
     
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error processing Lemon Squeezy webhook: {str(e)}")
-        # Return 200 to prevent Lemon Squeezy from retrying
-        # but log the error for investigation
-        return {"status": "error", "message": "Webhook processing error logged"}
+    elif event_name == "subscription_paused":
+        if user_id:
+            await db.execute(
+                db.table('subscriptions')
+                .update({
+                    "status": "paused",
+                    "updated_at": datetime.now(timezone.utc).isoformat()
+                })
+                .eq('user_id', user_id)
+            )
+            entitlement_cache.invalidate(user_id=user_id)
+            logger.info(f"Subscription paused for user {user_id}")
+        return {"status": "success", "message": "Subscription paused"}
+    
+    elif event_name == "order_created":
+        # Log order creation (useful for one-time purchases if you add them later)
+        logger.info(f"Order created: {ls_order_id} for user {user_id}")
+        return {"status": "success", "message": "Order acknowledged"}
+    
+    else:
+        # Acknowledge unknown events without error
+        logger.info(f"Unhandled Lemon Squeezy event: {event_name}")
+        return {"status": "success", "message": f"Event {event_name} acknowledged"}
+
+
+
+# Stores verified webhook events and applies them in the background (deduplicated, ordered per subscription)
+webhook_processor = WebhookEventProcessor(db, apply_lemon_squeezy_event)
+
+
+@api_router.post("/webhooks/lemonsqueezy")
+async def handle_lemon_squeezy_webhook(request: Request):
+    """
+    Receive Lemon Squeezy webhook events for the subscription lifecycle.
+    
+    Verifies the signature, stores the raw event under its idempotency key
+    and returns 200 right away; apply_lemon_squeezy_event runs in the
+    background. Redeliveries of an already-stored event are acknowledged
+    as duplicates without being applied again.
+    
+    Security:
+    - Validates X-Signature header using HMAC SHA256
+    - Returns 401 if signature is invalid
+    """
+    # Read the raw body once: the signature is checked over these bytes
+    try:
+        raw_body = await read_body(request, WEBHOOK_MAX_BYTES)
+    except BodyTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    signature = request.headers.get("X-Signature", "")
+    
+    # Verify webhook signature
+    if LEMON_SQUEEZY_WEBHOOK_SECRET:
+        if not verify_lemon_squeezy_signature(raw_body, signature, LEMON_SQUEEZY_WEBHOOK_SECRET):
+            logger.warning("Invalid Lemon Squeezy webhook signature")
+            raise HTTPException(status_code=401, detail="Invalid signature")
+    
+    # Parse webhook payload (from the bytes already read)
+    try:
+        payload = loads_json(raw_body)
+    except InvalidJSON:
+        logger.error("Invalid JSON in webhook payload")
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+    
+    outcome = await webhook_processor.receive(payload)
+    event_name = payload.get("meta", {}).get("event_name", "")
+    if outcome == 'failed':
+        # Not stored: make Lemon Squeezy redeliver rather than ack and risk losing it
+        raise HTTPException(status_code=500, detail="Webhook processing failed")
+    if outcome == 'duplicate':
+        logger.info(f"Duplicate Lemon Squeezy webhook ignored: {event_name}")
+        return {"status": "success", "message": f"Event {event_name} already received"}
+    
+    return {"status": "success", "message": f"Event {event_name} accepted"}
+
+
+@api_router.get("/admin/webhook-stats")
+async def get_webhook_stats(admin_key: str = None):
+    """Admin endpoint: Lemon Squeezy webhook receive/apply counters and queue depth"""
+    ADMIN_KEY = os.environ.get('ADMIN_API_KEY', 'trustflow-admin-secret')
+    
+    if admin_key != ADMIN_KEY:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    
+    return {"status": "success", "webhooks": webhook_processor.stats()}
 
 
 @api_router.get("/subscription/status/{user_id}")
@@ -1665,23 +2259,22 @@ async def get_subscription_status(user_id: str):
     """
     Get current subscription status for a user.
     Useful for frontend to verify subscription after payment.
+    Served from the entitlement cache (dropped by the Lemon Squeezy webhook).
     """
     try:
-        response = supabase.table('subscriptions') \
-            .select('*, plans(*)') \
-            .eq('user_id', user_id) \
-            .single() \
-            .execute()
+        subscription, entitlements = await entitlement_cache.lookup(user_id)
         
-        if response.data:
+        if subscription:
             return {
                 "status": "success",
-                "subscription": response.data
+                "subscription": {**subscription, "plans": await plan_catalog.get(subscription.get('plan_id'))},
+                "entitlements": entitlements
             }
         
         return {
             "status": "success",
             "subscription": None,
+            "entitlements": entitlements,
             "message": "No active subscription found"
         }
     
@@ -1690,9 +2283,33 @@ async def get_subscription_status(user_id: str):
         raise HTTPException(status_code=500, detail="Failed to fetch subscription status")
 
 
+@api_router.post("/admin/plans/refresh")
+async def refresh_plans(admin_key: str = None):
+    """Admin endpoint: reload the plan catalog now (after editing plans) and drop cached entitlements"""
+    ADMIN_KEY = os.environ.get('ADMIN_API_KEY', 'trustflow-admin-secret')
+    
+    if admin_key != ADMIN_KEY:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    
+    try:
+        await plan_catalog.refresh()
+    except Exception as e:
+        logger.error(f"Error refreshing plan catalog: {e}")
+        raise HTTPException(status_code=500, detail="Failed to refresh plans")
+    entitlement_cache.clear()
+    
+    return {"status": "success", "plans": plan_catalog.stats()}
+
+
 # Include the router
 app.include_router(api_router)
 
+# Opt-in request profiling (inside metrics, so profiled requests are still counted)
+app.add_middleware(ProfilingMiddleware, profiler=request_profiler)
+
+# Per-route latency / status / in-flight metrics (served at /api/metrics)
+app.add_middleware(MetricsMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
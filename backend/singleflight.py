@@ -0,0 +1,70 @@
+"""
+Request coalescing ("single-flight") for hot reads.
+
+On a cold cache, a burst of identical widget loads would each run the
+same backend queries. SingleFlight.do(key, fn) runs fn once per key at a
+time: the first caller starts it, concurrent callers with the same key
+await that same call and get its result (or its exception).
+
+- the shared call runs as its own task, shielded from callers, so a
+  client disconnecting (cancelling its request) doesn't cancel the work
+  other callers are waiting on
+- results and errors are not kept: once the call finishes the key is
+  released, so the next caller starts fresh (caching is the caller's job)
+- forget() detaches in-flight calls, e.g. after a write, so later readers
+  don't join a read that started before it
+"""
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+SINGLEFLIGHT_ENABLED = os.environ.get('SINGLEFLIGHT_ENABLED', 'true').lower() == 'true'
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    def __init__(self, enabled: bool = SINGLEFLIGHT_ENABLED):
+        self.enabled = enabled
+        self._calls: Dict[Tuple[Hashable, ...], asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+
+    def _release(self, key: Tuple[Hashable, ...], task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception retrieved even if every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: Tuple[Hashable, ...], fn: Callable[[], Awaitable[T]]) -> T:
+        if not self.enabled:
+            return await fn()
+
+        task = self._calls.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._release(key, t))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def forget(self, prefix: Tuple[Hashable, ...]):
+        """Detach in-flight calls whose key starts with prefix (callers already waiting still get them)"""
+        for key in [k for k in self._calls if k[:len(prefix)] == prefix]:
+            del self._calls[key]
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.calls + self.shared
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._calls),
+            "calls": self.calls,
+            "shared": self.shared,
+            "coalesced_ratio": round(self.shared / total, 4) if total else 0,
+        }
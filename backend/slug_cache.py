@@ -0,0 +1,82 @@
+"""
+LRU + TTL cache for /public/space/{slug} lookups.
+
+Every visit to a submission form looked its space up by slug. SlugCache
+keeps found spaces (SLUG_CACHE_SIZE entries, least recently used evicted
+first, each living SLUG_CACHE_TTL seconds) and, separately, slugs that
+don't exist. Negative entries have their own, smaller bound and shorter
+TTL so a scanner walking random slugs can't grow memory or push real
+spaces out of the positive cache.
+
+Branding edits and slug changes are written by the dashboard straight to
+Supabase, so it calls invalidate_space() (via the invalidation endpoint)
+afterwards; the TTL bounds staleness for anything that doesn't.
+"""
+import os
+from typing import Any, Dict, Optional
+
+from cachetools import TTLCache
+
+SLUG_CACHE_SIZE = int(os.environ.get('SLUG_CACHE_SIZE', '10000'))
+SLUG_CACHE_TTL = int(os.environ.get('SLUG_CACHE_TTL', '300'))  # seconds
+SLUG_NEGATIVE_SIZE = int(os.environ.get('SLUG_NEGATIVE_SIZE', '5000'))
+SLUG_NEGATIVE_TTL = int(os.environ.get('SLUG_NEGATIVE_TTL', '60'))  # seconds
+
+# get() result for a slug known not to exist (distinct from None = not cached)
+MISSING = object()
+
+
+class SlugCache:
+    def __init__(self, maxsize: int = SLUG_CACHE_SIZE, ttl: int = SLUG_CACHE_TTL,
+                 negative_size: int = SLUG_NEGATIVE_SIZE, negative_ttl: int = SLUG_NEGATIVE_TTL):
+        # TTLCache evicts the least recently used entry when full
+        self._spaces = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._missing = TTLCache(maxsize=negative_size, ttl=negative_ttl)
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def get(self, slug: str) -> Any:
+        """The cached space dict, MISSING for a known-unknown slug, or None"""
+        space = self._spaces.get(slug)
+        if space is not None:
+            self.hits += 1
+            return space
+        if slug in self._missing:
+            self.negative_hits += 1
+            return MISSING
+        self.misses += 1
+        return None
+
+    def put(self, slug: str, space: Dict[str, Any]):
+        self._missing.pop(slug, None)
+        self._spaces[slug] = space
+
+    def put_missing(self, slug: str):
+        self._missing[slug] = True
+
+    def invalidate_space(self, space_id: str, slug: Optional[str] = None):
+        """Drop the cached entry for a space (found by id) and any negative entry for slug"""
+        for cached_slug, space in list(self._spaces.items()):
+            if space.get('id') == space_id:
+                self._spaces.pop(cached_slug, None)
+        if slug:
+            self._spaces.pop(slug, None)
+            self._missing.pop(slug, None)
+
+    def clear(self):
+        self._spaces.clear()
+        self._missing.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "entries": len(self._spaces),
+            "capacity": self._spaces.maxsize,
+            "negative_entries": len(self._missing),
+            "negative_capacity": self._missing.maxsize,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0,
+        }
@@ -0,0 +1,32 @@
+import os
+import sys
+
+# Tests import backend modules the way server.py does (flat, from backend/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('DATA_BACKEND', 'local')
+os.environ.setdefault('DOMAIN_SCHEDULER_ENABLED', 'false')
+
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def _server_client():
+    # One lifespan per session: shutdown stops the DB worker pool for good
+    from fastapi.testclient import TestClient
+
+    import server
+
+    with TestClient(server.app) as client:
+        yield client
+
+
+@pytest.fixture
+def app_client(_server_client):
+    """TestClient over server.app with empty local tables and caches"""
+    import server
+
+    server.supabase.tables.clear()
+    server.public_cache.clear()
+    yield _server_client
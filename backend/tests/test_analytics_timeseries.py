@@ -0,0 +1,33 @@
+import server
+
+URL = '/api/analytics/s1/timeseries'
+
+
+def seed_batch(count, created_at, event_type='impression'):
+    # One /track/batch flush: every row shares the same created_at
+    rows = server.supabase.tables['analytics_events']
+    for i in range(count):
+        rows.append({'id': f'{created_at}-{i:04d}', 'space_id': 's1', 'event_type': event_type,
+                     'created_at': created_at})
+
+
+def test_rows_sharing_a_timestamp_are_counted_once_across_pages(app_client, monkeypatch):
+    monkeypatch.setattr(server, 'ANALYTICS_PAGE_SIZE', 7)
+    seed_batch(50, '2026-03-01T10:00:00+00:00')
+    seed_batch(23, '2026-03-02T09:30:00+00:00', event_type='conversion')
+    body = app_client.get(URL, params={'start': '2026-03-01T00:00:00', 'end': '2026-03-03T00:00:00'}).json()
+    assert body['status'] == 'success'
+    assert body['summary']['impressions'] == 50
+    assert body['summary']['conversions'] == 23
+
+
+def test_oversized_ranges_are_rejected_before_fetching(app_client, monkeypatch):
+    fetched = []
+    monkeypatch.setattr(server.db, 'execute', lambda query: fetched.append(query))
+    too_many_buckets = app_client.get(URL, params={'granularity': 'hour', 'start': '2025-01-01T00:00:00',
+                                                   'end': '2025-12-31T00:00:00'})
+    too_long = app_client.get(URL, params={'granularity': 'week', 'start': '2020-01-01T00:00:00',
+                                           'end': '2026-01-01T00:00:00'})
+    backwards = app_client.get(URL, params={'start': '2026-02-01T00:00:00', 'end': '2026-01-01T00:00:00'})
+    assert [r.status_code for r in (too_many_buckets, too_long, backwards)] == [400, 400, 400]
+    assert fetched == []
@@ -0,0 +1,70 @@
+import pytest
+from fastapi import HTTPException
+
+import server
+from tests.test_public_data import seed_space
+
+
+@pytest.fixture
+def signed_in(monkeypatch):
+    """Authorization: Bearer <user id> is accepted as that user"""
+    async def verify(authorization):
+        if not authorization:
+            raise HTTPException(status_code=401, detail="Authorization header missing. Please log in.")
+        return {'sub': authorization.split()[-1]}
+
+    monkeypatch.setattr(server, 'verify_supabase_token', verify)
+
+
+def cached_payloads(space_id):
+    return [key for key in server.public_cache._entries.keys() if key[0] == space_id]
+
+
+def test_public_data_invalidate_requires_owner(app_client, signed_in):
+    seed_space(3)
+    app_client.get('/api/spaces/s1/public-data')
+    assert cached_payloads('s1')
+
+    url = '/api/spaces/s1/public-data/invalidate'
+    assert app_client.post(url).status_code == 401
+    assert app_client.post(url, headers={'Authorization': 'Bearer someone-else'}).status_code == 403
+    assert app_client.post('/api/spaces/nope/public-data/invalidate',
+                           headers={'Authorization': 'Bearer owner-1'}).status_code == 404
+    assert cached_payloads('s1')
+
+    assert app_client.post(url, headers={'Authorization': 'Bearer owner-1'}).status_code == 200
+    assert not cached_payloads('s1')
+
+
+def test_space_invalidate_requires_owner_and_uses_current_slug(app_client, signed_in):
+    seed_space(1)
+    server.slug_cache.put_missing('s1')  # 404 cached before the space took this slug
+
+    url = '/api/spaces/s1/invalidate'
+    assert app_client.post(url).status_code == 401
+    assert app_client.post(url, headers={'Authorization': 'Bearer someone-else'}).status_code == 403
+    assert app_client.get('/api/public/space/s1').status_code == 404
+
+    assert app_client.post(url, headers={'Authorization': 'Bearer owner-1'}).status_code == 200
+    assert app_client.get('/api/public/space/s1').status_code == 200
+
+
+def test_load_racing_an_invalidation_is_not_cached(app_client, signed_in, monkeypatch):
+    seed_space(2)
+    original = server._load_space_public_data
+
+    async def load_then_write(space_id, limit=None, cursor=None):
+        payload = await original(space_id, limit, cursor)
+        # The dashboard approves a testimonial after our read but before we cache it
+        server.invalidate_public_payloads(space_id)
+        return payload
+
+    monkeypatch.setattr(server, '_load_space_public_data', load_then_write)
+    stale_puts = server.public_cache.stale_puts
+    assert app_client.get('/api/spaces/s1/public-data').status_code == 200
+    assert not cached_payloads('s1')
+    assert server.public_cache.stale_puts == stale_puts + 1
+
+    monkeypatch.setattr(server, '_load_space_public_data', original)
+    assert app_client.get('/api/spaces/s1/public-data').status_code == 200
+    assert cached_payloads('s1')
@@ -0,0 +1,88 @@
+import asyncio
+from types import SimpleNamespace
+
+import dns.exception
+import dns.resolver
+
+from domain_health import DomainHealthChecker
+
+VERCEL = 'cname.vercel-dns.com.'
+
+
+class FakeResolver:
+    """Answers each domain from a script: one entry per attempt, the last one repeats.
+    An entry is an exception to raise, 'hang' to never answer, or a list of CNAME targets."""
+
+    def __init__(self, scripts):
+        self.scripts = scripts
+        self.calls = {}
+
+    async def resolve(self, name, rdtype, lifetime=None):
+        attempt = self.calls[name] = self.calls.get(name, 0) + 1
+        script = self.scripts[name]
+        step = script[min(attempt, len(script)) - 1]
+        if step == 'hang':
+            await asyncio.sleep(60)
+        if isinstance(step, Exception):
+            raise step
+        return [SimpleNamespace(target=target) for target in step]
+
+
+def check(scripts, **options):
+    options = {'timeout': 1.0, 'retries': 2, 'base_delay': 0, **options}
+    resolver = FakeResolver(scripts)
+    results = asyncio.run(DomainHealthChecker(resolver, **options).check_many(list(scripts)))
+    return {r.domain: r for r in results}, resolver
+
+
+def test_definitive_answers_are_not_retried():
+    results, resolver = check({
+        'ok.test': [[VERCEL]],
+        'wrong.test': [['elsewhere.example.net.']],
+        'gone.test': [dns.resolver.NXDOMAIN()],
+        'empty.test': [dns.resolver.NoAnswer()],
+        'blank.test': [[]],
+    })
+    assert results['ok.test'].healthy is True and results['ok.test'].cname == 'cname.vercel-dns.com'
+    assert (results['wrong.test'].healthy, results['wrong.test'].error) == (False, 'wrong_target')
+    assert (results['gone.test'].healthy, results['gone.test'].error) == (False, 'nxdomain')
+    assert (results['empty.test'].healthy, results['empty.test'].error) == (False, 'no_answer')
+    assert (results['blank.test'].healthy, results['blank.test'].error) == (False, 'no_answer')
+    assert set(resolver.calls.values()) == {1}
+
+
+def test_any_record_pointing_at_vercel_is_healthy():
+    results, _ = check({
+        'second.test': [['elsewhere.example.net.', VERCEL]],
+        'neither.test': [['a.example.net.', 'b.example.net.']],
+    })
+    assert results['second.test'].healthy is True and results['second.test'].cname == 'cname.vercel-dns.com'
+    assert results['neither.test'].error == 'wrong_target' and results['neither.test'].cname == 'a.example.net'
+
+
+def test_transient_failure_is_retried_until_an_answer():
+    results, resolver = check({
+        'flaky.test': [dns.exception.Timeout(), dns.resolver.NoNameservers(), [VERCEL]],
+    })
+    result = results['flaky.test']
+    assert result.healthy is True and result.attempts == 3
+    assert resolver.calls['flaky.test'] == 3
+
+
+def test_only_transient_failures_are_inconclusive():
+    results, resolver = check({
+        'dead.test': [dns.exception.Timeout()],
+        'broken.test': [dns.resolver.NoNameservers()],
+        'odd.test': [RuntimeError('resolver bug')],
+    }, retries=1)
+    assert {d: (r.healthy, r.inconclusive, r.error, r.attempts) for d, r in results.items()} == {
+        'dead.test': (None, True, 'timeout', 2),
+        'broken.test': (None, True, 'no_nameservers', 2),
+        'odd.test': (None, True, 'error', 2),
+    }
+    assert set(resolver.calls.values()) == {2}
+
+
+def test_resolver_that_overruns_its_lifetime_times_out():
+    results, _ = check({'hung.test': ['hang']}, timeout=0.01, retries=0)
+    assert results['hung.test'].inconclusive and results['hung.test'].error == 'timeout'
@@ -0,0 +1,123 @@
+import asyncio
+
+from db import Database
+from domain_routes import DomainRoutingTable
+from local_backend import LocalSupabase
+
+
+def routed_table():
+    supabase = LocalSupabase()
+    supabase.tables['spaces'] = [{'id': 's1', 'slug': 'one', 'space_name': 'One'},
+                                 {'id': 's2', 'slug': 'two', 'space_name': 'Two'}]
+    supabase.tables['custom_domains'] = [
+        {'id': 'd1', 'space_id': 's1', 'domain': 'one.example.com', 'status': 'active'},
+        {'id': 'd2', 'space_id': 's2', 'domain': 'two.example.com', 'status': 'active'},
+    ]
+    return supabase, DomainRoutingTable(Database(supabase, max_workers=2))
+
+
+def test_invalidate_space_rereads_only_that_space():
+    supabase, routes = routed_table()
+
+    async def run():
+        await routes.start()
+        supabase.tables['spaces'][0]['space_name'] = 'One renamed'
+        supabase.tables['spaces'][1]['space_name'] = 'Two renamed'
+        before = supabase.query_count
+        await routes.invalidate_space('s1')
+        return supabase.query_count - before
+
+    assert asyncio.run(run()) == 1
+    assert routes._routes['one.example.com']['space']['space_name'] == 'One renamed'
+    assert routes._routes['two.example.com']['space']['space_name'] == 'Two'
+    assert routes.refreshes == 1
+
+
+def test_concurrent_space_invalidations_are_coalesced():
+    supabase, routes = routed_table()
+    supabase.latency = 0.02
+
+    async def run():
+        await routes.start()
+        before = supabase.query_count
+        await asyncio.gather(*(routes.invalidate_space('s1') for _ in range(20)))
+        return supabase.query_count - before
+
+    # The first read plus at most one follow-up for calls made while it ran
+    assert asyncio.run(run()) <= 2
+
+
+def test_invalidate_unrouted_space_is_free():
+    supabase, routes = routed_table()
+
+    async def run():
+        await routes.start()
+        before = supabase.query_count
+        await routes.invalidate_space('not-routed')
+        return supabase.query_count - before
+
+    assert asyncio.run(run()) == 0
+
+
+
+class Outage:
+    """Database wrapper whose queries fail while `down` is set"""
+
+    def __init__(self, db):
+        self.db = db
+        self.down = False
+
+    def table(self, name):
+        return self.db.table(name)
+
+    async def execute(self, query):
+        if self.down:
+            raise ConnectionError("database unavailable")
+        return await self.db.execute(query)
+
+
+async def resolve_all(routes, hosts):
+    results = await asyncio.gather(*(routes.resolve(h) for h in hosts), return_exceptions=True)
+    return [r if isinstance(r, (dict, type(None))) else 'error' for r in results]
+
+
+def test_failed_startup_load_backs_off_instead_of_reloading_per_request():
+    supabase, _ = routed_table()
+    outage = Outage(Database(supabase, max_workers=2))
+    routes = DomainRoutingTable(outage, retry_min=0.2)
+
+    async def run():
+        outage.down = True
+        await routes.start()
+        await resolve_all(routes, ['one.example.com'] * 20)
+        failures_while_backing_off = routes.refresh_failures
+        outage.down = False
+        # Before retry_at the hostname is served by the per-host fallback
+        fallback = await routes.resolve('two.example.com')
+        await asyncio.sleep(0.25)
+        await routes.resolve('one.example.com')
+        return failures_while_backing_off, fallback
+
+    failures, fallback = asyncio.run(run())
+    assert failures == 1
+    assert fallback['space']['id'] == 's2'
+    assert routes.refreshes == 1 and routes._retry_at is None
+
+
+def test_failed_reload_keeps_serving_the_last_good_table():
+    supabase, _ = routed_table()
+    outage = Outage(Database(supabase, max_workers=2))
+    routes = DomainRoutingTable(outage, ttl=0, retry_min=10)
+
+    async def run():
+        await routes.start()
+        outage.down = True
+        first = await resolve_all(routes, ['one.example.com'])
+        await asyncio.sleep(0.05)
+        rest = await resolve_all(routes, ['one.example.com'] * 20)
+        await asyncio.sleep(0.05)
+        return first + rest
+
+    results = asyncio.run(run())
+    assert all(r['space']['id'] == 's1' for r in results)
+    assert routes.refresh_failures == 1
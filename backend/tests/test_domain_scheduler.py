@@ -0,0 +1,69 @@
+import asyncio
+
+import domain_scheduler
+from db import Database
+from domain_health import CnameResult
+from domain_scheduler import DomainScheduler
+from local_backend import LocalSupabase
+
+
+class ScriptedChecker:
+    """Returns a fixed health per domain; `during` runs while the checks are 'in flight'"""
+
+    def __init__(self, health, during=None):
+        self.health = health
+        self.during = during
+        self.checked = []
+
+    async def check_many(self, domains):
+        self.checked.extend(domains)
+        if self.during:
+            self.during()
+        return [CnameResult(d, None, self.health[d], None if self.health[d] else 'nxdomain', 1) for d in domains]
+
+
+def scheduler(rows, checker):
+    supabase = LocalSupabase(tables={'custom_domains': rows})
+    return supabase, DomainScheduler(Database(supabase, max_workers=2), checker, enabled=False)
+
+
+def statuses(supabase):
+    return {r['id']: r['status'] for r in supabase.tables['custom_domains']}
+
+
+def test_verification_does_not_overwrite_a_status_changed_during_the_check():
+    rows = [{'id': 'a', 'domain': 'a.test', 'status': 'pending'},
+            {'id': 'b', 'domain': 'b.test', 'status': 'failed'}]
+    holder = {}
+
+    def admin_activates_both():
+        for row in holder['supabase'].tables['custom_domains']:
+            row['status'] = 'active'
+
+    supabase, sched = scheduler(rows, ScriptedChecker({'a.test': True, 'b.test': False}, admin_activates_both))
+    holder['supabase'] = supabase
+    asyncio.run(sched.run_due_verifications())
+    assert statuses(supabase) == {'a': 'active', 'b': 'active'}
+
+
+def test_sweep_does_not_disconnect_a_domain_that_left_active_during_the_check():
+    rows = [{'id': 'a', 'domain': 'a.test', 'status': 'active'},
+            {'id': 'b', 'domain': 'b.test', 'status': 'active'}]
+    holder = {}
+
+    def admin_reverifies_a():
+        holder['supabase'].tables['custom_domains'][0]['status'] = 'dns_verified'
+
+    supabase, sched = scheduler(rows, ScriptedChecker({'a.test': False, 'b.test': False}, admin_reverifies_a))
+    holder['supabase'] = supabase
+    asyncio.run(sched.sweep_active())
+    assert statuses(supabase) == {'a': 'dns_verified', 'b': 'disconnected'}
+
+
+def test_sweep_checks_every_active_domain_across_pages(monkeypatch):
+    monkeypatch.setattr(domain_scheduler, 'DOMAIN_PAGE_SIZE', 4)
+    rows = [{'id': f'd{i:02d}', 'domain': f'd{i}.test', 'status': 'active'} for i in range(11)]
+    checker = ScriptedChecker({r['domain']: True for r in rows})
+    _, sched = scheduler(rows, checker)
+    sweep = asyncio.run(sched.sweep_active())
+    assert sweep['checked'] == 11 and sorted(checker.checked) == sorted(r['domain'] for r in rows)
@@ -0,0 +1,35 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.responses import JSONResponse
+
+from benchmarks.bench_json_response import EDGE_PAYLOADS, build_app, make_rows
+from fast_json import FastJSONResponse, dumps
+
+SIZES = (1, 20, 100)
+
+
+@pytest.mark.parametrize('payload', EDGE_PAYLOADS, ids=repr)
+def test_dumps_matches_json_response(payload):
+    assert dumps(payload) == JSONResponse(content=None).render(payload)
+
+
+def test_fast_response_matches_response_model_route():
+    app = build_app({size: make_rows(size) for size in SIZES})
+
+    async def bodies():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return [((await client.get(f'/before/{size}')).content, (await client.get(f'/after/{size}')).content)
+                    for size in SIZES]
+
+    for before, after in asyncio.run(bodies()):
+        assert before == after
+
+
+def test_fast_response_headers_match_json_response():
+    rows = make_rows(5)
+    fast, reference = FastJSONResponse(rows), JSONResponse(rows)
+    assert fast.body == reference.body
+    assert fast.headers == reference.headers
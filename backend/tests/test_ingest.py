@@ -0,0 +1,69 @@
+import asyncio
+
+from db import Database
+from ingest import EventIngestor
+from local_backend import LocalSupabase
+
+
+class AmbiguousWriteDB:
+    """Database whose first write commits and then raises, like a timeout after the insert"""
+
+    def __init__(self):
+        self.backend = LocalSupabase()
+        self.local = Database(self.backend, max_workers=1)
+        self.writes = 0
+
+    def table(self, name):
+        return self.local.table(name)
+
+    async def execute(self, query):
+        result = await self.local.execute(query)
+        self.writes += 1
+        if self.writes == 1:
+            raise TimeoutError("connection dropped after write")
+        return result
+
+
+def event(i):
+    return {'space_id': 's1', 'event_type': 'impression', 'created_at': f'2026-01-01T00:00:{i:02d}+00:00'}
+
+
+async def ingest(ingestor, batches):
+    await ingestor.start()
+    for batch in batches:
+        assert ingestor.submit_many(batch)
+        # Let the worker flush this batch before the next one is queued
+        while ingestor._queue.qsize() or ingestor.flushed_events + ingestor.failed_events < ingestor.accepted:
+            await asyncio.sleep(0.01)
+    await ingestor.stop()
+
+
+def test_retry_after_an_ambiguous_insert_does_not_duplicate_events(monkeypatch):
+    monkeypatch.setattr(asyncio, 'sleep', _no_backoff(asyncio.sleep))
+    db = AmbiguousWriteDB()
+    ingestor = EventIngestor(db, flush_interval=0.01)
+    asyncio.run(ingest(ingestor, [[event(i) for i in range(5)]]))
+    assert db.writes == 2
+    assert len(db.backend.tables['analytics_events']) == 5
+    assert ingestor.flushed_events == 5 and ingestor.failed_events == 0
+
+
+def test_failing_on_flush_does_not_stop_the_worker():
+    flushed = []
+
+    async def on_flush(batch):
+        flushed.append(len(batch))
+        raise RuntimeError("rollups unavailable")
+
+    backend = LocalSupabase()
+    ingestor = EventIngestor(Database(backend, max_workers=1), flush_interval=0.01, on_flush=on_flush)
+    asyncio.run(ingest(ingestor, [[event(0), event(1)], [event(2)]]))
+    assert flushed == [2, 1]
+    assert ingestor.on_flush_errors == 2
+    assert len(backend.tables['analytics_events']) == 3
+
+
+def _no_backoff(sleep):
+    async def fast_sleep(delay, *args, **kwargs):
+        return await sleep(min(delay, 0.01), *args, **kwargs)
+    return fast_sleep
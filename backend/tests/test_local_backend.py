@@ -0,0 +1,15 @@
+import pytest
+
+from local_backend import LocalSupabase
+
+
+def test_or_filter_with_nested_and():
+    supabase = LocalSupabase(tables={'rows': [{'id': 'a', 'n': 1}, {'id': 'b', 'n': 2}, {'id': 'c', 'n': 3}]})
+    res = supabase.table('rows').select('id').or_('n.gt.2,and(n.eq.1,id.eq."a")').execute()
+    assert sorted(r['id'] for r in res.data) == ['a', 'c']
+
+
+def test_unsupported_or_operator_is_a_value_error():
+    supabase = LocalSupabase(tables={'rows': [{'id': 'a', 'name': 'x'}]})
+    with pytest.raises(ValueError, match="'ilike'"):
+        supabase.table('rows').select('id').or_('name.ilike.*x*').execute()
@@ -0,0 +1,21 @@
+import server
+from profiler import Profiler
+
+
+def scope(token):
+    return {'type': 'http', 'headers': [(b'x-profile', token.encode())]}
+
+
+def test_header_profiling_is_off_without_its_own_token():
+    assert Profiler(enabled=False, header_token=None)._reason(scope('trustflow-admin-secret')) is None
+    assert Profiler(enabled=False, header_token='')._reason(scope('')) is None
+
+
+def test_header_token_forces_a_profile():
+    profiler = Profiler(enabled=False, header_token='s3cret-profile-token')
+    assert profiler._reason(scope('s3cret-profile-token')) == 'header'
+    assert profiler._reason(scope('trustflow-admin-secret')) is None
+
+
+def test_server_does_not_accept_the_admin_key_default():
+    assert server.request_profiler._reason(scope('trustflow-admin-secret')) is None
@@ -0,0 +1,59 @@
+import server
+
+
+def seed_space(count, space_id='s1'):
+    tables = server.supabase.tables
+    tables['spaces'].append({'id': space_id, 'slug': space_id, 'space_name': 'S', 'header_title': 'H',
+                             'collect_star_rating': True, 'cta_selector': '#buy', 'owner_id': 'owner-1'})
+    tables['widget_configurations'].append({'space_id': space_id, 'settings': {'popupsEnabled': True}})
+    for i in range(count):
+        tables['testimonials'].append({
+            'id': f't{i:04d}', 'space_id': space_id, 'is_liked': True, 'type': 'text',
+            'content': 'Great', 'rating': 5, 'respondent_name': f'User {i}',
+            'created_at': f'2026-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}+00:00',
+        })
+
+
+def test_widget_payload_is_unpaged_by_default(app_client, monkeypatch):
+    # Small internal pages so the default load has to follow the cursor
+    monkeypatch.setattr(server, 'TESTIMONIALS_EXPORT_PAGE_SIZE', 7)
+    seed_space(75)
+    body = app_client.get('/api/spaces/s1/public-data').json()
+    assert body['status'] == 'success'
+    assert body['next_cursor'] is None
+    assert len(body['testimonials']) == 75
+    assert len({t['id'] for t in body['testimonials']}) == 75
+
+
+def test_widget_payload_paging_is_opt_in(app_client):
+    seed_space(30)
+    first = app_client.get('/api/spaces/s1/public-data', params={'limit': 20}).json()
+    assert len(first['testimonials']) == 20 and first['next_cursor']
+    rest = app_client.get('/api/spaces/s1/public-data',
+                          params={'limit': 20, 'cursor': first['next_cursor']}).json()
+    assert len(rest['testimonials']) == 10 and rest['next_cursor'] is None
+
+
+def test_widget_testimonial_columns_have_no_duplicates():
+    columns = [c.strip() for c in server.WIDGET_TESTIMONIAL_COLUMNS.split(',')]
+    assert len(columns) == len(set(columns))
+    assert set(columns) == {c.strip() for c in server.PUBLIC_TESTIMONIAL_COLUMNS.split(',')} | {'is_liked'}
+
+
+def test_public_testimonials_return_every_row_by_default(app_client, monkeypatch):
+    monkeypatch.setattr(server, 'TESTIMONIALS_EXPORT_PAGE_SIZE', 7)
+    seed_space(75)
+    res = app_client.get('/api/public/testimonials', params={'space_id': 's1'})
+    assert res.status_code == 200
+    assert 'x-next-cursor' not in res.headers
+    rows = res.json()
+    assert len(rows) == 75 and len({t['id'] for t in rows}) == 75
+
+
+def test_public_testimonials_paging_is_opt_in(app_client):
+    seed_space(60)
+    first = app_client.get('/api/public/testimonials', params={'space_id': 's1', 'limit': 50})
+    assert len(first.json()) == 50 and first.headers['x-next-cursor']
+    rest = app_client.get('/api/public/testimonials',
+                          params={'space_id': 's1', 'cursor': first.headers['x-next-cursor']})
+    assert len(rest.json()) == 10 and 'x-next-cursor' not in rest.headers
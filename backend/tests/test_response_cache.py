@@ -0,0 +1,24 @@
+import gzip
+
+from response_cache import CachedPayload, ResponseCache, encode_json
+
+
+def body(rows):
+    return encode_json([{'id': i, 'content': 'Great product, would buy again'} for i in range(rows)])
+
+
+def test_bodies_past_the_ceiling_are_stored_uncompressed():
+    raw = body(200)
+    assert CachedPayload(raw, min_compress=1024, max_compress=len(raw) - 1).encodings == ()
+    compressed = CachedPayload(raw, min_compress=1024, max_compress=len(raw))
+    assert 'gzip' in compressed.encodings
+    assert gzip.decompress(compressed.variants['gzip'][0]) == raw
+
+
+def test_uncompressed_entry_is_served_as_identity():
+    cache = ResponseCache()
+    entry = CachedPayload(body(200), max_compress=0)
+    response = cache.respond(entry, None, 'gzip, br')
+    assert 'content-encoding' not in response.headers and 'vary' not in response.headers
+    assert response.body == entry.body
+
@@ -0,0 +1,44 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import rollups
+import server
+from rollups import AnalyticsRollups
+
+NOW = datetime(2026, 3, 10, 12, 30, tzinfo=timezone.utc)
+
+
+def seed_day_rollups(days):
+    rows = server.supabase.tables['analytics_rollups']
+    for i in range(days):
+        day = NOW.replace(hour=0, minute=0) - timedelta(days=i + 1)
+        rows.append({'space_id': 's1', 'granularity': 'day', 'bucket_start': day.isoformat(),
+                     'impressions': 2, 'conversions': 1})
+
+
+def seed_tail(count):
+    rows = server.supabase.tables['analytics_events']
+    for i in range(count):
+        rows.append({'id': f'e{i:04d}', 'space_id': 's1', 'event_type': 'impression' if i % 4 else 'conversion',
+                     'created_at': '2026-03-10T12:15:00+00:00'})
+
+
+def daily_totals(groups):
+    return (sum(g['impressions'] for g in groups.values()), sum(g['conversions'] for g in groups.values()))
+
+
+def test_rollup_reads_and_raw_tail_are_not_truncated(app_client, monkeypatch):
+    monkeypatch.setattr(rollups, 'ROLLUPS_PAGE_SIZE', 5)
+    seed_day_rollups(23)
+    seed_tail(12)
+    groups = asyncio.run(AnalyticsRollups(server.db).daily_counts('s1', None, NOW))
+    assert len(groups) == 24
+    assert daily_totals(groups) == (23 * 2 + 9, 23 + 3)
+
+
+def test_raw_tail_is_paged_without_the_count_rpc(app_client, monkeypatch):
+    monkeypatch.setattr(rollups, 'ROLLUPS_PAGE_SIZE', 5)
+    monkeypatch.delitem(server.supabase.functions, 'analytics_daily_counts')
+    seed_tail(12)
+    groups = asyncio.run(AnalyticsRollups(server.db).daily_counts('s1', NOW - timedelta(hours=1), NOW))
+    assert groups == {'2026-03-10': {'date': '2026-03-10', 'impressions': 9, 'conversions': 3}}
@@ -0,0 +1,115 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+import token_verifier
+from token_verifier import TokenVerifier
+
+SECRET = b'project-jwt-secret-for-tests-0123456789'
+RSA_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def claims(**overrides):
+    return {'sub': 'user-1', 'email': 'u@example.com', 'aud': 'authenticated',
+            'exp': int(time.time()) + 600, **overrides}
+
+
+def hs256(secret=SECRET, **overrides):
+    return jwt.encode(claims(**overrides), secret, algorithm='HS256')
+
+
+def rs256(kid, **overrides):
+    return jwt.encode(claims(**overrides), RSA_KEY, algorithm='RS256', headers={'kid': kid})
+
+
+class FakeJWKS:
+    """Knows the signing key for kid 'known' only"""
+
+    def get_signing_key_from_jwt(self, token):
+        if jwt.get_unverified_header(token).get('kid') != 'known':
+            raise jwt.PyJWKClientError("Unable to find a signing key that matches")
+        return SimpleNamespace(key=RSA_KEY.public_key())
+
+
+class Remote:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, token):
+        self.calls += 1
+        return {'sub': 'remote-user', 'email': None, 'user_metadata': {}}
+
+
+def verifier(secrets=(SECRET,), jwks=True):
+    v = TokenVerifier(list(secrets))
+    if jwks:
+        v._jwks_client = FakeJWKS()
+    return v
+
+
+def verify(v, token, remote):
+    return asyncio.run(v.verify(token, remote))
+
+
+def test_valid_token_is_verified_locally_and_cached():
+    v, remote = verifier(), Remote()
+    token = hs256()
+    assert verify(v, token, remote)['sub'] == 'user-1'
+    assert verify(v, token, remote)['sub'] == 'user-1'
+    assert (v.hits, v.misses, remote.calls) == (1, 1, 0)
+
+
+@pytest.mark.parametrize('token', [
+    pytest.param(lambda: hs256(secret=b'some-other-secret-0123456789abcdef'), id='bad-signature'),
+    pytest.param(lambda: hs256(exp=int(time.time()) - 10), id='expired'),
+    pytest.param(lambda: hs256(aud='anon-service'), id='wrong-audience'),
+    pytest.param(lambda: rs256('known', exp=int(time.time()) - 10), id='expired-rs256'),
+])
+def test_invalid_tokens_are_rejected_without_a_remote_call(token):
+    v, remote = verifier(), Remote()
+    with pytest.raises(jwt.InvalidTokenError):
+        verify(v, token(), remote)
+    assert remote.calls == 0 and v.stats()['size'] == 0
+
+
+def test_empty_and_duplicate_secrets_are_dropped():
+    v = verifier(secrets=[b'', SECRET, SECRET, b''])
+    assert v.secrets == [SECRET]
+    # A token signed with an empty key must not verify against a dropped empty secret
+    with pytest.raises(jwt.InvalidTokenError):
+        verify(v, hs256(secret=b''), Remote())
+
+
+def test_any_configured_secret_verifies():
+    v = verifier(secrets=[b'first-secret-0123456789abcdefghij', SECRET])
+    assert verify(v, hs256(), Remote())['sub'] == 'user-1'
+
+
+def test_cache_entries_do_not_outlive_exp(monkeypatch):
+    v, remote = verifier(), Remote()
+    now = time.time()
+    token = hs256(exp=int(now) + 30)
+    verify(v, token, remote)
+    assert v.stats()['size'] == 1
+    # The cache TTL (300 s) is longer than the token's remaining 30 s
+    monkeypatch.setattr(token_verifier.time, 'time', lambda: now + 60)
+    assert v._get_cached(v._cache_key(token)) is None
+    assert v.stats()['size'] == 0
+
+
+def test_remote_fallback_only_for_an_unknown_kid():
+    v, remote = verifier(), Remote()
+    assert verify(v, rs256('known'), remote)['sub'] == 'user-1'
+    assert remote.calls == 0
+    assert verify(v, rs256('rotated-away'), remote)['sub'] == 'remote-user'
+    assert remote.calls == 1
+
+
+def test_hs256_goes_remote_only_when_no_secret_is_configured():
+    v, remote = verifier(secrets=[]), Remote()
+    assert verify(v, hs256(), remote)['sub'] == 'remote-user'
+    assert remote.calls == 1
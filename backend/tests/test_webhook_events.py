@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+from postgrest.exceptions import APIError
+
+from db import Database
+from local_backend import LocalSupabase
+from webhook_events import WebhookEventProcessor, event_record
+
+
+def payload(event_name, resource_id, updated_at, resource_type='subscriptions'):
+    return {
+        'meta': {'event_name': event_name, 'custom_data': {'user_id': 'u1'}},
+        'data': {'type': resource_type, 'id': resource_id, 'attributes': {'updated_at': updated_at}},
+    }
+
+
+class FailingDB:
+    """Database whose every query raises the given error"""
+
+    def __init__(self, error):
+        self.error = error
+        self.local = Database(LocalSupabase(), max_workers=1)
+
+    def table(self, name):
+        return self.local.table(name)
+
+    async def execute(self, query):
+        raise self.error
+
+
+async def run_events(processor, *payloads):
+    await processor.start()
+    outcomes = [await processor.receive(p) for p in payloads]
+    # Let the per-resource drainers finish
+    while processor._drainers:
+        await asyncio.sleep(0.01)
+    return outcomes
+
+
+@pytest.fixture
+def applied():
+    return []
+
+
+@pytest.fixture
+def processor(applied):
+    async def apply(event):
+        applied.append((event['meta']['event_name'], event['data']['type'], event['data']['id']))
+        return {'message': 'ok'}
+
+    return WebhookEventProcessor(Database(LocalSupabase(), max_workers=2), apply)
+
+
+def test_key_includes_resource_type():
+    subscription = event_record(payload('subscription_updated', '7', '2026-01-01T00:00:00Z'))
+    order = event_record(payload('order_created', '7', '2026-01-01T00:00:00Z', 'orders'))
+    assert subscription['id'] != order['id']
+    assert subscription['id'] == 'subscription_updated:subscriptions:7:2026-01-01T00:00:00Z'
+
+
+def test_duplicate_delivery_is_applied_once(processor, applied):
+    event = payload('subscription_updated', '1', '2026-01-02T00:00:00Z')
+    outcomes = asyncio.run(run_events(processor, event, event))
+    assert outcomes == ['accepted', 'duplicate']
+    assert len(applied) == 1
+
+
+def test_older_subscription_event_is_skipped(processor, applied):
+    outcomes = asyncio.run(run_events(
+        processor,
+        payload('subscription_updated', '1', '2026-01-02T00:00:00Z'),
+        payload('subscription_updated', '1', '2026-01-01T00:00:00Z'),
+    ))
+    assert outcomes == ['accepted', 'accepted']
+    assert len(applied) == 1
+    assert processor.skipped == 1
+
+
+def test_order_with_same_id_does_not_affect_subscription_ordering(processor, applied):
+    asyncio.run(run_events(
+        processor,
+        payload('order_created', '1', '2026-01-05T00:00:00Z', 'orders'),
+        payload('subscription_updated', '1', '2026-01-02T00:00:00Z'),
+    ))
+    assert applied == [('order_created', 'orders', '1'), ('subscription_updated', 'subscriptions', '1')]
+    assert processor.skipped == 0
+
+
+def test_store_failure_is_reported_and_not_marked_seen(applied):
+    async def apply(event):
+        applied.append(event)
+
+    error = APIError({'message': 'timeout', 'code': '57014', 'details': None, 'hint': None})
+    processor = WebhookEventProcessor(FailingDB(error), apply)
+    event = payload('subscription_updated', '1', '2026-01-02T00:00:00Z')
+    outcomes = asyncio.run(run_events(processor, event, event))
+    assert outcomes == ['failed', 'failed']
+    assert applied == []
+    assert processor.stats()['store_errors'] == 2
+
+
+def test_missing_table_falls_back_to_in_memory_apply(applied):
+    async def apply(event):
+        applied.append(event)
+
+    error = APIError({'message': 'relation does not exist', 'code': '42P01', 'details': None, 'hint': None})
+    processor = WebhookEventProcessor(FailingDB(error), apply)
+    outcomes = asyncio.run(run_events(processor, payload('subscription_updated', '1', '2026-01-02T00:00:00Z')))
+    assert outcomes == ['accepted']
+    assert len(applied) == 1
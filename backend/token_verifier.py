@@ -0,0 +1,150 @@
+"""
+Local Supabase JWT verification with a verified-token cache.
+
+Supabase access tokens are JWTs signed either with the project's shared
+secret (HS256) or, on projects using asymmetric signing keys, with a key
+published at /auth/v1/.well-known/jwks.json. Both can be checked offline,
+so the remote auth.get_user() round trip is only needed when the token is
+signed with a key we don't know.
+
+Lookup order in TokenVerifier.verify():
+1. TTL cache of already-verified tokens (keyed by SHA-256 of the token)
+2. Local signature/expiry/audience check
+3. Remote callback (auth.get_user) - only on unknown key: an asymmetric
+   kid missing from the JWKS, or an HS256 token when no secret is
+   configured. An HS256 token that matches none of the configured secrets
+   is rejected locally, not sent to Supabase.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import jwt
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', '10000'))
+AUTH_TOKEN_CACHE_TTL = int(os.environ.get('AUTH_TOKEN_CACHE_TTL', '300'))  # seconds
+SUPABASE_JWT_AUDIENCE = os.environ.get('SUPABASE_JWT_AUDIENCE', 'authenticated')
+
+ASYMMETRIC_ALGORITHMS = ['RS256', 'ES256', 'EdDSA']
+
+
+def claims_to_user(claims: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce JWT claims to the user payload shape used by the routes"""
+    return {
+        "sub": claims.get("sub"),
+        "email": claims.get("email"),
+        "user_metadata": claims.get("user_metadata") or {}
+    }
+
+
+class TokenVerifier:
+    def __init__(self, secrets: List[bytes], jwks_url: Optional[str] = None,
+                 audience: str = SUPABASE_JWT_AUDIENCE,
+                 cache_size: int = AUTH_TOKEN_CACHE_SIZE,
+                 cache_ttl: int = AUTH_TOKEN_CACHE_TTL):
+        # De-duplicate while keeping order, drop empty secrets
+        self.secrets = list(dict.fromkeys(s for s in secrets if s))
+        self.audience = audience
+        self._jwks_client = jwt.PyJWKClient(jwks_url, cache_keys=True, lifespan=3600) if jwks_url else None
+        self._cache: TTLCache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self.hits = 0
+        self.misses = 0
+        self.remote_calls = 0
+
+    @staticmethod
+    def _cache_key(token: str) -> str:
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def _get_cached(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        user, expires_at = entry
+        # The cache TTL may outlive the token itself
+        if expires_at is not None and expires_at <= time.time():
+            self._cache.pop(key, None)
+            return None
+        return user
+
+    def _store(self, key: str, user: Dict[str, Any], claims: Dict[str, Any]):
+        self._cache[key] = (user, claims.get('exp'))
+
+    def _decode(self, token: str, key: Any, algorithms: List[str]) -> Dict[str, Any]:
+        return jwt.decode(
+            token,
+            key,
+            algorithms=algorithms,
+            audience=self.audience,
+            options={"require": ["exp", "sub"]}
+        )
+
+    async def _verify_local(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        Verify the token offline.
+        Returns the claims, or None if the signing key is unknown to us.
+        Raises jwt.InvalidTokenError if the token is definitively invalid
+        (malformed, bad signature, expired, wrong audience).
+        """
+        header = jwt.get_unverified_header(token)
+        algorithm = header.get('alg')
+
+        if algorithm == 'HS256':
+            if not self.secrets:
+                return None
+            for secret in self.secrets:
+                try:
+                    return self._decode(token, secret, ['HS256'])
+                except jwt.InvalidSignatureError:
+                    continue
+            raise jwt.InvalidSignatureError("Signature verification failed")
+
+        if algorithm in ASYMMETRIC_ALGORITHMS and self._jwks_client:
+            try:
+                # May fetch the JWKS document (blocking) on first use or unknown kid
+                signing_key = await asyncio.to_thread(self._jwks_client.get_signing_key_from_jwt, token)
+            except jwt.PyJWKClientError as e:
+                logger.info(f"JWKS lookup failed, falling back to remote verification: {e}")
+                return None
+            return self._decode(token, signing_key.key, [algorithm])
+
+        return None
+
+    async def verify(self, token: str,
+                     remote: Callable[[str], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Return the user payload for a valid token, raising on invalid tokens"""
+        key = self._cache_key(token)
+        user = self._get_cached(key)
+        if user is not None:
+            self.hits += 1
+            return user
+        self.misses += 1
+
+        claims = await self._verify_local(token)
+        if claims is not None:
+            user = claims_to_user(claims)
+            self._store(key, user, claims)
+            return user
+
+        # Unknown signing key - ask Supabase
+        self.remote_calls += 1
+        user = await remote(token)
+        unverified = jwt.decode(token, options={"verify_signature": False})
+        self._store(key, user, unverified)
+        return user
+
+    def invalidate(self, token: str):
+        self._cache.pop(self._cache_key(token), None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "remote_calls": self.remote_calls,
+            "size": len(self._cache)
+        }
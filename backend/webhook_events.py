@@ -0,0 +1,281 @@
+"""
+Idempotent, asynchronous processing of Lemon Squeezy webhooks.
+
+The webhook route used to do signature check, plan lookup and the
+subscription write inline, with no deduplication: a provider retry (or a
+slow response that timed out on their side) applied the same event again.
+
+Now the route only verifies the signature and calls receive(), which
+stores the raw event in lemon_squeezy_events under an idempotency key
+(event name + resource type + resource id + the resource's updated_at)
+and returns. If the row can't be stored the route answers 500 so Lemon
+Squeezy redelivers. Duplicates are detected cheaply:
+- a bounded in-memory set of recently seen keys answers most retries
+  without a query
+- otherwise the insert is ON CONFLICT DO NOTHING, and an empty result
+  means the key was already stored
+
+A background worker applies stored events in arrival order per resource
+(data.type + data.id: subscriptions, orders and invoices have separate id
+namespaces), with different resources running concurrently, up to
+WEBHOOK_WORKER_CONCURRENCY. A subscription event whose updated_at is
+older than the last one applied to that subscription arrived out of order
+and is marked 'skipped' instead of overwriting newer state. Failed applies are retried
+with backoff up to WEBHOOK_MAX_ATTEMPTS, then marked 'failed' for
+inspection. Events still 'pending' at startup (e.g. after a restart) are
+re-queued.
+
+If the events table doesn't exist (migration not run), events are still
+applied in the background, just without persistence or deduplication.
+Any other storage error fails the delivery.
+"""
+import asyncio
+import logging
+import os
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from cachetools import LRUCache
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_WORKER_CONCURRENCY = int(os.environ.get('WEBHOOK_WORKER_CONCURRENCY', '8'))
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get('WEBHOOK_MAX_ATTEMPTS', '5'))
+WEBHOOK_RETRY_BASE_DELAY = float(os.environ.get('WEBHOOK_RETRY_BASE_DELAY', '2.0'))  # seconds
+WEBHOOK_SEEN_SIZE = int(os.environ.get('WEBHOOK_SEEN_SIZE', '10000'))
+WEBHOOK_RECOVERY_LIMIT = int(os.environ.get('WEBHOOK_RECOVERY_LIMIT', '1000'))
+
+# Only these resources carry a monotonically increasing updated_at we can order by
+ORDERED_RESOURCE_TYPE = 'subscriptions'
+
+# PostgREST / Postgres codes for "relation does not exist"
+_MISSING_TABLE_CODES = {'PGRST205', '42P01'}
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _is_missing_table(error: Exception) -> bool:
+    return getattr(error, 'code', None) in _MISSING_TABLE_CODES
+
+
+def resource_key(record: Dict[str, Any]) -> str:
+    """Queue/ordering key: 'subscriptions:123' and 'orders:123' are different resources"""
+    return f"{record['resource_type']}:{record['resource_id']}"
+
+
+def event_record(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """lemon_squeezy_events row for a webhook payload (id = idempotency key)"""
+    event_name = payload.get("meta", {}).get("event_name", "")
+    data = payload.get("data", {})
+    resource_type = str(data.get("type", ""))
+    resource_id = str(data.get("id", ""))
+    updated_at = data.get("attributes", {}).get("updated_at")
+    return {
+        "id": f"{event_name}:{resource_type}:{resource_id}:{updated_at or ''}",
+        "event_name": event_name,
+        "resource_type": resource_type,
+        "resource_id": resource_id,
+        "event_updated_at": updated_at,
+        "payload": payload,
+        "status": "pending",
+        "attempts": 0,
+    }
+
+
+class WebhookEventProcessor:
+    def __init__(self, db: Any, apply: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+                 table: str = 'lemon_squeezy_events',
+                 concurrency: int = WEBHOOK_WORKER_CONCURRENCY,
+                 max_attempts: int = WEBHOOK_MAX_ATTEMPTS,
+                 retry_base_delay: float = WEBHOOK_RETRY_BASE_DELAY):
+        self.db = db
+        # Applies one event payload to subscriptions; returns the handler's result dict
+        self.apply = apply
+        self.table = table
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._queues: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._drainers: Dict[str, asyncio.Task] = {}
+        # Keys known to be stored in the events table
+        self._seen = LRUCache(maxsize=WEBHOOK_SEEN_SIZE)
+        # subscription resource key -> updated_at of the newest applied event
+        self._last_applied = LRUCache(maxsize=WEBHOOK_SEEN_SIZE)
+
+        # Metrics
+        self.received = 0
+        self.duplicates = 0
+        self.processed = 0
+        self.skipped = 0
+        self.failed = 0
+        self.retries = 0
+        self.store_errors = 0
+
+    async def start(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        try:
+            response = await self.db.execute(
+                self.db.table(self.table)
+                .select('*')
+                .eq('status', 'pending')
+                .order('received_at')
+                .limit(WEBHOOK_RECOVERY_LIMIT)
+            )
+        except Exception as e:
+            logger.warning(f"Webhook event recovery skipped ({self.table} unavailable): {e}")
+            return
+        for record in response.data or []:
+            self._seen[record['id']] = True
+            self._enqueue(record)
+        if response.data:
+            logger.info(f"Re-queued {len(response.data)} pending Lemon Squeezy events")
+
+    async def stop(self):
+        """Cancel in-flight work; unfinished events stay 'pending' and are re-queued on start"""
+        drainers = list(self._drainers.values())
+        for task in drainers:
+            task.cancel()
+        await asyncio.gather(*drainers, return_exceptions=True)
+
+    async def receive(self, payload: Dict[str, Any]) -> str:
+        """
+        Store and queue an event: 'accepted', 'duplicate', or 'failed' when it
+        couldn't be stored (the caller should answer 5xx so it is redelivered)
+        """
+        record = event_record(payload)
+        key = record['id']
+        if key in self._seen:
+            self.duplicates += 1
+            return 'duplicate'
+
+        try:
+            response = await self.db.execute(
+                self.db.table(self.table)
+                .upsert(record, on_conflict='id', ignore_duplicates=True)
+            )
+        except Exception as e:
+            if not _is_missing_table(e):
+                self.store_errors += 1
+                logger.error(f"Could not store Lemon Squeezy event {key}: {e}")
+                return 'failed'
+            # Migration not run: apply in memory, without persistence or dedup
+            logger.error(f"{self.table} is missing, applying Lemon Squeezy event {key} without persistence")
+        else:
+            self._seen[key] = True
+            if not response.data:
+                self.duplicates += 1
+                return 'duplicate'
+
+        self.received += 1
+        self._enqueue(record)
+        return 'accepted'
+
+    def _enqueue(self, record: Dict[str, Any]):
+        resource = resource_key(record)
+        self._queues.setdefault(resource, deque()).append(record)
+        if resource not in self._drainers:
+            self._drainers[resource] = asyncio.create_task(self._drain(resource))
+
+    async def _drain(self, resource: str):
+        """Apply one resource's events strictly one after another"""
+        queue = self._queues[resource]
+        try:
+            while queue:
+                await self._process(queue[0])
+                queue.popleft()
+        finally:
+            if not queue:
+                self._queues.pop(resource, None)
+            self._drainers.pop(resource, None)
+
+    async def _newest_applied(self, record: Dict[str, Any]) -> Optional[datetime]:
+        resource = resource_key(record)
+        if resource in self._last_applied:
+            return self._last_applied[resource]
+        newest = None
+        try:
+            response = await self.db.execute(
+                self.db.table(self.table)
+                .select('event_updated_at')
+                .eq('resource_type', record['resource_type'])
+                .eq('resource_id', record['resource_id'])
+                .eq('status', 'processed')
+                .order('event_updated_at', desc=True)
+                .limit(1)
+            )
+            if response.data:
+                newest = _parse_time(response.data[0].get('event_updated_at'))
+        except Exception as e:
+            logger.warning(f"Could not read last applied event for {resource}: {e}")
+        self._last_applied[resource] = newest
+        return newest
+
+    async def _mark(self, record: Dict[str, Any], status: str, result: Optional[str] = None):
+        try:
+            await self.db.execute(
+                self.db.table(self.table)
+                .update({
+                    "status": status,
+                    "attempts": record['attempts'],
+                    "result": result,
+                    "processed_at": datetime.now(timezone.utc).isoformat()
+                })
+                .eq('id', record['id'])
+            )
+        except Exception as e:
+            logger.error(f"Could not mark Lemon Squeezy event {record['id']} {status}: {e}")
+
+    async def _process(self, record: Dict[str, Any]):
+        ordered = record['resource_type'] == ORDERED_RESOURCE_TYPE
+        updated_at = _parse_time(record.get('event_updated_at')) if ordered else None
+        newest = await self._newest_applied(record) if updated_at else None
+        if updated_at and newest and updated_at < newest:
+            self.skipped += 1
+            logger.info(f"Skipping out-of-order Lemon Squeezy event {record['id']} (newest applied {newest.isoformat()})")
+            await self._mark(record, 'skipped', f"older than applied event at {newest.isoformat()}")
+            return
+
+        while True:
+            record['attempts'] += 1
+            try:
+                async with self._semaphore:
+                    result = await self.apply(record['payload'])
+                break
+            except Exception as e:
+                if record['attempts'] >= self.max_attempts:
+                    self.failed += 1
+                    logger.error(f"Giving up on Lemon Squeezy event {record['id']} after {record['attempts']} attempts: {e}")
+                    await self._mark(record, 'failed', str(e)[:500])
+                    return
+                self.retries += 1
+                delay = self.retry_base_delay * 2 ** (record['attempts'] - 1)
+                logger.warning(f"Lemon Squeezy event {record['id']} failed (attempt {record['attempts']}), retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+
+        if updated_at and (newest is None or updated_at > newest):
+            self._last_applied[resource_key(record)] = updated_at
+        self.processed += 1
+        await self._mark(record, 'processed', (result or {}).get('message'))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "processed": self.processed,
+            "skipped_out_of_order": self.skipped,
+            "failed": self.failed,
+            "retries": self.retries,
+            "store_errors": self.store_errors,
+            "queued": sum(len(q) for q in self._queues.values()),
+            "active_resources": len(self._drainers),
+        }
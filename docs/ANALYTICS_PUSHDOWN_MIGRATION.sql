@@ -0,0 +1,44 @@
+-- ============================================================
+-- ANALYTICS AGGREGATION PUSH-DOWN - SQL MIGRATION SCRIPT
+-- ============================================================
+-- Lets GET /api/analytics/{space_id} count events inside Postgres for
+-- spaces whose history is not covered by analytics_rollups yet. The
+-- response is one row per day instead of one row per event.
+-- Run this whole file once in the Supabase SQL editor.
+-- ============================================================
+
+-- 1. INDEX - the function filters by space and time range
+CREATE INDEX IF NOT EXISTS analytics_events_space_created_idx
+    ON public.analytics_events (space_id, created_at);
+
+-- Keyset order for GET /api/analytics/{space_id}/timeseries, which pages
+-- raw events on (created_at DESC, id DESC)
+CREATE INDEX IF NOT EXISTS analytics_events_space_keyset_idx
+    ON public.analytics_events (space_id, created_at DESC, id DESC);
+
+-- 2. DAILY COUNTS function - called via RPC by the backend
+-- p_since = NULL means all time. Dates are UTC 'YYYY-MM-DD'.
+CREATE OR REPLACE FUNCTION public.analytics_daily_counts(
+    p_space_id UUID,
+    p_since TIMESTAMPTZ DEFAULT NULL
+)
+RETURNS TABLE (date TEXT, impressions BIGINT, conversions BIGINT)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+AS $$
+    SELECT
+        to_char(created_at AT TIME ZONE 'UTC', 'YYYY-MM-DD') AS date,
+        COUNT(*) FILTER (WHERE event_type = 'impression') AS impressions,
+        COUNT(*) FILTER (WHERE event_type <> 'impression') AS conversions
+    FROM public.analytics_events
+    WHERE space_id = p_space_id
+      AND (p_since IS NULL OR created_at >= p_since)
+    GROUP BY 1
+    ORDER BY 1;
+$$;
+
+-- ============================================================
+-- VERIFICATION QUERY
+-- ============================================================
+-- SELECT * FROM public.analytics_daily_counts('<space-uuid>', now() - interval '7 days');
@@ -0,0 +1,76 @@
+-- ============================================================
+-- ANALYTICS ROLLUPS - SQL MIGRATION SCRIPT
+-- ============================================================
+-- Pre-aggregated per-space impression/conversion counters so that
+-- GET /api/analytics/{space_id} no longer scans analytics_events.
+--
+-- The backend keeps these up to date at ingest time: every bulk insert
+-- of /track events is followed by one increment_analytics_rollups() call.
+-- Run this whole file once in the Supabase SQL editor.
+-- ============================================================
+
+-- 1. ROLLUP table - one row per (space, granularity, bucket)
+-- granularity is 'hour' or 'day'; bucket_start is the UTC start of the bucket
+CREATE TABLE IF NOT EXISTS public.analytics_rollups (
+    space_id UUID NOT NULL REFERENCES public.spaces(id) ON DELETE CASCADE,
+    granularity TEXT NOT NULL CHECK (granularity IN ('hour', 'day')),
+    bucket_start TIMESTAMPTZ NOT NULL,
+    impressions BIGINT NOT NULL DEFAULT 0,
+    conversions BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (space_id, granularity, bucket_start)
+);
+
+ALTER TABLE public.analytics_rollups ENABLE ROW LEVEL SECURITY;
+
+-- 2. INCREMENT function - called by the backend after each bulk insert
+-- deltas: [{"space_id", "granularity", "bucket_start", "impressions", "conversions"}, ...]
+CREATE OR REPLACE FUNCTION public.increment_analytics_rollups(deltas JSONB)
+RETURNS VOID
+LANGUAGE sql
+SECURITY DEFINER
+AS $$
+    INSERT INTO public.analytics_rollups AS r
+        (space_id, granularity, bucket_start, impressions, conversions)
+    SELECT
+        (d->>'space_id')::UUID,
+        d->>'granularity',
+        (d->>'bucket_start')::TIMESTAMPTZ,
+        COALESCE((d->>'impressions')::BIGINT, 0),
+        COALESCE((d->>'conversions')::BIGINT, 0)
+    FROM jsonb_array_elements(deltas) AS d
+    ON CONFLICT (space_id, granularity, bucket_start) DO UPDATE
+    SET impressions = r.impressions + EXCLUDED.impressions,
+        conversions = r.conversions + EXCLUDED.conversions;
+$$;
+
+-- 3. COMPACTION function - rebuild rollups from raw events since a point in time
+-- Use for the initial backfill and to repair drift (e.g. a failed increment).
+CREATE OR REPLACE FUNCTION public.compact_analytics_rollups(p_since TIMESTAMPTZ DEFAULT '-infinity')
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    DELETE FROM public.analytics_rollups
+    WHERE bucket_start >= date_trunc('day', p_since AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+
+    INSERT INTO public.analytics_rollups (space_id, granularity, bucket_start, impressions, conversions)
+    SELECT space_id, g.granularity,
+           date_trunc(g.granularity, created_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+           COUNT(*) FILTER (WHERE event_type = 'impression'),
+           COUNT(*) FILTER (WHERE event_type = 'conversion')
+    FROM public.analytics_events
+    CROSS JOIN (VALUES ('hour'), ('day')) AS g(granularity)
+    WHERE created_at >= date_trunc('day', p_since AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'
+    GROUP BY 1, 2, 3;
+END;
+$$;
+
+-- 4. BACKFILL existing history (run once, right after creating the table)
+SELECT public.compact_analytics_rollups();
+
+-- ============================================================
+-- VERIFICATION QUERY
+-- ============================================================
+-- SELECT granularity, COUNT(*), SUM(impressions), SUM(conversions)
+-- FROM public.analytics_rollups GROUP BY granularity;
@@ -0,0 +1,43 @@
+-- ============================================================
+-- LEMON SQUEEZY WEBHOOK EVENTS - SQL MIGRATION SCRIPT
+-- ============================================================
+-- POST /api/webhooks/lemonsqueezy verifies the signature, stores the raw
+-- event here and returns 200; a background worker applies it to
+-- subscriptions, in order per resource.
+--
+-- id is the idempotency key: <event_name>:<data.type>:<data.id>:<updated_at>.
+-- resource_type + resource_id identify the resource (subscription ids and
+-- order ids are separate namespaces).
+-- A provider retry of the same delivery hits the primary key and is
+-- ignored. Rows left 'pending' (e.g. the server restarted before the
+-- worker got to them) are picked up again on startup.
+-- Run this whole file once in the Supabase SQL editor.
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS public.lemon_squeezy_events (
+    id TEXT PRIMARY KEY,
+    event_name TEXT NOT NULL,
+    resource_type TEXT NOT NULL,
+    resource_id TEXT NOT NULL,
+    event_updated_at TIMESTAMPTZ,
+    payload JSONB NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending'
+        CHECK (status IN ('pending', 'processed', 'skipped', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    received_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    processed_at TIMESTAMPTZ
+);
+
+-- Only the backend (service role) reads or writes this table
+ALTER TABLE public.lemon_squeezy_events ENABLE ROW LEVEL SECURITY;
+
+-- Startup recovery: pending events in arrival order
+CREATE INDEX IF NOT EXISTS lemon_squeezy_events_pending_idx
+    ON public.lemon_squeezy_events (received_at)
+    WHERE status = 'pending';
+
+-- Out-of-order check: newest applied event per subscription
+CREATE INDEX IF NOT EXISTS lemon_squeezy_events_applied_idx
+    ON public.lemon_squeezy_events (resource_type, resource_id, event_updated_at DESC)
+    WHERE status = 'processed';
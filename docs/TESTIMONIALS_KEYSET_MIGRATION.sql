@@ -0,0 +1,13 @@
+-- ============================================================
+-- TESTIMONIAL KEYSET PAGINATION - SQL MIGRATION SCRIPT
+-- ============================================================
+-- GET /api/public/testimonials and /api/spaces/{id}/public-data page
+-- approved testimonials newest-first with a (created_at, id) cursor.
+-- This partial index matches that ordering so each page is an index
+-- range scan of `limit` rows, however many testimonials a space has.
+-- Run this whole file once in the Supabase SQL editor.
+-- ============================================================
+
+CREATE INDEX IF NOT EXISTS testimonials_liked_keyset_idx
+    ON public.testimonials (space_id, created_at DESC, id DESC)
+    WHERE is_liked = TRUE;
@@ -504,26 +504,82 @@
      * @param {string} eventType - 'impression' or 'conversion'
      * @param {object} metadata - Additional event data
      */
+    // Events waiting to be sent together (several widgets on one page, or an
+    // impression followed by a conversion); see /api/track/batch
+    var pendingMetrics = [];
+    var pendingUrl = null;
+    var pendingTimer = null;
+    var METRIC_FLUSH_DELAY = 500;
+    var METRIC_BATCH_MAX = 50;
+
     function trackMetric(url, spaceId, eventType, metadata) {
         try {
-            var payload = {
-                space_id: spaceId,
-                event_type: eventType,
-                metadata: metadata || {}
-            };
-
-            // Use sendBeacon for reliable delivery during navigation
-            // Blob ensures Content-Type is application/json
-            if (navigator.sendBeacon) {
-                var blob = new Blob([JSON.stringify(payload)], { type: 'application/json' });
-                navigator.sendBeacon(url, blob);
-            } else {
-                // Fallback for older browsers
-                var xhr = new XMLHttpRequest();
-                xhr.open('POST', url, true);
-                xhr.setRequestHeader('Content-Type', 'application/json');
-                xhr.send(JSON.stringify(payload));
+            pendingUrl = url;
+            pendingMetrics.push({ space_id: spaceId, event_type: eventType, metadata: metadata || {} });
+
+            // Conversions usually precede a navigation: send right away
+            if (eventType === 'conversion' || pendingMetrics.length >= METRIC_BATCH_MAX) {
+                flushMetrics();
+            } else if (!pendingTimer) {
+                pendingTimer = setTimeout(flushMetrics, METRIC_FLUSH_DELAY);
+            }
+        } catch (e) {
+            // Silent fail - tracking should never break the widget
+        }
+    }
+
+    function flushMetrics() {
+        try {
+            if (pendingTimer) {
+                clearTimeout(pendingTimer);
+                pendingTimer = null;
+            }
+            var events = pendingMetrics;
+            pendingMetrics = [];
+            if (!events.length) return;
+
+            if (events.length === 1) {
+                sendCompactMetric(pendingUrl, events[0]);
+                return;
+            }
+
+            // String body = text/plain, so no CORS preflight
+            var body = JSON.stringify({ events: events });
+            if (navigator.sendBeacon && navigator.sendBeacon(pendingUrl + '/batch', body)) {
+                return;
+            }
+            for (var i = 0; i < events.length; i++) {
+                sendCompactMetric(pendingUrl, events[i]);
+            }
+        } catch (e) {
+            // Silent fail
+        }
+    }
+
+    // Don't lose queued impressions when the page goes away
+    window.addEventListener('pagehide', flushMetrics);
+
+    function sendCompactMetric(url, event) {
+        try {
+            // Compact beacon (see backend/beacon.py): fixed short keys,
+            // metadata limited to url/referrer/element/text
+            var metadata = event.metadata;
+            var fields = { u: metadata.url, r: metadata.referrer, el: metadata.element, tx: metadata.text };
+            var payload = 's=' + encodeURIComponent(event.space_id) + '&e=' + (event.event_type === 'conversion' ? 'c' : 'i');
+            for (var key in fields) {
+                if (fields[key]) {
+                    payload += '&' + key + '=' + encodeURIComponent(String(fields[key]).substring(0, 300));
+                }
+            }
+
+            // sendBeacon with a string body is sent as text/plain, so it
+            // needs no CORS preflight and survives navigation
+            if (navigator.sendBeacon && navigator.sendBeacon(url + '/compact', payload)) {
+                return;
             }
+            // Fallback for older browsers (or a refused beacon): GET pixel
+            var img = new Image();
+            img.src = url + '/pixel?' + payload;
         } catch (e) {
             // Silent fail - tracking should never break the widget
         }
@@ -89,6 +89,17 @@ export const getSession = async () => {
   return session;
 };
 
+// POST to a backend endpoint that requires the signed-in user's token
+// (e.g. cache invalidation after editing a space)
+export const postWithSession = async (url) => {
+  const session = await getSession();
+  if (!session?.access_token) return null;
+  return fetch(url, {
+    method: 'POST',
+    headers: { 'Authorization': `Bearer ${session.access_token}` },
+  });
+};
+
 
 export const verifySignupOtp = async (email, token) => {
   const { data, error } = await supabase.auth.verifyOtp({
@@ -23,7 +23,7 @@ import { Alert, AlertDescription, AlertTitle } from '@/components/ui/alert';
 import { Tooltip, TooltipContent, TooltipProvider, TooltipTrigger } from '@/components/ui/tooltip';
 import { useAuth } from '@/contexts/AuthContext';
 import { useSubscription } from '@/contexts/SubscriptionContext';
-import { supabase } from '@/lib/supabase';
+import { supabase, postWithSession } from '@/lib/supabase';
 import { 
   Heart, Plus, Settings, LogOut, MoreVertical, ExternalLink, Copy, Trash2, Loader2, 
   Code, Layout, Palette, Eye, Star, TrendingUp, Users, MessageSquare, Sparkles, 
@@ -1515,6 +1515,10 @@ const Dashboard = () => {
 
       if (error) throw error;
 
+      // A 404 for this slug may be cached by the backend - drop it (fire-and-forget)
+      const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || 'https://trust-flow-app.vercel.app';
+      postWithSession(`${BACKEND_URL}/api/spaces/${data.id}/invalidate`).catch(() => {});
+
       setSpaces([data, ...spaces]);
       setCreateDialogOpen(false);
       setNewSpaceName('');
@@ -16,7 +16,7 @@ import {
   ChevronDown, Shield, Info, Sparkles, ChevronUp, Code, Terminal,
   Wifi, WifiOff, Timer, Send
 } from 'lucide-react';
-import { supabase } from '@/lib/supabase';
+import { supabase, postWithSession } from '@/lib/supabase';
 import confetti from 'canvas-confetti';
 import { FeatureGate, PlanBadge, FeatureIndicator } from '@/components/FeatureGate';
 import { useFeature } from '@/hooks/useFeature';
@@ -1110,12 +1110,21 @@ const SettingsTab = ({ space, spaceId, navigate, deleteSpace, updateSpaceState,
     
     setIsDomainVerifying(true);
     try {
-      const res = await fetch(`${API_BASE}/api/custom-domains/verify/${customDomain.id}`, {
+      const verifyUrl = `${API_BASE}/api/custom-domains/verify/${customDomain.id}`;
+      const res = await fetch(verifyUrl, {
         method: 'POST'
       });
-      const data = await res.json();
-      
-      if (data.verified) {
+      let data = await res.json();
+
+      // The check runs in the background; poll until it has completed
+      for (let attempt = 0; data.queued && attempt < 15; attempt++) {
+        await new Promise(resolve => setTimeout(resolve, 2000));
+        data = await (await fetch(verifyUrl)).json();
+      }
+
+      if (data.queued) {
+        showToast('DNS check is still running. We\'ll keep checking automatically.', 'success');
+      } else if (data.verified) {
         // DNS verified - now awaiting admin activation
         setCustomDomain(prev => ({ ...prev, status: data.dns_status || 'dns_verified' }));
         showToast('DNS Verified! Your domain will be activated within 24-48 hours.', 'success');
@@ -1239,6 +1248,9 @@ const SettingsTab = ({ space, spaceId, navigate, deleteSpace, updateSpaceState,
         .eq('id', spaceId);
 
       if (error) throw error;
+
+      // Name/slug changed - drop the backend's cached lookups for this space (fire-and-forget)
+      postWithSession(`${API_BASE}/api/spaces/${spaceId}/invalidate`).catch(() => {});
       
       updateSpaceState({ space_name: spaceName, slug: spaceSlug });
       setShowConfirmModal(false); // Close modal if open
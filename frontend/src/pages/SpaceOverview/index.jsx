@@ -7,7 +7,7 @@ import { Tabs, TabsContent, TabsList, TabsTrigger } from '@/components/ui/tabs';
 import { Dialog, DialogContent } from '@/components/ui/dialog';
 import { Badge } from '@/components/ui/badge';
 import { useAuth } from '@/contexts/AuthContext';
-import { supabase } from '@/lib/supabase';
+import { supabase, postWithSession } from '@/lib/supabase';
 import { 
   ArrowLeft, Copy, ExternalLink, Inbox, Edit, Code, Settings, Loader2, Share2, BarChart3, Sparkles, Lock 
 } from 'lucide-react';
@@ -233,6 +233,10 @@ const SpaceOverview = () => {
         .eq('id', testimonialId);
 
       if (error) throw error;
+
+      // Approved set changed - drop the backend's cached widget payload (fire-and-forget)
+      const API_BASE = process.env.REACT_APP_BACKEND_URL || process.env.REACT_APP_API_URL || 'https://trust-flow-app.vercel.app';
+      postWithSession(`${API_BASE}/api/spaces/${spaceId}/public-data/invalidate`).catch(() => {});
     } catch (error) {
       setTestimonials(testimonials.map(t => 
         t.id === testimonialId ? { ...t, is_liked: currentValue } : t
@@ -286,6 +290,10 @@ const SpaceOverview = () => {
       const { logo_url, ...formSpecificSettings } = settingsToSave;
 
       await supabase.from('spaces').update({ logo_url: finalLogoUrl }).eq('id', spaceId);
+
+      // Branding changed - drop the backend's cached lookups for this space (fire-and-forget)
+      const API_BASE = process.env.REACT_APP_BACKEND_URL || process.env.REACT_APP_API_URL || 'https://trust-flow-app.vercel.app';
+      postWithSession(`${API_BASE}/api/spaces/${spaceId}/invalidate`).catch(() => {});
       
       // Fetch existing extra_settings first to merge, not overwrite
       const { data: existingData } = await supabase